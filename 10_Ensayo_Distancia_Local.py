@@ -1,15 +1,21 @@
-import whisper
 import sqlite3
-import os
 import numpy as np
 import re
-import difflib
+import time
+from procesado_audio import reducir_ruido, a_float32
+from metricas import Evaluador, COLUMNAS_RECUENTOS, recuentos
+from audio_whisper import cargar_modelos, decodificar, MelCompartido, CacheMel
+from escritor_resultados import EscritorResultados
+from consultas import agregar_columnas, crear_indices
+from registro_ejecuciones import registrar, finalizar
 
 # --- CONFIGURACIÓN ---
 DB_INPUT = "audios_grabados_distancia.db"
 DB_OUTPUT = "audios_transcritos_distancia.db"
-MODEL = "small"
+MODELOS = ["small"]   # Se evalúan todos en la misma ejecución sobre los mismos audios (ej: ["tiny", "base", "small"])
 REFERENCIA = "esta prueba pretende determinar la distancia óptima"
+REDUCCION_RUIDO = "no"  # "no" = audio original, "si" = con reducción de ruido, "comparar" = ambas variantes
+CACHE_MEL = None   # Caché de log-mel entre ejecuciones (ej: "cache_mel.db"); sus aciertos acortan tiempo_seg
 
 
 # === FUNCIONES AUXILIARES ===
@@ -22,51 +28,6 @@ def normalize_for_wer(text):
     return text
 
 
-def normalize_for_cer(text):
-    if text is None:
-        return ""
-    text = normalize_for_wer(text)
-    return text.replace(" ", "")
-
-
-def word_error_details(reference, hypothesis):
-    ref_words = reference.split()
-    hyp_words = hypothesis.split()
-    seq = difflib.SequenceMatcher(None, ref_words, hyp_words)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-        elif tag == "equal":
-            M += (i2 - i1)
-    N = len(ref_words)
-    wer = (S + D + I) / N if N > 0 else 0.0
-    return {"wer": wer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
-def char_error_details(reference, hypothesis):
-    ref_chars = list(reference)
-    hyp_chars = list(hypothesis)
-    seq = difflib.SequenceMatcher(None, ref_chars, hyp_chars)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-        elif tag == "equal":
-            M += (i2 - i1)
-    N = len(ref_chars)
-    cer = (S + D + I) / N if N > 0 else 0.0
-    return {"cer": cer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
 # === BASE DE DATOS ===
 def init_db_transcripciones(db_path=DB_OUTPUT):
     with sqlite3.connect(db_path) as conn:
@@ -80,11 +41,21 @@ def init_db_transcripciones(db_path=DB_OUTPUT):
                 transcription TEXT,
                 wer REAL,
                 cer REAL,
-                wer_details TEXT,
-                cer_details TEXT,
-                avg_rms_voz REAL
+                avg_rms_voz REAL,
+                reduccion_ruido INTEGER DEFAULT 0,
+                tiempo_reduccion REAL,
+                tiempo_seg REAL,
+                ejecucion TEXT,
+                tiempo_mel REAL,
+                mel_cache INTEGER
             )
         """)
+        agregar_columnas(cursor, "transcripciones", [("reduccion_ruido", "INTEGER DEFAULT 0"),
+                                                     ("tiempo_reduccion", "REAL"), ("tiempo_seg", "REAL"),
+                                                     ("ejecucion", "TEXT"), ("tiempo_mel", "REAL"),
+                                                     ("mel_cache", "INTEGER"),
+                                                     *[(c, "INTEGER") for c in COLUMNAS_RECUENTOS]])
+        crear_indices(cursor, "transcripciones", [["filename"], ["model"], ["ejecucion"]])
         conn.commit()
 
 
@@ -142,63 +113,108 @@ def obtener_audios_por_id(ids):
 
 
 def transcribir_y_guardar(audios):
-    model = whisper.load_model(MODEL)
-    print(f"\nModelo '{MODEL}' cargado correctamente.")
-
-    wers = []
-    cers = []
+    modelos = cargar_modelos(MODELOS)
+    ejecucion = registrar(DB_OUTPUT, globals(), modelos)   # agrupa las filas de esta ejecución
+
+    # Variantes a evaluar: sin reducción de ruido (False) y/o con ella (True)
+    variantes = [False, True] if REDUCCION_RUIDO == "comparar" else [REDUCCION_RUIDO == "si"]
+    wers = {(m, v): [] for m in modelos for v in variantes}
+    cers = {(m, v): [] for m in modelos for v in variantes}
+    tiempos = {(m, v): [] for m in modelos for v in variantes}
+    tiempos_rr = []
     rms_voz_vals = []
-
-    for idx, (audio_id, filename, audio_blob, avg_rms_voz) in enumerate(audios, 1):
-        temp_path = f"temp_{filename}"
-        with open(temp_path, "wb") as f:
-            f.write(audio_blob)
-
-        print(f"\n[{idx}/{len(audios)}] Transcribiendo: {filename} (modelo: {MODEL})")  # 🟩 muestra el modelo
-        result = model.transcribe(temp_path, language="es")
-        texto = result.get("text", "").strip()
-
-        ref_wer = normalize_for_wer(REFERENCIA)
-        hyp_wer = normalize_for_wer(texto)
-        ref_cer = normalize_for_cer(REFERENCIA)
-        hyp_cer = normalize_for_cer(texto)
-
-        wer_info = word_error_details(ref_wer, hyp_wer)
-        cer_info = char_error_details(ref_cer, hyp_cer)
-
-        os.remove(temp_path)
-
-        with sqlite3.connect(DB_OUTPUT) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO transcripciones (filename, model, transcription, wer, cer, wer_details, cer_details, avg_rms_voz)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (filename, MODEL, texto, wer_info["wer"], cer_info["cer"], str(wer_info), str(cer_info), avg_rms_voz))
-            conn.commit()
-
-        wers.append(wer_info["wer"])
-        cers.append(cer_info["cer"])
-        rms_voz_vals.append(avg_rms_voz)
-
-        print(f"{filename}:")
-        print(f"   → Modelo Whisper: {MODEL}")  
-        print(f"   → Transcripción: {texto}")
-        print(f"   → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
-        print(f"   → RMS de voz: {avg_rms_voz:.4f}")
+    mels_calculados = mels_usados = 0
+    cache = CacheMel(CACHE_MEL) if CACHE_MEL else None
+
+    evaluador = Evaluador(normalize_for_wer)   # la referencia se normaliza una sola vez
+
+    # Una conexión para toda la ejecución; las filas se escriben por lotes (ver escritor_resultados.py)
+    with EscritorResultados(DB_OUTPUT, "transcripciones",
+                            ["filename", "model", "transcription", "wer", "cer", *COLUMNAS_RECUENTOS,
+                             "avg_rms_voz", "reduccion_ruido", "tiempo_reduccion", "tiempo_seg",
+                             "ejecucion", "tiempo_mel", "mel_cache"]) as escritor:
+        for idx, (audio_id, filename, audio_blob, avg_rms_voz) in enumerate(audios, 1):
+            t0 = time.time()
+            muestras = decodificar(audio_blob)   # una sola decodificación por audio para todos los modelos
+            tiempo_decodificacion = time.time() - t0
+
+            for con_rr in variantes:
+                etiqueta = " + reducción de ruido" if con_rr else ""
+                entrada = muestras
+                tiempo_rr = None
+                if con_rr:
+                    t0 = time.time()
+                    entrada = reducir_ruido(muestras)   # una vez por audio, no por modelo
+                    tiempo_rr = time.time() - t0
+                    tiempos_rr.append(tiempo_rr)
+                compartido = MelCompartido(a_float32(entrada), cache)
+                compartido.preparar(modelos.values())
+
+                for nombre, model in modelos.items():
+                    print(f"\n[{idx}/{len(audios)}] Transcribiendo: {filename} (modelo: {nombre}{etiqueta})")
+                    t0 = time.time()
+                    result = compartido.transcribir(model, language="es")
+                    # Como cuando cada modelo decodificaba y calculaba su log-mel: se suman a su tiempo
+                    tiempo_mel = compartido.tiempo_mel(model)
+                    duracion = tiempo_decodificacion + tiempo_mel + (time.time() - t0)
+                    tiempos[nombre, con_rr].append(duracion)
+                    texto = result.get("text", "").strip()
+
+                    wer_info, cer_info = evaluador.evaluar(REFERENCIA, texto)
+
+                    escritor.agregar((filename, nombre, texto, wer_info["wer"], cer_info["cer"],
+                                      *recuentos(wer_info, cer_info), avg_rms_voz, int(con_rr), tiempo_rr, duracion, ejecucion,
+                                      tiempo_mel, int(compartido.mel_cache(model))))
+
+                    wers[nombre, con_rr].append(wer_info["wer"])
+                    cers[nombre, con_rr].append(cer_info["cer"])
+
+                    print(f"{filename}:")
+                    print(f"   → Modelo Whisper: {nombre}{etiqueta}")
+                    print(f"   → Transcripción: {texto}")
+                    print(f"   → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
+                    print(f"   → RMS de voz: {avg_rms_voz:.4f}")
+                    if con_rr:
+                        print(f"   → Reducción de ruido: {tiempo_rr * 1000:.1f} ms")
+
+                mels_calculados += compartido.calculados
+                mels_usados += compartido.reutilizados
+
+            rms_voz_vals.append(avg_rms_voz)
 
     # === RESUMEN FINAL ===
-    if wers and cers:
-        wer_mean, cer_mean = np.mean(wers), np.mean(cers)
-        wer_std, cer_std = np.std(wers), np.std(cers)
-        rms_mean = np.nanmean(rms_voz_vals)
-
-        print("\n=== RESUMEN FINAL ===")
-        print(f"Modelo usado: {MODEL}")  # 🟩 NUEVO
-        print(f"WER medio: {wer_mean:.2%} (±{wer_std:.2%})")
-        print(f"CER medio: {cer_mean:.2%} (±{cer_std:.2%})")
-        print(f"WER máx: {np.max(wers):.2%} | WER mín: {np.min(wers):.2%}")
-        print(f"CER máx: {np.max(cers):.2%} | CER mín: {np.min(cers):.2%}")
-        print(f"RMS de voz promedio global: {rms_mean:.4f}")
+    for nombre in modelos:
+        for con_rr in variantes:
+            clave = (nombre, con_rr)
+            if not wers[clave]:
+                continue
+            wer_mean, cer_mean = np.mean(wers[clave]), np.mean(cers[clave])
+            wer_std, cer_std = np.std(wers[clave]), np.std(cers[clave])
+
+            print("\n=== RESUMEN FINAL" + (" (CON REDUCCIÓN DE RUIDO)" if con_rr else "") + " ===")
+            print(f"Modelo usado: {nombre}")
+            print(f"WER medio: {wer_mean:.2%} (±{wer_std:.2%})")
+            print(f"CER medio: {cer_mean:.2%} (±{cer_std:.2%})")
+            print(f"WER máx: {np.max(wers[clave]):.2%} | WER mín: {np.min(wers[clave]):.2%}")
+            print(f"CER máx: {np.max(cers[clave]):.2%} | CER mín: {np.min(cers[clave]):.2%}")
+            print(f"Tiempo medio de transcripción: {np.mean(tiempos[clave]):.2f} s")
+
+        if len(variantes) == 2 and wers[nombre, False]:
+            print(f"Diferencia con reducción de ruido ({nombre}) → "
+                  f"WER: {np.mean(wers[nombre, True]) - np.mean(wers[nombre, False]):+.2%} | "
+                  f"CER: {np.mean(cers[nombre, True]) - np.mean(cers[nombre, False]):+.2%}")
+
+    if rms_voz_vals:
+        print(f"\nRMS de voz promedio global: {np.nanmean(rms_voz_vals):.4f}")
+    if tiempos_rr:
+        t_transcripcion = np.sum([tiempos[m, True] for m in modelos])
+        print(f"Tiempo añadido por la reducción de ruido: {np.mean(tiempos_rr) * 1000:.1f} ms por audio "
+              f"({np.sum(tiempos_rr) / t_transcripcion:.2%} del tiempo de transcripción de todos los modelos)")
+    print(f"Log-mel calculados: {mels_calculados} para {mels_usados} transcripciones")
+    if cache:
+        cache.imprimir_resumen()
+        cache.cerrar()
+    finalizar(DB_OUTPUT, ejecucion)
 
 
 if __name__ == "__main__":
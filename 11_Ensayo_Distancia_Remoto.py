@@ -2,13 +2,19 @@ import sqlite3
 import os
 import numpy as np
 import re
-import difflib
+import time
 import requests
+from procesado_audio import leer_wav_blob, reducir_ruido, wav_a_bytes
+from formato_audio import recodificar
+from metricas import Evaluador, COLUMNAS_RECUENTOS, recuentos
+from consultas import agregar_columnas, crear_indices
+from registro_ejecuciones import registrar, finalizar
 
 # --- CONFIGURACIÓN ---
 DB_INPUT = "audios_grabados_distancia.db"
 DB_OUTPUT = "audios_transcritos_distancia.db"
 REFERENCIA = "esta prueba pretende determinar la distancia óptima"
+REDUCCION_RUIDO = "no"  # "no" = audio original, "si" = con reducción de ruido, "comparar" = ambas variantes
 
 # Configuración del servidor remoto
 TRANSCRIBE_SERVER = os.environ.get("TRANSCRIBE_SERVER", "http://192.168.1.12:8000")
@@ -26,49 +32,6 @@ def normalize_for_wer(text):
     return text
 
 
-def normalize_for_cer(text):
-    return normalize_for_wer(text).replace(" ", "")
-
-
-# === FUNCIONES DE ERROR DETALLADAS ===
-def word_error_details(reference, hypothesis):
-    ref_words = reference.split()
-    hyp_words = hypothesis.split()
-    seq = difflib.SequenceMatcher(None, ref_words, hyp_words)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-        elif tag == "equal":
-            M += (i2 - i1)
-    N = len(ref_words)
-    wer = (S + D + I) / N if N > 0 else 0.0
-    return {"wer": wer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
-def char_error_details(reference, hypothesis):
-    ref_chars = list(reference)
-    hyp_chars = list(hypothesis)
-    seq = difflib.SequenceMatcher(None, ref_chars, hyp_chars)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-        elif tag == "equal":
-            M += (i2 - i1)
-    N = len(ref_chars)
-    cer = (S + D + I) / N if N > 0 else 0.0
-    return {"cer": cer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
 # === BASE DE DATOS ===
 def init_db_transcripciones(db_path=DB_OUTPUT):
     """Crea la tabla de transcripciones si no existe."""
@@ -82,12 +45,19 @@ def init_db_transcripciones(db_path=DB_OUTPUT):
             transcription TEXT,
             wer REAL,
             cer REAL,
-            wer_details TEXT,
-            cer_details TEXT,
             avg_rms_voz REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            reduccion_ruido INTEGER DEFAULT 0,
+            tiempo_reduccion REAL,
+            tiempo_seg REAL,
+            ejecucion TEXT
         )
         """)
+        agregar_columnas(cursor, "transcripciones", [("reduccion_ruido", "INTEGER DEFAULT 0"),
+                                                     ("tiempo_reduccion", "REAL"), ("tiempo_seg", "REAL"),
+                                                     ("ejecucion", "TEXT"),
+                                                     *[(c, "INTEGER") for c in COLUMNAS_RECUENTOS]])
+        crear_indices(cursor, "transcripciones", [["filename"], ["model"], ["ejecucion"]])
         conn.commit()
 
 
@@ -147,64 +117,101 @@ def enviar_a_servidor(filename, audio_blob, language="es"):
 
 # === PROCESO PRINCIPAL ===
 def transcribir_lote(audios):
-    wers, cers, rms_vals = [], [], []
+    ejecucion = registrar(DB_OUTPUT, globals())   # agrupa las filas de esta ejecución
+    # Variantes a evaluar: sin reducción de ruido (False) y/o con ella (True)
+    variantes = [False, True] if REDUCCION_RUIDO == "comparar" else [REDUCCION_RUIDO == "si"]
+    wers = {v: [] for v in variantes}
+    cers = {v: [] for v in variantes}
+    evaluador = Evaluador(normalize_for_wer)   # la referencia se normaliza una sola vez
+    tiempos = {v: [] for v in variantes}
+    tiempos_rr = []
+    rms_vals = []
     modelos_usados = set()
 
     for idx, (audio_id, filename, audio_blob, avg_rms_voz) in enumerate(audios, 1):
-        print(f"\n[{idx}/{len(audios)}] Enviando '{filename}' al servidor...")
-
-        texto, modelo = enviar_a_servidor(filename, audio_blob)
-        if texto is None:
-            continue
-
-        modelos_usados.add(modelo)
-
-        ref = REFERENCIA
-        wer_info = word_error_details(normalize_for_wer(ref), normalize_for_wer(texto))
-        cer_info = char_error_details(normalize_for_cer(ref), normalize_for_cer(texto))
-
-        wers.append(wer_info["wer"])
-        cers.append(cer_info["cer"])
+        for con_rr in variantes:
+            etiqueta = " (con reducción de ruido)" if con_rr else ""
+            print(f"\n[{idx}/{len(audios)}] Enviando '{filename}' al servidor{etiqueta}...")
+            envio = recodificar(audio_blob, "wav")   # el servidor recibe WAV aunque se guarde en FLAC
+            tiempo_rr = None
+            if con_rr:
+                t0 = time.time()
+                envio = wav_a_bytes(reducir_ruido(leer_wav_blob(audio_blob)))
+                tiempo_rr = time.time() - t0
+
+            t0 = time.time()
+            texto, modelo = enviar_a_servidor(filename, envio)
+            if texto is None:
+                continue
+            tiempo_seg = time.time() - t0   # incluye la red
+            tiempos[con_rr].append(tiempo_seg)
+            if con_rr:
+                tiempos_rr.append(tiempo_rr)   # sólo con respuesta, para compararlo con tiempos[True]
+
+            modelos_usados.add(modelo)
+
+            ref = REFERENCIA
+            wer_info, cer_info = evaluador.evaluar(ref, texto)
+
+            wers[con_rr].append(wer_info["wer"])
+            cers[con_rr].append(cer_info["cer"])
+
+            print(f"{filename}")
+            print(f" → Modelo: {modelo}{etiqueta}")
+            print(f" → Transcripción: {texto.strip()}")
+            print(f" → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
+            print(f" → RMS voz: {avg_rms_voz:.4f}")
+            if con_rr:
+                print(f" → Reducción de ruido: {tiempo_rr * 1000:.1f} ms")
+
+            with sqlite3.connect(DB_OUTPUT) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                INSERT INTO transcripciones (filename, model, transcription, wer, cer, {", ".join(COLUMNAS_RECUENTOS)},
+                                             avg_rms_voz, reduccion_ruido, tiempo_reduccion, tiempo_seg, ejecucion)
+                VALUES (?, ?, ?, ?, ?, {", ".join("?" for _ in COLUMNAS_RECUENTOS)}, ?, ?, ?, ?, ?)
+                """, (
+                    filename,
+                    modelo,
+                    texto,
+                    wer_info["wer"],
+                    cer_info["cer"],
+                    *recuentos(wer_info, cer_info),
+                    avg_rms_voz,
+                    int(con_rr),
+                    tiempo_rr,
+                    tiempo_seg,
+                    ejecucion
+                ))
+                conn.commit()
         rms_vals.append(avg_rms_voz)
 
-        print(f"{filename}")
-        print(f" → Modelo: {modelo}")
-        print(f" → Transcripción: {texto.strip()}")
-        print(f" → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
-        print(f" → RMS voz: {avg_rms_voz:.4f}")
-
-        with sqlite3.connect(DB_OUTPUT) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-            INSERT INTO transcripciones (filename, model, transcription, wer, cer, wer_details, cer_details, avg_rms_voz)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                filename,
-                modelo,
-                texto,
-                wer_info["wer"],
-                cer_info["cer"],
-                str(wer_info),
-                str(cer_info),
-                avg_rms_voz
-            ))
-            conn.commit()
-
     # --- Mostrar estadísticas globales ---
-    if wers:
-        wer_mean, cer_mean = np.mean(wers), np.mean(cers)
-        wer_std, cer_std = np.std(wers), np.std(cers)
-        rms_mean = np.nanmean(rms_vals)
-        wer_max, wer_min = np.max(wers), np.min(wers)
-        cer_max, cer_min = np.max(cers), np.min(cers)
-
-        print("\n=== RESULTADOS GLOBALES ===")
+    for con_rr in variantes:
+        if not wers[con_rr]:
+            continue
+        wer_mean, cer_mean = np.mean(wers[con_rr]), np.mean(cers[con_rr])
+        wer_std, cer_std = np.std(wers[con_rr]), np.std(cers[con_rr])
+        wer_max, wer_min = np.max(wers[con_rr]), np.min(wers[con_rr])
+        cer_max, cer_min = np.max(cers[con_rr]), np.min(cers[con_rr])
+
+        print("\n=== RESULTADOS GLOBALES" + (" (CON REDUCCIÓN DE RUIDO)" if con_rr else "") + " ===")
         print(f"Modelos utilizados: {', '.join(modelos_usados)}")
         print(f"WER medio: {wer_mean:.2%} (±{wer_std:.2%})")
         print(f"CER medio: {cer_mean:.2%} (±{cer_std:.2%})")
         print(f"WER máx: {wer_max:.2%} | WER mín: {wer_min:.2%}")
         print(f"CER máx: {cer_max:.2%} | CER mín: {cer_min:.2%}")
-        print(f"RMS de voz promedio global: {rms_mean:.4f}")
+        print(f"Tiempo medio por audio (incl. red): {np.mean(tiempos[con_rr]):.2f} s")
+
+    if rms_vals:
+        print(f"\nRMS de voz promedio global: {np.nanmean(rms_vals):.4f}")
+    if tiempos_rr and tiempos[True]:
+        print(f"Tiempo añadido por la reducción de ruido: {np.mean(tiempos_rr) * 1000:.1f} ms por audio "
+              f"({np.sum(tiempos_rr) / np.sum(tiempos[True]):.2%} del tiempo de transcripción)")
+    if len(variantes) == 2 and wers[False] and wers[True]:
+        print(f"Diferencia con reducción de ruido → WER: {np.mean(wers[True]) - np.mean(wers[False]):+.2%} | "
+              f"CER: {np.mean(cers[True]) - np.mean(cers[False]):+.2%}")
+    finalizar(DB_OUTPUT, ejecucion, modelos_usados)
 
 
 # === MAIN ===
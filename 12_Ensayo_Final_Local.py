@@ -1,16 +1,22 @@
-import whisper
 import sqlite3
-import os
-import numpy as np
-import re
-import difflib
 import time
-import unicodedata
+from metricas import Evaluador, NormalizadorTexto
+from manifiesto import Manifiesto, filtro_resultados
+from consultas import agregar_columnas, crear_indices, estadisticas
+from dataset_audio import DatasetAudio
+from latencias import duracion_wav, factor_tiempo_real, texto_rtf, imprimir_informe
+from procesado_audio import a_float32
+from audio_whisper import cargar_modelos, decodificar, calentar, MelCompartido, CacheMel
+from escritor_resultados import EscritorResultados
+from registro_ejecuciones import registrar, finalizar
 
 # --- CONFIGURACIÓN ---
 DB_INPUT = "audios_grabados_frases.db"
 DB_OUTPUT = "audios_transcritos_frases.db"
-MODEL = "small"
+MODELOS = ["small"]   # Se evalúan todos en la misma ejecución sobre los mismos audios (ej: ["tiny", "base", "small"])
+OPCIONES_DECODIFICACION = {"language": "es"}   # Forman parte de la clave del manifiesto junto con el modelo
+CALENTAMIENTO = 1   # Transcripciones sin medir del primer audio con cada modelo (arranque en frío fuera de las medias)
+CACHE_MEL = None   # Caché de log-mel entre ejecuciones (ej: "cache_mel.db"); sus aciertos acortan tiempo_seg
 
 # === LISTA DE 140 FRASES DE REFERENCIA ===
 REFERENCIAS = [
@@ -181,98 +187,9 @@ NUMEROS = {
     "mil": 1000
 }
 
-def quitar_tildes(text):
-    """Elimina tildes y diacríticos."""
-    if text is None:
-        return ""
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', text)
-        if unicodedata.category(c) != 'Mn'
-    )
-
-def texto_a_numero(text):
-    """
-    Convierte tokens numéricos simples a cifras.
-    Tokeniza con re.findall para separar palabras/números y evitar que la puntuación impida la coincidencia.
-    Sólo convierte tokens que aparecen en NUMEROS; el resto se deja tal cual.
-    """
-    if text is None:
-        return ""
-    # tokenizar: devuelve secuencia de palabras o dígitos (ignora signos de puntuación)
-    tokens = re.findall(r"\d+|\w+", text, flags=re.UNICODE)
-    salida = []
-    for t in tokens:
-        t_low = t.lower()
-        # quitar tildes en el token antes de comparar con NUMEROS
-        t_low = quitar_tildes(t_low)
-        if t_low in NUMEROS:
-            salida.append(str(NUMEROS[t_low]))
-        else:
-            salida.append(t_low)
-    return " ".join(salida)
-
-def normalize_for_wer(text):
-    """
-    Normalización pensada para WER:
-    - minúsculas
-    - quitar tildes
-    - sustituir guiones por espacios (user-friendly <-> user friendly)
-    - eliminar puntuación
-    - convertir palabras numéricas simples a cifras
-    - colapsar espacios
-    """
-    if text is None:
-        return ""
-    text = text.lower()
-    text = quitar_tildes(text)
-    # uniformizar guiones/hyphens a espacios (user-friendly <-> user friendly)
-    text = text.replace("-", " ")
-    # tokenizamos y quitamos puntuación/interferencias (esto asegura que "dieciocho," => "dieciocho")
-    # pero no perdemos los números en cifras
-    # usamos texto_a_numero sobre el texto limpio
-    # primero quitar cualquier carácter que no sea palabra o espacio (dejamos números y letras)
-    # pero mantenemos espacios
-    text = re.sub(r"[^\w\s]", " ", text)
-    # ahora convertir tokens numéricos a cifras
-    text = texto_a_numero(text)
-    # colapsar espacios
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-def normalize_for_cer(text):
-    """Igual que WER pero sin espacios (para CER)."""
-    return normalize_for_wer(text).replace(" ", "")
-
-# === MÉTRICAS (sin cambios) ===
-def word_error_rate(ref, hyp):
-    ref_words = ref.split()
-    hyp_words = hyp.split()
-    seq = difflib.SequenceMatcher(None, ref_words, hyp_words)
-    S = D = I = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-    N = len(ref_words)
-    return (S + D + I) / N if N > 0 else 0.0
-
-def char_error_rate(ref, hyp):
-    ref_chars = list(ref)
-    hyp_chars = list(hyp)
-    seq = difflib.SequenceMatcher(None, ref_chars, hyp_chars)
-    S = D = I = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-    N = len(ref_chars)
-    return (S + D + I) / N if N > 0 else 0.0
+# Normalización para WER: minúsculas, sin tildes ni puntuación, números en cifras y espacios colapsados.
+# Se compila una sola vez (tabla de str.translate + caché de tokens y textos), ver metricas.py.
+normalize_for_wer = NormalizadorTexto(NUMEROS)
 
 # === Resto del programa (idéntico a tu versión) ===
 
@@ -308,16 +225,27 @@ def init_db():
                 referencia TEXT,
                 wer REAL,
                 cer REAL,
-                tiempo_seg REAL
+                tiempo_seg REAL,
+                model TEXT,
+                duracion_audio REAL,
+                rtf REAL,
+                ejecucion TEXT,
+                tiempo_mel REAL,
+                mel_cache INTEGER
             )
         """)
+        agregar_columnas(c, "transcripciones", [("model", "TEXT"), ("duracion_audio", "REAL"), ("rtf", "REAL"),
+                                                ("ejecucion", "TEXT"), ("tiempo_mel", "REAL"),
+                                                ("mel_cache", "INTEGER")])
+        crear_indices(c, "transcripciones", [["filename"], ["tipo", "frase"], ["model"], ["ejecucion"]])
         conn.commit()
 
+# Los audios se leen uno a uno durante el bucle, no todos a la vez (ver dataset_audio.py)
+dataset = DatasetAudio(DB_INPUT)
+
 def obtener_audios():
-    with sqlite3.connect(DB_INPUT) as conn:
-        c = conn.cursor()
-        c.execute("SELECT filename, audio, tipo, frase, version FROM grabaciones ORDER BY tipo, frase, version")
-        return c.fetchall()
+    """(rowid, filename, tipo, frase, version) de cada grabación, sin el audio."""
+    return dataset.metadatos("filename, tipo, frase, version", orden="tipo, frase, version")
 
 def transcribir_todo():
     audios = obtener_audios()
@@ -325,67 +253,114 @@ def transcribir_todo():
         print("⚠️ No se encontraron audios en la base de datos.")
         return
 
-    model = whisper.load_model(MODEL)
-    print(f"\n🔊 Modelo '{MODEL}' cargado.\n")
+    modelos = cargar_modelos(MODELOS)
+    print(f"\n🔊 Modelos cargados: {', '.join(modelos)}\n")
 
     init_db()
 
-    wers_por_tipo = {}
-    cers_por_tipo = {}
-    tiempos_por_tipo = {}
+    evaluador = Evaluador(normalize_for_wer)   # cada referencia se normaliza una sola vez
+    ejecucion = registrar(DB_OUTPUT, globals(), modelos)   # agrupa las filas de esta ejecución
+
+    # Audios ya transcritos con cada modelo y estas opciones (ejecución anterior interrumpida)
+    manifiestos = {nombre: Manifiesto(DB_OUTPUT, nombre, OPCIONES_DECODIFICACION) for nombre in modelos}
 
     total = len(audios)
-    for idx, (filename, audio_blob, tipo, frase, version) in enumerate(audios, 1):
-        temp_path = f"temp_{filename}"
-        with open(temp_path, "wb") as f:
-            f.write(audio_blob)
-
-        t0 = time.time()
-        result = model.transcribe(temp_path, language="es")
-        t1 = time.time()
-        duracion = t1 - t0
-
-        os.remove(temp_path)
-
-        texto = result.get("text", "").strip()
-        ref = get_referencia(tipo, frase)
-
-        wer = word_error_rate(normalize_for_wer(ref), normalize_for_wer(texto))
-        cer = char_error_rate(normalize_for_cer(ref), normalize_for_cer(texto))
-
-        try:
-            tipo_int = int(tipo)
-        except Exception:
-            tipo_int = -1
-
-        wers_por_tipo.setdefault(tipo_int, []).append(wer)
-        cers_por_tipo.setdefault(tipo_int, []).append(cer)
-        tiempos_por_tipo.setdefault(tipo_int, []).append(duracion)
-
-        with sqlite3.connect(DB_OUTPUT) as conn:
-            conn.execute("""
-                INSERT INTO transcripciones (filename, tipo, frase, transcription, referencia, wer, cer, tiempo_seg)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (filename, tipo, frase, texto, ref, wer, cer, duracion))
-            conn.commit()
-
-        print(f"\n=== [{idx}/{total}] Tipo {tipo}, Frase {frase}, Version {version} ===")
-        print(f"🗣️  Referencia:   {ref}")
-        print(f"🧩 Transcripción: {texto}")
-        print(f"📊 WER: {wer:.2%} | CER: {cer:.2%}")
-        print(f"⏱️  Tiempo de transcripción: {duracion:.2f} s")
+    hashes = dataset.hashes(a[0] for a in audios)
+    pendientes = {a[0]: a[1:] for a in audios if not all(m.completado(hashes[a[0]]) for m in manifiestos.values())}
+    ya_hechos = total - len(pendientes)
+    if ya_hechos:
+        print(f"↩️  Reanudando: {ya_hechos} de {total} audios ya transcritos con todos los modelos.")
+    mels_calculados = mels_usados = 0
+    cache = CacheMel(CACHE_MEL) if CACHE_MEL else None
+
+    if pendientes and CALENTAMIENTO:
+        muestra = a_float32(decodificar(dataset.leer(next(iter(pendientes)))))
+        for model in modelos.values():
+            calentar(model, muestra, CALENTAMIENTO, **OPCIONES_DECODIFICACION)
+
+    # Una conexión para toda la ejecución; las filas se escriben por lotes (ver escritor_resultados.py)
+    with EscritorResultados(DB_OUTPUT, "transcripciones",
+                            ["filename", "tipo", "frase", "transcription", "referencia", "wer", "cer", "tiempo_seg",
+                             "model", "duracion_audio", "rtf", "ejecucion", "tiempo_mel", "mel_cache"]) as escritor:
+        for idx, (rowid, audio_blob) in enumerate(dataset.audios(list(pendientes)), ya_hechos + 1):
+            filename, tipo, frase, version = pendientes[rowid]
+            audio_hash = hashes[rowid]
+            ref = get_referencia(tipo, frase)
+
+            # Decodificación y log-mel una sola vez por audio; su tiempo se suma al de cada modelo, de modo que
+            # tiempo_seg sigue midiendo todo el camino (BLOB → texto) como cuando cada modelo lo hacía por su cuenta
+            faltan = {n: m for n, m in modelos.items() if not manifiestos[n].completado(audio_hash)}
+            t0 = time.time()
+            compartido = MelCompartido(a_float32(decodificar(audio_blob)), cache)
+            tiempo_decodificacion = time.time() - t0
+            compartido.preparar(faltan.values())
+            duracion_audio = duracion_wav(audio_blob)
+
+            print(f"\n=== [{idx}/{total}] Tipo {tipo}, Frase {frase}, Version {version} ===")
+            print(f"🗣️  Referencia:   {ref}")
+
+            for nombre, model in faltan.items():
+                t0 = time.time()
+                result = compartido.transcribir(model, **OPCIONES_DECODIFICACION)
+                t1 = time.time()
+                tiempo_mel = compartido.tiempo_mel(model)
+                duracion = tiempo_decodificacion + tiempo_mel + (t1 - t0)
+                rtf = factor_tiempo_real(duracion, duracion_audio)
+
+                texto = result.get("text", "").strip()
+
+                wer_info, cer_info = evaluador.evaluar(ref, texto)
+                wer, cer = wer_info["wer"], cer_info["cer"]
+
+                escritor.agregar((filename, tipo, frase, texto, ref, wer, cer, duracion, nombre, duracion_audio, rtf,
+                                  ejecucion, tiempo_mel, int(compartido.mel_cache(model))),
+                                 manifiestos[nombre].al_guardar(audio_hash))   # punto de control
+
+                print(f"🧩 [{nombre}] Transcripción: {texto}")
+                print(f"   📊 WER: {wer:.2%} | CER: {cer:.2%} | ⏱️  {duracion:.2f} s ({texto_rtf(rtf)}, "
+                      f"log-mel {tiempo_mel * 1000:.0f} ms{' de la caché' if compartido.mel_cache(model) else ''})")
+
+            mels_calculados += compartido.calculados
+            mels_usados += compartido.reutilizados
+
+    # Resultados calculados en la base de datos: esta ejecución y las anteriores con los mismos modelos y opciones
+    origen, donde, parametros = filtro_resultados(list(manifiestos.values()))
+    valores = ["wer", "cer", "tiempo_seg"]
+    por_tipo = estadisticas(DB_OUTPUT, valores, "modelo, tipo", origen, f"{donde} AND tipo IS NOT NULL", parametros,
+                            percentiles=())
 
     print("\n\n===== RESULTADOS GLOBALES POR TIPO =====")
-    tipos_ordenados = sorted(k for k in wers_por_tipo.keys() if k != -1)
-    for tipo in tipos_ordenados:
-        wers = np.array(wers_por_tipo[tipo])
-        cers = np.array(cers_por_tipo[tipo])
-        tiempos = np.array(tiempos_por_tipo[tipo])
-        print(f"\n🗂️ Tipo {tipo}:")
-        print(f"   → WER medio: {np.mean(wers):.2%} (±{np.std(wers):.2%}) | Máx: {np.max(wers):.2%} | Mín: {np.min(wers):.2%}")
-        print(f"   → CER medio: {np.mean(cers):.2%} (±{np.std(cers):.2%}) | Máx: {np.max(cers):.2%} | Mín: {np.min(cers):.2%}")
-        print(f"   → Tiempo medio: {np.mean(tiempos):.2f} s (±{np.std(tiempos):.2f} s)")
-
+    for nombre in modelos:
+        print(f"\n----- Modelo {nombre} -----")
+        for (modelo, tipo), e in por_tipo.items():
+            if modelo != nombre:
+                continue
+            wer, cer, tiempo = e["wer"], e["cer"], e["tiempo_seg"]
+            print(f"\n🗂️ Tipo {tipo}:")
+            print(f"   → WER medio: {wer['media']:.2%} (±{wer['std']:.2%}) | Máx: {wer['max']:.2%} | Mín: {wer['min']:.2%}")
+            print(f"   → CER medio: {cer['media']:.2%} (±{cer['std']:.2%}) | Máx: {cer['max']:.2%} | Mín: {cer['min']:.2%}")
+            print(f"   → Tiempo medio: {tiempo['media']:.2f} s (±{tiempo['std']:.2f} s)")
+
+    if len(modelos) > 1:
+        print("\n===== COMPARACIÓN DE MODELOS (mismos audios) =====")
+        por_modelo = estadisticas(DB_OUTPUT, valores, "modelo", origen, donde, parametros, percentiles=())
+        for nombre in modelos:
+            if nombre not in por_modelo:
+                continue
+            e = por_modelo[nombre]
+            print(f"{nombre:<10} WER {e['wer']['media']:.2%} | CER {e['cer']['media']:.2%} | "
+                  f"Tiempo medio {e['tiempo_seg']['media']:.2f} s ({e['wer']['n']} audios)")
+
+    if mels_usados:
+        print(f"\nLog-mel calculados: {mels_calculados} para {mels_usados} transcripciones")
+    if cache:
+        cache.imprimir_resumen()
+        cache.cerrar()
+
+    # Percentiles de latencia y RTF de todas las transcripciones guardadas (ver latencias.py)
+    imprimir_informe(DB_OUTPUT, "model")
+    imprimir_informe(DB_OUTPUT, "model, tipo")
+    finalizar(DB_OUTPUT, ejecucion)
     print("\n✅ Transcripción global completada y guardada en la base de datos.")
 
 if __name__ == "__main__":
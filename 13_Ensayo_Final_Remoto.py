@@ -1,11 +1,15 @@
 import sqlite3
 import os
-import numpy as np
-import re
-import difflib
 import time
-import unicodedata
 import requests
+from metricas import Evaluador, NormalizadorTexto
+from manifiesto import Manifiesto, filtro_resultados
+from consultas import agregar_columnas, crear_indices, estadisticas
+from dataset_audio import DatasetAudio
+from latencias import duracion_wav, factor_tiempo_real, texto_rtf, imprimir_informe
+from escritor_resultados import EscritorResultados
+from formato_audio import recodificar
+from registro_ejecuciones import registrar, finalizar
 
 # --- CONFIGURACIÓN ---
 DB_INPUT = "audios_grabados_frases.db"
@@ -15,6 +19,8 @@ DB_OUTPUT = "audios_transcritos_frases.db"
 TRANSCRIBE_SERVER = os.environ.get("TRANSCRIBE_SERVER", "http://192.168.1.12:8000")
 API_TOKEN = "clave123"
 TRANSCRIBE_ENDPOINT = f"{TRANSCRIBE_SERVER.rstrip('/')}/transcribe"
+MODELO_REMOTO = os.environ.get("TRANSCRIBE_MODEL", "large")   # Modelo que carga el servidor (clave del manifiesto)
+OPCIONES_DECODIFICACION = {"language": "es"}
 
 # === LISTA DE 140 FRASES DE REFERENCIA ===
 REFERENCIAS = [
@@ -201,73 +207,16 @@ def get_referencia(tipo, frase):
         return REFERENCIAS[idx_global]
     return ""
 
-def quitar_tildes(text):
-    if text is None:
-        return ""
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', text)
-        if unicodedata.category(c) != 'Mn'
-    )
-
-def texto_a_numero(text):
-    tokens = re.findall(r"\d+|\w+", text, flags=re.UNICODE)
-    salida = []
-    for t in tokens:
-        t_low = quitar_tildes(t.lower())
-        if t_low in NUMEROS:
-            salida.append(str(NUMEROS[t_low]))
-        else:
-            salida.append(t_low)
-    return " ".join(salida)
-
-def normalize_for_wer(text):
-    if text is None:
-        return ""
-    text = text.lower()
-    text = quitar_tildes(text)
-    text = text.replace("-", " ")
-    text = re.sub(r"[^\w\s]", " ", text)
-    text = texto_a_numero(text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-def normalize_for_cer(text):
-    return normalize_for_wer(text).replace(" ", "")
-
-# --- MÉTRICAS ---
-def word_error_rate(ref, hyp):
-    ref_words, hyp_words = ref.split(), hyp.split()
-    seq = difflib.SequenceMatcher(None, ref_words, hyp_words)
-    S = D = I = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-    N = len(ref_words)
-    return (S + D + I) / N if N > 0 else 0.0
-
-def char_error_rate(ref, hyp):
-    ref_chars, hyp_chars = list(ref), list(hyp)
-    seq = difflib.SequenceMatcher(None, ref_chars, hyp_chars)
-    S = D = I = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == "replace":
-            S += max(i2 - i1, j2 - j1)
-        elif tag == "delete":
-            D += i2 - i1
-        elif tag == "insert":
-            I += j2 - j1
-    N = len(ref_chars)
-    return (S + D + I) / N if N > 0 else 0.0
+# Normalización para WER: minúsculas, sin tildes ni puntuación, números en cifras y espacios colapsados.
+# Se compila una sola vez (tabla de str.translate + caché de tokens y textos), ver metricas.py.
+normalize_for_wer = NormalizadorTexto(NUMEROS)
 
 # --- COMUNICACIÓN CON SERVIDOR ---
-def enviar_a_servidor(filename, audio_blob, language="es"):
+def enviar_a_servidor(filename, audio_blob):
     headers = {"X-API-KEY": API_TOKEN}
-    files = {"file": (filename, audio_blob, "audio/wav")}
-    data = {"language": language}
+    # El servidor recibe siempre WAV, aunque la grabación esté guardada en FLAC
+    files = {"file": (filename, recodificar(audio_blob, "wav"), "audio/wav")}
+    data = dict(OPCIONES_DECODIFICACION)
     try:
         resp = requests.post(TRANSCRIBE_ENDPOINT, headers=headers, files=files, data=data, timeout=300)
     except requests.exceptions.RequestException as e:
@@ -280,6 +229,9 @@ def enviar_a_servidor(filename, audio_blob, language="es"):
 
     try:
         data = resp.json()
+        if data.get("model", MODELO_REMOTO) != MODELO_REMOTO:
+            print(f"⚠️ El servidor usa el modelo '{data['model']}' y no '{MODELO_REMOTO}' (TRANSCRIBE_MODEL).")
+            return None, None
         texto = data.get("transcription", "")
         tiempo_remoto = data.get("transcription_time_s", None)
         return texto, tiempo_remoto
@@ -300,16 +252,24 @@ def init_db():
                 referencia TEXT,
                 wer REAL,
                 cer REAL,
-                tiempo_seg REAL
+                tiempo_seg REAL,
+                model TEXT,
+                duracion_audio REAL,
+                rtf REAL,
+                ejecucion TEXT
             )
         """)
+        agregar_columnas(conn, "transcripciones", [("model", "TEXT"), ("duracion_audio", "REAL"), ("rtf", "REAL"),
+                                                   ("ejecucion", "TEXT")])
+        crear_indices(conn, "transcripciones", [["filename"], ["tipo", "frase"], ["model"], ["ejecucion"]])
         conn.commit()
 
+# Los audios se leen uno a uno durante el bucle, no todos a la vez (ver dataset_audio.py)
+dataset = DatasetAudio(DB_INPUT)
+
 def obtener_audios():
-    with sqlite3.connect(DB_INPUT) as conn:
-        c = conn.cursor()
-        c.execute("SELECT filename, audio, tipo, frase, version FROM grabaciones ORDER BY tipo, frase, version")
-        return c.fetchall()
+    """(rowid, filename, tipo, frase, version) de cada grabación, sin el audio."""
+    return dataset.metadatos("filename, tipo, frase, version", orden="tipo, frase, version")
 
 # --- PROCESO PRINCIPAL ---
 def transcribir_todo():
@@ -320,61 +280,73 @@ def transcribir_todo():
 
     init_db()
 
-    wers_por_tipo = {}
-    cers_por_tipo = {}
-    tiempos_por_tipo = {}
-
-    total = len(audios)
-    print(f"\nEnviando {total} audios al servidor {TRANSCRIBE_SERVER} ...\n")
+    evaluador = Evaluador(normalize_for_wer)   # cada referencia se normaliza una sola vez
+    ejecucion = registrar(DB_OUTPUT, globals(), [MODELO_REMOTO])   # agrupa las filas de esta ejecución
 
-    for idx, (filename, audio_blob, tipo, frase, version) in enumerate(audios, 1):
-        print(f"\n=== [{idx}/{total}] Tipo {tipo}, Frase {frase}, Versión {version} ===")
+    # Audios ya transcritos con este modelo y opciones (ejecución anterior interrumpida)
+    manifiesto = Manifiesto(DB_OUTPUT, MODELO_REMOTO, OPCIONES_DECODIFICACION)
 
-        t0 = time.time()
-        texto, tiempo_remoto = enviar_a_servidor(filename, audio_blob)
-        t1 = time.time()
-        duracion_total = t1 - t0  # tiempo total incluyendo red
-
-        if texto is None:
-            print("❌ Fallo al transcribir. Saltando...")
-            continue
-
-        ref = get_referencia(tipo, frase)
-        wer = word_error_rate(normalize_for_wer(ref), normalize_for_wer(texto))
-        cer = char_error_rate(normalize_for_cer(ref), normalize_for_cer(texto))
-
-        tipo_int = int(tipo) if str(tipo).isdigit() else -1
-
-        wers_por_tipo.setdefault(tipo_int, []).append(wer)
-        cers_por_tipo.setdefault(tipo_int, []).append(cer)
-        tiempos_por_tipo.setdefault(tipo_int, []).append(duracion_total)
-
-        with sqlite3.connect(DB_OUTPUT) as conn:
-            conn.execute("""
-                INSERT INTO transcripciones (filename, tipo, frase, transcription, referencia, wer, cer, tiempo_seg)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (filename, tipo, frase, texto, ref, wer, cer, duracion_total))
-            conn.commit()
-
-        print(f"Ref: {ref}")
-        print(f"Hyp: {texto.strip()}")
-        print(f"WER: {wer:.2%} | CER: {cer:.2%}")
-        if tiempo_remoto is not None:
-            print(f"⚙️  Tiempo servidor: {tiempo_remoto:.2f}s | ⏱️ Total (incl. red): {duracion_total:.2f}s")
-        else:
-            print(f"⏱️  Tiempo total: {duracion_total:.2f}s")
-
-    # --- Resultados globales ---
+    total = len(audios)
+    hashes = dataset.hashes(a[0] for a in audios)
+    pendientes = {a[0]: a[1:] for a in audios if not manifiesto.completado(hashes[a[0]])}
+    ya_hechos = total - len(pendientes)
+    if ya_hechos:
+        print(f"↩️  Reanudando: {ya_hechos} de {total} audios ya transcritos con '{MODELO_REMOTO}'.")
+    print(f"\nEnviando {len(pendientes)} audios al servidor {TRANSCRIBE_SERVER} ...\n")
+
+    # Una conexión para toda la ejecución; las filas se escriben por lotes (ver escritor_resultados.py)
+    with EscritorResultados(DB_OUTPUT, "transcripciones",
+                            ["filename", "tipo", "frase", "transcription", "referencia", "wer", "cer", "tiempo_seg",
+                             "model", "duracion_audio", "rtf", "ejecucion"]) as escritor:
+        for idx, (rowid, audio_blob) in enumerate(dataset.audios(list(pendientes)), ya_hechos + 1):
+            filename, tipo, frase, version = pendientes[rowid]
+            audio_hash = hashes[rowid]
+            print(f"\n=== [{idx}/{total}] Tipo {tipo}, Frase {frase}, Versión {version} ===")
+
+            t0 = time.time()
+            texto, tiempo_remoto = enviar_a_servidor(filename, audio_blob)
+            t1 = time.time()
+            duracion_total = t1 - t0  # tiempo total incluyendo red
+            duracion_audio = duracion_wav(audio_blob)
+            rtf = factor_tiempo_real(duracion_total, duracion_audio)
+
+            if texto is None:
+                print("❌ Fallo al transcribir. Saltando...")
+                continue
+
+            ref = get_referencia(tipo, frase)
+            wer_info, cer_info = evaluador.evaluar(ref, texto)
+            wer, cer = wer_info["wer"], cer_info["cer"]
+
+            escritor.agregar((filename, tipo, frase, texto, ref, wer, cer, duracion_total, MODELO_REMOTO,
+                              duracion_audio, rtf, ejecucion), manifiesto.al_guardar(audio_hash))   # punto de control
+
+            print(f"Ref: {ref}")
+            print(f"Hyp: {texto.strip()}")
+            print(f"WER: {wer:.2%} | CER: {cer:.2%}")
+            if tiempo_remoto is not None:
+                print(f"⚙️  Tiempo servidor: {tiempo_remoto:.2f}s | ⏱️ Total (incl. red): {duracion_total:.2f}s "
+                      f"({texto_rtf(rtf)})")
+            else:
+                print(f"⏱️  Tiempo total: {duracion_total:.2f}s ({texto_rtf(rtf)})")
+
+    # --- Resultados globales (calculados en la base de datos, incluidas las ejecuciones anteriores) ---
+    origen, donde, parametros = filtro_resultados([manifiesto])
+    por_tipo = estadisticas(DB_OUTPUT, ["wer", "cer", "tiempo_seg"], "tipo", origen, f"{donde} AND tipo IS NOT NULL",
+                            parametros, percentiles=())
     print("\n\n===== RESULTADOS GLOBALES POR TIPO =====")
-    for tipo in sorted(k for k in wers_por_tipo.keys() if k != -1):
-        wers = np.array(wers_por_tipo[tipo])
-        cers = np.array(cers_por_tipo[tipo])
-        tiempos = np.array(tiempos_por_tipo[tipo])
+    for tipo, e in por_tipo.items():
+        wer, cer, tiempo = e["wer"], e["cer"], e["tiempo_seg"]
         print(f"\nTipo {tipo}:")
-        print(f"   → WER medio: {np.mean(wers):.2%} (±{np.std(wers):.2%}) | min: {np.min(wers):.2%} | max: {np.max(wers):.2%}")
-        print(f"   → CER medio: {np.mean(cers):.2%} (±{np.std(cers):.2%}) | min: {np.min(cers):.2%} | max: {np.max(cers):.2%}")
-        print(f"   → Tiempo medio: {np.mean(tiempos):.2f}s (±{np.std(tiempos):.2f}s)")
+        print(f"   → WER medio: {wer['media']:.2%} (±{wer['std']:.2%}) | min: {wer['min']:.2%} | max: {wer['max']:.2%}")
+        print(f"   → CER medio: {cer['media']:.2%} (±{cer['std']:.2%}) | min: {cer['min']:.2%} | max: {cer['max']:.2%}")
+        print(f"   → Tiempo medio: {tiempo['media']:.2f}s (±{tiempo['std']:.2f}s)")
+
+    # Percentiles de latencia (incluida la red) y RTF de todas las transcripciones guardadas (ver latencias.py)
+    imprimir_informe(DB_OUTPUT, "model")
+    imprimir_informe(DB_OUTPUT, "model, tipo")
 
+    finalizar(DB_OUTPUT, ejecucion)
     print("\n✅ Transcripción remota completada y guardada en la base de datos.")
 
 # --- MAIN ---
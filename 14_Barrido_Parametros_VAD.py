@@ -0,0 +1,309 @@
+import sqlite3
+import glob
+import itertools
+import os
+import time
+import numpy as np
+import webrtcvad
+from multiprocessing import Pool
+from formato_audio import leer_blob
+from dataset_pcm import DatasetPCM
+
+# --- CONFIGURACIÓN ---
+DBS_ENTRADA = sorted(glob.glob("audios_grabados*.db"))  # Bases de datos con la tabla 'grabaciones'
+DB_OUTPUT = "barrido_vad.db"    # Resultados del barrido
+SAMPLE_RATE = 16000             # Frecuencia de muestreo de las grabaciones (Hz)
+FRAME_DURATION = 30             # Duración de cada frame en ms (igual que en los grabadores)
+FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION / 1000)  # Muestras por frame
+MIN_AUDIO_FRAMES = int(0.5 * 1000 / FRAME_DURATION)    # Duración mínima aceptada (igual que en 4_)
+# Grabación por bloques (5_): pre-buffer, bloques de 10 s y 0.5 s de verificación al final de cada bloque
+PRE_BUFFER_FRAMES = int(0.5 * SAMPLE_RATE) // FRAME_SIZE
+BLOQUE_FRAMES = int(np.ceil(10.0 * SAMPLE_RATE / FRAME_SIZE))
+VERIF_FRAMES = int(0.5 * 1000 / FRAME_DURATION)
+NUM_PROCESOS = os.cpu_count()   # Procesos del pool (todos los núcleos)
+TOP_RESULTADOS = 15             # Configuraciones mostradas por pantalla
+
+# Rejilla de parámetros a evaluar
+VAD_MODES = [0, 1, 2, 3]
+ENERGY_THRESHOLDS = [100, 200, 300, 500, 800, 1200]
+SPEECH_THRESHOLDS = [1, 3, 5, 8]   # speech_threshold = 1 equivale al disparo de hay_voz (5_)
+MAX_SILENCE_FRAMES_LIST = [int(s * 1000 / FRAME_DURATION) for s in (0.4, 0.8, 1.2, 2.0)]
+
+# Configuraciones usadas actualmente por los grabadores (para compararlas con el resto). La grabación por
+# bloques (5_) no usa speech_threshold ni max_silence_frames: sus configuraciones los llevan a None
+CONFIGS_ACTUALES = {
+    "4_Deteccion_Voz_VAD": (2, 500, 5, int(0.8 * 1000 / FRAME_DURATION)),
+    "5_Grabar_por_bloques_y_DB": (1, 500, None, None),
+}
+
+# Referencia de voz independiente del VAD: frames cuya energía supera el ruido de fondo del audio
+PERCENTIL_RUIDO = 10            # Percentil del RMS por frame tomado como ruido de fondo
+FACTOR_RUIDO_REF = 3.0          # ~10 dB por encima del ruido de fondo
+
+# Datos compartidos con los procesos del pool (se rellenan en los inicializadores)
+_AUDIOS = []
+_VAD = {}
+_RMS = []
+_REF = []
+
+
+# === CARGA DE GRABACIONES ===
+def leer_grabaciones(db_paths):
+    """
+    Recorre las grabaciones de cada base de datos fila a fila y devuelve los audios decodificados. Si la base de
+    datos tiene su exportación PCM al día (programa 25), los audios son vistas del fichero: no se lee ningún BLOB
+    y los procesos del pool comparten esas páginas en lugar de tener cada uno su copia.
+    """
+    grabaciones = []
+    for db_path in db_paths:
+        pcm = DatasetPCM.si_actualizado(db_path)
+        if pcm is not None:
+            for i, fila in enumerate(pcm.indice):
+                if fila["sample_rate"] != SAMPLE_RATE:
+                    print(f"⚠️ Se omite {fila['filename']} ({fila['sample_rate']} Hz).")
+                    continue
+                grabaciones.append((os.path.basename(db_path), int(fila["rowid"]), str(fila["filename"]), pcm.audio(i)))
+            continue
+        with sqlite3.connect(db_path) as conn:
+            cursor = conn.execute("SELECT id, filename, audio FROM grabaciones ORDER BY id")
+            for audio_id, filename, audio_blob in cursor:   # sin fetchall: un BLOB en memoria cada vez
+                rate, audio = leer_blob(audio_blob)
+                if len(audio.shape) > 1:
+                    audio = audio[:, 0]
+                if rate != SAMPLE_RATE or audio.dtype != np.int16:
+                    print(f"⚠️ Se omite {filename} ({rate} Hz, {audio.dtype}).")
+                    continue
+                grabaciones.append((os.path.basename(db_path), audio_id, filename, audio))
+    return grabaciones
+
+
+# === ANÁLISIS POR FRAMES ===
+def rms_por_frame(audio):
+    """Calcula el RMS de todos los frames completos del audio de una vez."""
+    num_frames = len(audio) // FRAME_SIZE
+    frames = audio[:num_frames * FRAME_SIZE].reshape(num_frames, FRAME_SIZE).astype(np.float32)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def voz_referencia(rms):
+    """Marca como voz de referencia los frames claramente por encima del ruido de fondo."""
+    if len(rms) == 0:
+        return np.zeros(0, dtype=bool)
+    ruido = max(np.percentile(rms, PERCENTIL_RUIDO), 1.0)
+    return rms > ruido * FACTOR_RUIDO_REF
+
+
+def _init_vad(audios):
+    global _AUDIOS
+    _AUDIOS = audios
+
+
+def calcular_vad(tarea):
+    """Decisión de webrtcvad para cada frame de un audio con un modo dado (igual que hay_voz)."""
+    idx, vad_mode = tarea
+    audio = _AUDIOS[idx]
+    vad = webrtcvad.Vad(vad_mode)
+    num_frames = len(audio) // FRAME_SIZE
+    resultado = np.zeros(num_frames, dtype=bool)
+    for i in range(num_frames):
+        frame_bytes = audio[i * FRAME_SIZE:(i + 1) * FRAME_SIZE].tobytes()
+        try:
+            resultado[i] = vad.is_speech(frame_bytes, SAMPLE_RATE)
+        except Exception:
+            resultado[i] = False
+    return tarea, resultado
+
+
+# === SIMULACIÓN DEL GRABADOR ===
+def simular_record_voice(voz, speech_threshold, max_silence_frames):
+    """
+    Reproduce la lógica de record_voice (4_) sobre las decisiones de voz por frame.
+    Devuelve el frame en el que se dispara la grabación (o None) y la máscara de frames grabados.
+    """
+    grabados = np.zeros(len(voz), dtype=bool)
+    speech_counter = 0
+    silence_counter = 0
+    disparo = None
+    for i, es_voz in enumerate(voz):
+        if es_voz:
+            speech_counter += 1
+            silence_counter = 0
+            if disparo is None and speech_counter >= speech_threshold:
+                disparo = i
+            if disparo is not None:
+                grabados[i] = True   # record_voice sólo guarda los frames con voz
+        elif disparo is not None:
+            silence_counter += 1
+            if silence_counter > max_silence_frames:
+                break
+    if grabados.sum() < MIN_AUDIO_FRAMES:   # "Audio demasiado corto": se descarta
+        return None, np.zeros(len(voz), dtype=bool)
+    return disparo, grabados
+
+
+def simular_grabar_por_bloques(voz):
+    """
+    Reproduce la lógica de grabar_por_bloques (5_): empieza en el primer frame con voz conservando el
+    pre-buffer, guarda todos los frames (también los de silencio) y, tras cada bloque de 10 s, lee 0.5 s
+    de verificación y sólo para si en ellos no hay voz. Devuelve el frame de disparo (o None) y la máscara.
+    """
+    grabados = np.zeros(len(voz), dtype=bool)
+    if not voz.any():
+        return None, grabados
+    disparo = int(np.argmax(voz))
+    fin = disparo + 1
+    while fin < len(voz):
+        verif = min(fin + BLOQUE_FRAMES, len(voz))
+        fin = min(verif + VERIF_FRAMES, len(voz))
+        if not voz[verif:fin].any():
+            break
+    grabados[max(0, disparo - PRE_BUFFER_FRAMES + 1):fin] = True
+    return disparo, grabados
+
+
+def _init_evaluacion(vad, rms, ref):
+    global _VAD, _RMS, _REF
+    _VAD, _RMS, _REF = vad, rms, ref
+
+
+def evaluar_configuracion(config):
+    """Aplica una configuración a todos los audios y resume latencia, voz recortada y audio desperdiciado."""
+    vad_mode, energy_threshold, speech_threshold, max_silence_frames = config
+    latencias, recortes, desperdicios = [], [], []
+    con_voz = disparos = 0
+
+    for idx in range(len(_RMS)):
+        rms = _RMS[idx]
+        ref = _REF[idx]
+        voz = _VAD[(idx, vad_mode)] & (rms > energy_threshold)   # misma condición que hay_voz
+        if speech_threshold is None:
+            disparo, grabados = simular_grabar_por_bloques(voz)
+        else:
+            disparo, grabados = simular_record_voice(voz, speech_threshold, max_silence_frames)
+
+        if disparo is not None:
+            desperdicios.append(np.sum(grabados & ~ref) / np.sum(grabados))
+
+        if not ref.any():
+            continue
+        con_voz += 1
+        recortes.append(1.0 - np.sum(grabados & ref) / np.sum(ref))
+        if disparo is not None:
+            disparos += 1
+            latencias.append((disparo - int(np.argmax(ref))) * FRAME_DURATION)
+
+    return {
+        "vad_mode": vad_mode,
+        "energy_threshold": energy_threshold,
+        "speech_threshold": speech_threshold,
+        "max_silence_frames": max_silence_frames,
+        "tasa_disparo": disparos / con_voz if con_voz else 0.0,
+        "latencia_media_ms": float(np.mean(latencias)) if latencias else np.nan,
+        "latencia_p90_ms": float(np.percentile(latencias, 90)) if latencias else np.nan,
+        "recorte_medio": float(np.mean(recortes)) if recortes else np.nan,
+        "desperdicio_medio": float(np.mean(desperdicios)) if desperdicios else np.nan,
+    }
+
+
+# === BASE DE DATOS ===
+def init_db(db_path=DB_OUTPUT):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS barrido_vad (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                vad_mode INTEGER,
+                energy_threshold REAL,
+                speech_threshold INTEGER,
+                max_silence_frames INTEGER,
+                num_audios INTEGER,
+                tasa_disparo REAL,
+                latencia_media_ms REAL,
+                latencia_p90_ms REAL,
+                recorte_medio REAL,
+                desperdicio_medio REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+
+
+def guardar_resultados(resultados, num_audios, db_path=DB_OUTPUT):
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("""
+            INSERT INTO barrido_vad (vad_mode, energy_threshold, speech_threshold, max_silence_frames, num_audios,
+                                     tasa_disparo, latencia_media_ms, latencia_p90_ms, recorte_medio, desperdicio_medio)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(r["vad_mode"], r["energy_threshold"], r["speech_threshold"], r["max_silence_frames"], num_audios,
+               r["tasa_disparo"], r["latencia_media_ms"], r["latencia_p90_ms"], r["recorte_medio"],
+               r["desperdicio_medio"]) for r in resultados])
+        conn.commit()
+
+
+def imprimir_fila(r, etiqueta=""):
+    inicio = r["speech_threshold"] if r["speech_threshold"] is not None else "bloques"
+    silencio = r["max_silence_frames"] if r["max_silence_frames"] is not None else "-"
+    print(f"{r['vad_mode']:<5} {r['energy_threshold']:<7.0f} {inicio:<7} {silencio:<8} "
+          f"{r['tasa_disparo']:<9.2%} {r['latencia_media_ms']:<10.0f} {r['latencia_p90_ms']:<10.0f} "
+          f"{r['recorte_medio']:<9.2%} {r['desperdicio_medio']:<9.2%} {etiqueta}")
+
+
+# === BARRIDO ===
+def barrido():
+    if not DBS_ENTRADA:
+        print("⚠️ No se encontraron bases de datos 'audios_grabados*.db'.")
+        return
+
+    grabaciones = leer_grabaciones(DBS_ENTRADA)
+    if not grabaciones:
+        print("⚠️ No hay grabaciones válidas para analizar.")
+        return
+    audios = [g[3] for g in grabaciones]
+    print(f"🔊 {len(audios)} grabaciones cargadas de {len(DBS_ENTRADA)} bases de datos. Procesos: {NUM_PROCESOS}")
+
+    t0 = time.time()
+    rms = [rms_por_frame(a) for a in audios]
+    ref = [voz_referencia(r) for r in rms]
+
+    # Paso 1: decisiones del VAD (lo costoso) una sola vez por audio y modo
+    tareas_vad = list(itertools.product(range(len(audios)), VAD_MODES))
+    with Pool(NUM_PROCESOS, initializer=_init_vad, initargs=(audios,)) as pool:
+        vad = dict(pool.map(calcular_vad, tareas_vad, chunksize=max(1, len(tareas_vad) // (4 * NUM_PROCESOS))))
+    t1 = time.time()
+    print(f"⏱️  VAD calculado para {len(tareas_vad)} combinaciones audio/modo en {t1 - t0:.2f} s")
+
+    # Paso 2: simulación del grabador para cada configuración de la rejilla
+    configs = list(itertools.product(VAD_MODES, ENERGY_THRESHOLDS, SPEECH_THRESHOLDS, MAX_SILENCE_FRAMES_LIST))
+    configs += list(itertools.product(VAD_MODES, ENERGY_THRESHOLDS, [None], [None]))   # grabación por bloques
+    for config in CONFIGS_ACTUALES.values():
+        if config not in configs:
+            configs.append(config)
+    with Pool(NUM_PROCESOS, initializer=_init_evaluacion, initargs=(vad, rms, ref)) as pool:
+        resultados = pool.map(evaluar_configuracion, configs)
+    t2 = time.time()
+    print(f"⏱️  {len(configs)} configuraciones evaluadas en {t2 - t1:.2f} s")
+
+    init_db()
+    guardar_resultados(resultados, len(audios))
+
+    # Orden: menos voz recortada + menos audio desperdiciado
+    resultados.sort(key=lambda r: np.nan_to_num(r["recorte_medio"], nan=1.0) +
+                    np.nan_to_num(r["desperdicio_medio"], nan=1.0))
+
+    print("\n===== MEJORES CONFIGURACIONES =====")
+    print(f"{'VAD':<5} {'RMS':<7} {'Inicio':<7} {'Silencio':<8} {'Disparo':<9} {'Lat.(ms)':<10} "
+          f"{'Lat.p90':<10} {'Recorte':<9} {'Desperd.':<9}")
+    print("-" * 80)
+    for r in resultados[:TOP_RESULTADOS]:
+        imprimir_fila(r)
+
+    print("\n===== CONFIGURACIONES ACTUALES =====")
+    for nombre, config in CONFIGS_ACTUALES.items():
+        for r in resultados:
+            if (r["vad_mode"], r["energy_threshold"], r["speech_threshold"], r["max_silence_frames"]) == config:
+                imprimir_fila(r, f"← {nombre}")
+
+    print(f"\n✅ Barrido completado y guardado en '{DB_OUTPUT}'.")
+
+
+if __name__ == "__main__":
+    barrido()
@@ -0,0 +1,84 @@
+import importlib
+import os
+import sqlite3
+import time
+from fuente_audio import FuenteArchivo, FinDeAudio
+
+# --- CONFIGURACIÓN ---
+DB_INPUT = "audios_grabados_frases.db"  # Grabaciones que se reproducen como si fuera el micrófono
+DB_PRUEBA = "benchmark_captura.db"      # Base de datos temporal donde se guardan las grabaciones
+TIEMPO_REAL = False                     # True → reproduce a velocidad real, False → lo más rápido posible
+SILENCIO_ENTRE = 1.5                    # Silencio (s) insertado entre grabaciones consecutivas
+MAX_AUDIOS = None                       # Limita el número de grabaciones reproducidas (None = todas)
+ASINCRONO = True                        # Guardado en segundo plano (persistencia_audio) o síncrono como antes
+
+# Grabador a medir: 5_ (grabación por bloques con VAD + guardado en la base de datos)
+grabador = importlib.import_module("5_Grabar_por_bloques_y_DB")
+
+
+def ids_a_reproducir():
+    with sqlite3.connect(DB_INPUT) as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM grabaciones ORDER BY id")]
+    return ids[:MAX_AUDIOS] if MAX_AUDIOS else ids
+
+
+def benchmark():
+    ids = ids_a_reproducir()
+    if not ids:
+        print(f"⚠️ No hay grabaciones en '{DB_INPUT}'.")
+        return
+
+    fuente = FuenteArchivo.desde_db(DB_INPUT, ids, tiempo_real=TIEMPO_REAL, silencio_entre=SILENCIO_ENTRE)
+    print(f"🔊 {len(ids)} grabaciones ({fuente.duracion:.1f} s de audio) | tiempo real: {TIEMPO_REAL}")
+
+    if os.path.exists(DB_PRUEBA):
+        os.remove(DB_PRUEBA)
+    grabador.init_db(DB_PRUEBA)
+
+    t_captura = t_guardado = 0.0
+    segmentos = 0
+    segundos_grabados = 0.0
+    persistencia = grabador.abrir_persistencia(DB_PRUEBA) if ASINCRONO else None
+    t_inicio = time.perf_counter()
+
+    while True:
+        t0 = time.perf_counter()
+        try:
+            archivo, audio, max_rms, duracion = grabador.grabar_por_bloques(fuente=fuente)  # captura + VAD
+        except FinDeAudio:
+            t_captura += time.perf_counter() - t0
+            break
+        t1 = time.perf_counter()
+        t_captura += t1 - t0
+        if not archivo:
+            break
+
+        grabador.save_to_db(archivo, max_rms=max_rms, grabacion_duracion=duracion,
+                            transcripcion_duracion=0.0, db_path=DB_PRUEBA,
+                            audio=audio, persistencia=persistencia)  # persistencia
+        segundos_grabados += len(audio) / grabador.SAMPLE_RATE
+        os.remove(archivo)
+        t_guardado += time.perf_counter() - t1   # tiempo que el grabador no está escuchando
+        segmentos += 1
+
+    t_escucha = time.perf_counter() - t_inicio
+    if persistencia is not None:
+        persistencia.cerrar()
+    t_total = time.perf_counter() - t_inicio
+    audio_procesado = fuente.segundos_leidos
+
+    print("\n===== RENDIMIENTO DE CAPTURA / VAD / GUARDADO =====")
+    print(f"Segmentos grabados: {segmentos} de {len(ids)} grabaciones reproducidas")
+    print(f"Audio procesado: {audio_procesado:.1f} s | Audio guardado: {segundos_grabados:.1f} s")
+    print(f"Tiempo total: {t_total:.2f} s → {audio_procesado / t_total:.1f}x tiempo real")
+    print(f"   → Captura + VAD: {t_captura:.2f} s ({audio_procesado / t_captura:.1f}x tiempo real)")
+    if segmentos:
+        print(f"   → Guardado en BD{' (encolado)' if ASINCRONO else ''}: {t_guardado:.2f} s "
+              f"({1000 * t_guardado / segmentos:.1f} ms por grabación sin escuchar)")
+        if persistencia is not None:
+            print(f"   → Espera final a la cola de guardado: {t_total - t_escucha:.2f} s")
+        print(f"Grabaciones por segundo: {segmentos / t_total:.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
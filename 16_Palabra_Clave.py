@@ -0,0 +1,115 @@
+import sqlite3
+import os
+import time
+import numpy as np
+from formato_audio import leer_blob
+from palabra_clave import DetectorPalabraClave, mfcc, normalizar_cmn, recortar_voz, distancia_dtw
+
+# --- CONFIGURACIÓN ---
+DB_PALABRA_CLAVE = "audios_palabra_clave.db"   # Grabaciones de la frase de activación (tabla 'grabaciones')
+DB_NEGATIVOS = "audios_grabados_frases.db"     # Grabaciones sin la frase de activación (falsas aceptaciones)
+FICHERO_PLANTILLAS = "plantillas_palabra_clave.npz"
+NUM_PLANTILLAS = 5          # Grabaciones usadas como plantillas; el resto se usa para medir la detección
+FACTOR_UMBRAL = 2.0         # umbral = media + FACTOR_UMBRAL * desviación de las distancias entre plantillas
+SAMPLE_RATE = 16000
+FRAME_SIZE = int(SAMPLE_RATE * 30 / 1000)      # Frames de 30 ms, como los entrega el micrófono
+
+
+# === CARGA DE AUDIOS ===
+def leer_audios(db_path):
+    """Devuelve (filename, audio int16) de cada grabación de la base de datos."""
+    audios = []
+    with sqlite3.connect(db_path) as conn:
+        for filename, audio_blob in conn.execute("SELECT filename, audio FROM grabaciones ORDER BY id"):
+            _, audio = leer_blob(audio_blob)
+            audios.append((filename, audio[:, 0] if len(audio.shape) > 1 else audio))
+    return audios
+
+
+# === PLANTILLAS ===
+def crear_plantillas():
+    """Extrae los MFCC de las primeras grabaciones de la palabra clave y calcula el umbral de detección."""
+    audios = leer_audios(DB_PALABRA_CLAVE)
+    if len(audios) < 2:
+        print(f"⚠️ Se necesitan al menos 2 grabaciones de la palabra clave en '{DB_PALABRA_CLAVE}'.")
+        return
+
+    plantillas = [normalizar_cmn(mfcc(recortar_voz(a))) for _, a in audios[:NUM_PLANTILLAS]]
+
+    # Distancias entre plantillas (cada una frente a las demás) para fijar el umbral
+    distancias = []
+    for i, p in enumerate(plantillas):
+        for j, q in enumerate(plantillas):
+            if i != j:
+                ventana = q[-len(p):] if len(q) >= len(p) else q
+                distancias.append(distancia_dtw(normalizar_cmn(ventana), p))
+    umbral = float(np.mean(distancias) + FACTOR_UMBRAL * np.std(distancias))
+
+    np.savez(FICHERO_PLANTILLAS, umbral=umbral,
+             **{f"plantilla_{i:02d}": p for i, p in enumerate(plantillas)})
+    print(f"✅ {len(plantillas)} plantillas guardadas en '{FICHERO_PLANTILLAS}' (umbral: {umbral:.3f}).")
+    print(f"   Longitudes: {[len(p) for p in plantillas]} frames de 10 ms")
+
+
+# === EVALUACIÓN ===
+def pasar_por_detector(detector, audio):
+    """Alimenta el detector frame a frame, como en directo. Devuelve cuántas veces se ha disparado."""
+    detector.reiniciar()
+    disparos = 0
+    for i in range(0, len(audio) - FRAME_SIZE + 1, FRAME_SIZE):
+        if detector.procesar(audio[i:i + FRAME_SIZE]):
+            disparos += 1
+    # Silencio final para que la frase al final del audio se evalúe entera
+    for _ in range(int(0.5 * SAMPLE_RATE / FRAME_SIZE)):
+        if detector.procesar(np.zeros(FRAME_SIZE, dtype=np.int16)):
+            disparos += 1
+    return disparos
+
+
+def evaluar():
+    """Mide la tasa de detección, las falsas aceptaciones y el uso de CPU del detector."""
+    if not os.path.exists(FICHERO_PLANTILLAS):
+        print(f"⚠️ No existe '{FICHERO_PLANTILLAS}'. Crea primero las plantillas.")
+        return
+    detector = DetectorPalabraClave.desde_fichero(FICHERO_PLANTILLAS)
+
+    positivos = leer_audios(DB_PALABRA_CLAVE)[NUM_PLANTILLAS:] if os.path.exists(DB_PALABRA_CLAVE) else []
+    negativos = leer_audios(DB_NEGATIVOS) if os.path.exists(DB_NEGATIVOS) else []
+
+    detectados = sum(1 for _, a in positivos if pasar_por_detector(detector, a) > 0)
+
+    t0 = time.perf_counter()
+    falsas = 0
+    audios_con_falsa = 0
+    segundos_negativos = 0.0
+    for _, audio in negativos:
+        disparos = pasar_por_detector(detector, audio)
+        falsas += disparos
+        audios_con_falsa += disparos > 0
+        segundos_negativos += len(audio) / SAMPLE_RATE
+    t_negativos = time.perf_counter() - t0
+
+    print("\n===== DETECTOR DE PALABRA CLAVE =====")
+    print(f"Plantillas: {len(detector.plantillas)} | Umbral: {detector.umbral:.3f}")
+    if positivos:
+        print(f"Detección: {detectados}/{len(positivos)} ({detectados / len(positivos):.2%})")
+    if negativos:
+        horas = segundos_negativos / 3600
+        print(f"Falsas aceptaciones: {falsas} en {len(negativos)} audios ({audios_con_falsa / len(negativos):.2%} "
+              f"de los audios) → {falsas / horas:.1f} por hora")
+        print(f"Velocidad: {segundos_negativos / t_negativos:.1f}x tiempo real")
+    print(f"Uso de CPU: {detector.uso_cpu:.2%} de un núcleo "
+          f"({detector.evaluaciones} evaluaciones DTW en {detector.muestras_procesadas / SAMPLE_RATE:.1f} s de audio)")
+
+
+if __name__ == "__main__":
+    print("=== DETECTOR DE PALABRA CLAVE ===")
+    print("1) Crear plantillas a partir de las grabaciones de la palabra clave")
+    print("2) Evaluar detección, falsas aceptaciones y uso de CPU")
+    opcion = input("> ").strip()
+    if opcion == "1":
+        crear_plantillas()
+    elif opcion == "2":
+        evaluar()
+    else:
+        print("Opción no válida.")
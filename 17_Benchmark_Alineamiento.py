@@ -0,0 +1,125 @@
+import difflib
+import importlib
+import sqlite3
+import time
+from metricas import alinear, Evaluador
+
+# --- CONFIGURACIÓN ---
+DB_INPUT = "audios_transcritos_frases.db"   # Transcripciones de la prueba final (referencia + transcripción)
+REPETICIONES = 5                            # Se toma el mejor tiempo de varias repeticiones
+NUM_EJEMPLOS = 3                            # Frases en las que difflib y el alineamiento difieren que se muestran
+
+# Misma normalización que la prueba final (programa 13, no necesita Whisper)
+prueba_final = importlib.import_module("13_Ensayo_Final_Remoto")
+
+
+# === MÉTODOS A COMPARAR ===
+def conteos_difflib(ref, hyp):
+    """Recuentos S/D/I tal como se calculaban antes, con difflib.SequenceMatcher."""
+    seq = difflib.SequenceMatcher(None, ref, hyp)
+    S = D = I = 0
+    for tag, i1, i2, j1, j2 in seq.get_opcodes():
+        if tag == "replace":
+            S += max(i2 - i1, j2 - j1)
+        elif tag == "delete":
+            D += i2 - i1
+        elif tag == "insert":
+            I += j2 - j1
+    return S, D, I
+
+
+def conteos_alineamiento(ref, hyp, banda=False):
+    info = alinear(ref, hyp, banda=banda)
+    return info["S"], info["D"], info["I"]
+
+
+METODOS = {
+    "difflib": conteos_difflib,
+    "Levenshtein (completo)": conteos_alineamiento,
+    "Levenshtein (banda)": lambda ref, hyp: conteos_alineamiento(ref, hyp, banda=True),
+}
+
+
+# === BENCHMARK ===
+def cargar_filas():
+    with sqlite3.connect(DB_INPUT) as conn:
+        return conn.execute("SELECT referencia, transcription FROM transcripciones ORDER BY id").fetchall()
+
+
+def cargar_pares(filas):
+    pares = []
+    for referencia, transcripcion in filas:
+        ref = prueba_final.normalize_for_wer(referencia or "")
+        hyp = prueba_final.normalize_for_wer(transcripcion or "")
+        pares.append((ref, hyp))
+    return pares
+
+
+def medir(metodo, pares):
+    """Mejor tiempo de REPETICIONES pasadas y los recuentos de cada par."""
+    mejor = float("inf")
+    for _ in range(REPETICIONES):
+        t0 = time.perf_counter()
+        conteos = [metodo(ref, hyp) for ref, hyp in pares]
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, conteos
+
+
+def comparar(nombre, pares):
+    N = sum(len(ref) for ref, _ in pares)
+    print(f"\n===== {nombre}: {len(pares)} pares, {N} tokens de referencia =====")
+    resultados = {}
+    for metodo, funcion in METODOS.items():
+        tiempo, conteos = medir(funcion, pares)
+        resultados[metodo] = conteos
+        S, D, I = (sum(c[k] for c in conteos) for k in range(3))
+        print(f"{metodo:<24} {tiempo * 1000:8.1f} ms ({1e6 * tiempo / len(pares):6.1f} µs/par) | "
+              f"S={S} D={D} I={I} → error {(S + D + I) / N:.2%}")
+
+    viejos, nuevos = resultados["difflib"], resultados["Levenshtein (completo)"]
+    distintos = [i for i, (a, b) in enumerate(zip(viejos, nuevos)) if a != b]
+    inflados = sum(sum(a) - sum(b) for a, b in zip(viejos, nuevos))
+    print(f"Pares con recuentos distintos: {len(distintos)} ({len(distintos) / len(pares):.1%}) | "
+          f"errores de más con difflib: {inflados}")
+    return distintos
+
+
+def reevaluar(filas):
+    """Tiempo de volver a puntuar todas las transcripciones guardadas (normalización incluida) en bloque."""
+    referencias = [ref for ref, _ in filas]
+    transcripciones = [hyp for _, hyp in filas]
+    prueba_final.normalize_for_wer.vaciar_cache()   # que la normalización no venga hecha de cargar_pares
+    evaluador = Evaluador(prueba_final.normalize_for_wer)
+    t0 = time.perf_counter()
+    _, resumen = evaluador.evaluar_lote(referencias, transcripciones)
+    tiempo = time.perf_counter() - t0
+    print(f"\n===== RE-EVALUACIÓN EN BLOQUE ({resumen['n']} transcripciones, "
+          f"{len(set(referencias))} referencias distintas) =====")
+    print(f"Tiempo: {tiempo * 1000:.1f} ms ({1e6 * tiempo / resumen['n']:.1f} µs por transcripción)")
+    print(f"WER medio: {resumen['wer_medio']:.2%} (global {resumen['wer_global']:.2%}) | "
+          f"CER medio: {resumen['cer_medio']:.2%} (global {resumen['cer_global']:.2%})")
+
+
+def benchmark():
+    filas = cargar_filas()
+    pares = cargar_pares(filas)
+    if not pares:
+        print(f"⚠️ No hay transcripciones en '{DB_INPUT}'.")
+        return
+
+    palabras = [(ref.split(), hyp.split()) for ref, hyp in pares]
+    caracteres = [(ref.replace(" ", ""), hyp.replace(" ", "")) for ref, hyp in pares]
+    comparar("WER (palabras)", palabras)
+    distintos = comparar("CER (caracteres)", caracteres)
+
+    for i in distintos[:NUM_EJEMPLOS]:
+        ref, hyp = caracteres[i]
+        print(f"\nREF: {ref}\nHYP: {hyp}")
+        print(f"   difflib S/D/I = {conteos_difflib(ref, hyp)} | Levenshtein S/D/I = {conteos_alineamiento(ref, hyp)}")
+        print("   " + " ".join(f"{op}:{r or '-'}/{h or '-'}" for op, r, h in alinear(ref, hyp)["alineamiento"] if op != "M"))
+
+    reevaluar(filas)
+
+
+if __name__ == "__main__":
+    benchmark()
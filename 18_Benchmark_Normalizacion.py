@@ -0,0 +1,115 @@
+import glob
+import importlib
+import re
+import sqlite3
+import time
+import unicodedata
+from metricas import NormalizadorTexto
+
+# --- CONFIGURACIÓN ---
+DB_PATRON = "audios_transcritos*.db"   # Bases de datos con transcripciones (columna 'transcription')
+REPETICIONES = 5                       # Pasadas sobre todos los textos; se toma la mejor
+NUM_EJEMPLOS = 5                       # Diferencias que se muestran si las hubiera
+
+# Referencias y diccionario de números de la prueba final (programa 13, no necesita Whisper)
+prueba_final = importlib.import_module("13_Ensayo_Final_Remoto")
+
+
+# === NORMALIZACIÓN ORIGINAL (tal como estaba en los programas 12 y 13) ===
+def quitar_tildes_original(text):
+    if text is None:
+        return ""
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', text)
+        if unicodedata.category(c) != 'Mn'
+    )
+
+
+def texto_a_numero_original(text):
+    tokens = re.findall(r"\d+|\w+", text, flags=re.UNICODE)
+    salida = []
+    for t in tokens:
+        t_low = quitar_tildes_original(t.lower())
+        if t_low in prueba_final.NUMEROS:
+            salida.append(str(prueba_final.NUMEROS[t_low]))
+        else:
+            salida.append(t_low)
+    return " ".join(salida)
+
+
+def normalize_original(text):
+    if text is None:
+        return ""
+    text = text.lower()
+    text = quitar_tildes_original(text)
+    text = text.replace("-", " ")
+    text = re.sub(r"[^\w\s]", " ", text)
+    text = texto_a_numero_original(text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+# === BENCHMARK ===
+def cargar_textos():
+    """Referencias de la prueba final más todas las transcripciones guardadas."""
+    textos = list(prueba_final.REFERENCIAS)
+    for db_path in sorted(glob.glob(DB_PATRON)):
+        with sqlite3.connect(db_path) as conn:
+            textos.extend(t for (t,) in conn.execute("SELECT transcription FROM transcripciones") if t)
+    return textos
+
+
+def medir(funcion, textos, preparar=None):
+    """Mejor tiempo de REPETICIONES pasadas; 'preparar' se llama antes de cada una (p. ej. vaciar cachés)."""
+    mejor = float("inf")
+    for _ in range(REPETICIONES):
+        if preparar:
+            preparar()
+        t0 = time.perf_counter()
+        for texto in textos:
+            funcion(texto)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def benchmark():
+    textos = cargar_textos()
+    caracteres = sum(len(t) for t in textos)
+    print(f"📝 {len(textos)} textos ({len(set(textos))} distintos, {caracteres} caracteres)")
+
+    # Comprobación de equivalencia con la versión original (conversión de números palabra a palabra)
+    palabra_a_palabra = NormalizadorTexto(prueba_final.NUMEROS, compuestos=False)
+    diferencias = [(t, normalize_original(t), palabra_a_palabra(t)) for t in textos
+                   if normalize_original(t) != palabra_a_palabra(t)]
+    print(f"Salidas distintas de la versión original: {len(diferencias)}")
+    for texto, original, nuevo in diferencias[:NUM_EJEMPLOS]:
+        print(f"   {texto!r}\n      original: {original!r}\n      compilado: {nuevo!r}")
+
+    # Textos que cambian al leer los numerales compuestos enteros
+    compilado = NormalizadorTexto(prueba_final.NUMEROS)
+    cambios = [(palabra_a_palabra(t), compilado(t)) for t in set(textos) if palabra_a_palabra(t) != compilado(t)]
+    print(f"Textos distintos con numerales compuestos: {len(cambios)}")
+    for antes, despues in cambios[:NUM_EJEMPLOS]:
+        print(f"   {antes!r} → {despues!r}")
+
+    sin_cache = NormalizadorTexto(prueba_final.NUMEROS, tam_cache=0)
+    frio = NormalizadorTexto(prueba_final.NUMEROS)
+    variantes = [
+        ("Original (re + unicodedata)", normalize_original, None),
+        ("Palabra a palabra, sin caché", NormalizadorTexto(prueba_final.NUMEROS, tam_cache=0, compuestos=False), None),
+        ("Compilado, sin caché de textos", sin_cache, None),
+        ("Compilado, caché vacía", frio, frio.vaciar_cache),
+        ("Compilado, caché llena", compilado, None),
+    ]
+
+    print("\n===== RENDIMIENTO DE LA NORMALIZACIÓN =====")
+    t_original = None
+    for nombre, funcion, preparar in variantes:
+        tiempo = medir(funcion, textos, preparar)
+        t_original = t_original or tiempo
+        print(f"{nombre:<30} {tiempo * 1000:8.1f} ms | {len(textos) / tiempo:10.0f} textos/s | "
+              f"{caracteres / tiempo / 1e6:6.2f} M caracteres/s | x{t_original / tiempo:.1f}")
+
+
+if __name__ == "__main__":
+    benchmark()
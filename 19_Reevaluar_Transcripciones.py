@@ -0,0 +1,154 @@
+import hashlib
+import importlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+from metricas import Evaluador, COLUMNAS_RECUENTOS, recuentos
+from consultas import agregar_columnas
+
+# --- CONFIGURACIÓN ---
+# Ensayo → (base de datos de transcripciones, programa del que se toman la referencia y la normalización).
+# Se usan las versiones remotas (8, 11 y 13) porque normalizan igual que las locales y no necesitan Whisper.
+ENSAYOS = {
+    "volumen": ("audios_transcritos.db", "8_Ensayo_Volumen_Remoto"),
+    "distancia": ("audios_transcritos_distancia.db", "11_Ensayo_Distancia_Remoto"),
+    "frases": ("audios_transcritos_frases.db", "13_Ensayo_Final_Remoto"),
+}
+COLUMNAS_GRUPO = ("model", "tipo")   # Columnas por las que se desglosa el resumen si existen
+
+
+# === BASE DE DATOS ===
+def init_tablas(conn):
+    """Tablas de conjuntos de resultados versionados, junto a las transcripciones originales."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS evaluaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TEXT,
+            descripcion TEXT,
+            huella TEXT,
+            n INTEGER,
+            wer_medio REAL,
+            cer_medio REAL,
+            wer_global REAL,
+            cer_global REAL,
+            tiempo_seg REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS evaluaciones_detalle (
+            evaluacion_id INTEGER,
+            transcripcion_id INTEGER,
+            wer REAL,
+            cer REAL,
+            PRIMARY KEY (evaluacion_id, transcripcion_id)
+        )
+    """)
+    agregar_columnas(conn, "evaluaciones_detalle", [(c, "INTEGER") for c in COLUMNAS_RECUENTOS])
+
+
+def columnas(conn, tabla):
+    return [fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")]
+
+
+def huella_metricas(programa):
+    """Hash del código que define las métricas (metricas.py y el programa de la referencia/normalización)."""
+    h = hashlib.sha1()
+    for ruta in ("metricas.py", f"{programa}.py"):
+        with open(ruta, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+# === RE-EVALUACIÓN ===
+def reevaluar(ensayo, descripcion=""):
+    db_path, programa = ENSAYOS[ensayo]
+    if not os.path.exists(db_path):
+        print(f"⚠️ No existe '{db_path}'.")
+        return
+    modulo = importlib.import_module(programa)
+
+    t0 = time.perf_counter()
+    with sqlite3.connect(db_path) as conn:
+        init_tablas(conn)
+        cols = columnas(conn, "transcripciones")
+        grupo = next((c for c in COLUMNAS_GRUPO if c in cols), None)
+        referencia = "referencia" if "referencia" in cols else "NULL"
+        filas = conn.execute(f"""
+            SELECT id, transcription, {referencia}, wer, cer, {grupo or 'NULL'}
+            FROM transcripciones ORDER BY id
+        """).fetchall()
+        if not filas:
+            print(f"⚠️ No hay transcripciones en '{db_path}'.")
+            return
+
+        referencias = [ref if ref is not None else modulo.REFERENCIA for _, _, ref, _, _, _ in filas]
+        transcripciones = [texto for _, texto, _, _, _, _ in filas]
+        resultados, resumen = Evaluador(modulo.normalize_for_wer).evaluar_lote(referencias, transcripciones)
+        t_calculo = time.perf_counter() - t0
+
+        cursor = conn.execute("""
+            INSERT INTO evaluaciones (fecha, descripcion, huella, n, wer_medio, cer_medio, wer_global, cer_global,
+                                      tiempo_seg)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (datetime.now().isoformat(timespec="seconds"), descripcion, huella_metricas(programa), resumen["n"],
+              resumen["wer_medio"], resumen["cer_medio"], resumen["wer_global"], resumen["cer_global"], t_calculo))
+        version = cursor.lastrowid
+        conn.executemany(f"""
+            INSERT INTO evaluaciones_detalle (evaluacion_id, transcripcion_id, wer, cer, {", ".join(COLUMNAS_RECUENTOS)})
+            VALUES (?, ?, ?, ?, {", ".join("?" for _ in COLUMNAS_RECUENTOS)})
+        """, [(version, fila[0], wer_info["wer"], cer_info["cer"], *recuentos(wer_info, cer_info))
+              for fila, (wer_info, cer_info) in zip(filas, resultados)])
+        conn.commit()
+    t_total = time.perf_counter() - t0
+
+    # === RESUMEN ===
+    originales = [(f[3], f[4]) for f in filas if f[3] is not None]
+    print(f"\n===== ENSAYO DE {ensayo.upper()}: versión {version} de las métricas ({db_path}) =====")
+    print(f"{resumen['n']} transcripciones re-evaluadas en {t_calculo:.2f} s ({t_total:.2f} s con el guardado)")
+    print(f"WER medio: {resumen['wer_medio']:.2%} (global {resumen['wer_global']:.2%}) | "
+          f"CER medio: {resumen['cer_medio']:.2%} (global {resumen['cer_global']:.2%})")
+    if originales:
+        wer_orig = sum(w for w, _ in originales) / len(originales)
+        cer_orig = sum(c for _, c in originales) / len(originales)
+        print(f"Valores guardados al transcribir → WER medio: {wer_orig:.2%} | CER medio: {cer_orig:.2%}")
+
+    if grupo:
+        por_grupo = {}
+        for fila, (wer_info, cer_info) in zip(filas, resultados):
+            por_grupo.setdefault(fila[5], []).append((wer_info["wer"], cer_info["cer"]))
+        for clave in sorted(por_grupo, key=str):
+            valores = por_grupo[clave]
+            print(f"   {grupo} {clave}: WER {sum(w for w, _ in valores) / len(valores):.2%} | "
+                  f"CER {sum(c for _, c in valores) / len(valores):.2%} ({len(valores)} audios)")
+
+
+def listar_versiones(ensayo):
+    db_path, _ = ENSAYOS[ensayo]
+    if not os.path.exists(db_path):
+        return
+    with sqlite3.connect(db_path) as conn:
+        init_tablas(conn)
+        versiones = conn.execute("""
+            SELECT id, fecha, huella, n, wer_medio, cer_medio, descripcion FROM evaluaciones ORDER BY id
+        """).fetchall()
+    print(f"\n--- {ensayo} ({db_path}): {len(versiones)} versiones ---")
+    for version, fecha, huella, n, wer, cer, descripcion in versiones:
+        print(f"   v{version} {fecha} [{huella}] n={n} WER {wer:.2%} | CER {cer:.2%} {descripcion or ''}")
+
+
+if __name__ == "__main__":
+    print("=== RE-EVALUACIÓN DE TRANSCRIPCIONES GUARDADAS ===")
+    print("Ensayos: " + ", ".join(ENSAYOS) + " (vacío = todos, 'lista' = ver versiones)")
+    opcion = input("> ").strip().lower()
+    if opcion == "lista":
+        for nombre in ENSAYOS:
+            listar_versiones(nombre)
+    else:
+        elegidos = [opcion] if opcion else list(ENSAYOS)
+        if any(e not in ENSAYOS for e in elegidos):
+            print("Ensayo no válido.")
+        else:
+            descripcion = input("Descripción de esta versión de las métricas (opcional): ").strip()
+            for nombre in elegidos:
+                reevaluar(nombre, descripcion)
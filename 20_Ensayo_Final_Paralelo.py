@@ -0,0 +1,155 @@
+import importlib
+import os
+import sqlite3
+import time
+import numpy as np
+from multiprocessing import Barrier, Pool
+from datetime import datetime
+from metricas import Evaluador
+from procesado_audio import leer_wav_blob, a_float32
+from dataset_pcm import DatasetPCM
+
+# --- CONFIGURACIÓN ---
+DB_INPUT = "audios_grabados_frases.db"
+DB_OUTPUT = "evaluacion_paralela.db"   # Resumen de rendimiento de cada configuración
+MODELOS = ["tiny", "base", "small"]
+NUCLEOS = os.cpu_count()               # 4 en la Raspberry Pi 4
+# Procesos × hilos de PyTorch por proceso (= NUCLEOS). El primero es la referencia: un proceso con todos los hilos
+CONFIGURACIONES = [(w, NUCLEOS // w) for w in (1, 2, 4) if w <= NUCLEOS and NUCLEOS % w == 0]
+MAX_AUDIOS = 70                        # Audios evaluados, repartidos por todos los tipos (None = todos)
+OPCIONES_DECODIFICACION = {"language": "es", "fp16": False}
+
+# Referencias y normalización de la prueba final (programa 13, no necesita Whisper en este proceso)
+prueba_final = importlib.import_module("13_Ensayo_Final_Remoto")
+
+# Modelo de cada proceso del pool y exportación PCM de los audios, si la hay (se abren en el inicializador)
+_MODELO = None
+_PCM = None
+
+
+# === PROCESOS DEL POOL ===
+def _init_worker(modelo, hilos, barrera, ruta_pcm=None):
+    """Carga el modelo en el proceso y limita los hilos de PyTorch; espera a que todos estén listos."""
+    global _MODELO, _PCM
+    import torch
+    import whisper
+    torch.set_num_threads(hilos)
+    _MODELO = whisper.load_model(modelo)
+    _PCM = DatasetPCM(ruta_pcm) if ruta_pcm else None   # memmap: todos los procesos comparten las páginas
+    barrera.wait()
+
+
+def _listo(_):
+    return os.getpid()
+
+
+def transcribir(tarea):
+    indice, fuente = tarea   # BLOB del audio, o su posición en la exportación PCM
+    audio = a_float32(_PCM.audio(fuente) if _PCM is not None else leer_wav_blob(fuente))
+    t0 = time.perf_counter()
+    texto = _MODELO.transcribe(audio, **OPCIONES_DECODIFICACION).get("text", "").strip()
+    return indice, texto, time.perf_counter() - t0
+
+
+# === DATOS ===
+def obtener_audios():
+    """
+    Selecciona MAX_AUDIOS grabaciones repartidas de forma uniforme entre todas (y así entre los tipos).
+    Devuelve la lista de (filename, audio, tipo, frase) y la ruta de la exportación PCM (programa 25) si está al
+    día; en ese caso 'audio' es la posición en ella y los procesos leen las muestras del fichero compartido.
+    """
+    pcm = DatasetPCM.si_actualizado(DB_INPUT)
+    if pcm is not None:
+        posiciones = pcm.orden("tipo", "frase", "version")
+        if MAX_AUDIOS and len(posiciones) > MAX_AUDIOS:
+            posiciones = [posiciones[int(i * len(posiciones) / MAX_AUDIOS)] for i in range(MAX_AUDIOS)]
+        indice = pcm.indice
+        return [(str(indice["filename"][p]), int(p), int(indice["tipo"][p]), int(indice["frase"][p]))
+                for p in posiciones], pcm.ruta
+    with sqlite3.connect(DB_INPUT) as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM grabaciones ORDER BY tipo, frase, version")]
+        if MAX_AUDIOS and len(ids) > MAX_AUDIOS:
+            ids = [ids[int(i * len(ids) / MAX_AUDIOS)] for i in range(MAX_AUDIOS)]
+        audios = []
+        for audio_id in ids:
+            audios.append(conn.execute("SELECT filename, audio, tipo, frase FROM grabaciones WHERE id = ?",
+                                       (audio_id,)).fetchone())
+    return audios, None
+
+
+def init_db():
+    with sqlite3.connect(DB_OUTPUT) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rendimiento_paralelo (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha TEXT,
+                modelo TEXT,
+                procesos INTEGER,
+                hilos INTEGER,
+                num_audios INTEGER,
+                tiempo_carga REAL,
+                tiempo_total REAL,
+                audios_por_segundo REAL,
+                aceleracion REAL,
+                latencia_media REAL,
+                wer_medio REAL,
+                cer_medio REAL
+            )
+        """)
+        conn.commit()
+
+
+# === BENCHMARK ===
+def evaluar_configuracion(modelo, procesos, hilos, audios, ruta_pcm=None):
+    """Transcribe todos los audios con 'procesos' procesos de 'hilos' hilos. Devuelve tiempos y resultados."""
+    tareas = [(i, fuente) for i, (_, fuente, _, _) in enumerate(audios)]
+    t0 = time.perf_counter()
+    with Pool(procesos, initializer=_init_worker, initargs=(modelo, hilos, Barrier(procesos), ruta_pcm)) as pool:
+        pool.map(_listo, range(procesos), chunksize=1)   # vuelve cuando todos los modelos están cargados
+        t1 = time.perf_counter()
+        resultados = sorted(pool.imap_unordered(transcribir, tareas, chunksize=1))
+        t2 = time.perf_counter()
+    return t1 - t0, t2 - t1, resultados
+
+
+def benchmark():
+    audios, ruta_pcm = obtener_audios()
+    if not audios:
+        print(f"⚠️ No hay grabaciones en '{DB_INPUT}'.")
+        return
+    init_db()
+    evaluador = Evaluador(prueba_final.normalize_for_wer)
+    referencias = [prueba_final.get_referencia(tipo, frase) for _, _, tipo, frase in audios]
+    print(f"🔊 {len(audios)} audios | {NUCLEOS} núcleos | configuraciones (procesos × hilos): {CONFIGURACIONES}")
+    if ruta_pcm:
+        print(f"📦 Audios leídos de la exportación PCM '{ruta_pcm}.pcm' (programa 25)")
+
+    filas = []
+    for modelo in MODELOS:
+        print(f"\n===== MODELO {modelo.upper()} =====")
+        referencia = None
+        for procesos, hilos in CONFIGURACIONES:
+            t_carga, t_total, resultados = evaluar_configuracion(modelo, procesos, hilos, audios, ruta_pcm)
+            _, resumen = evaluador.evaluar_lote(referencias, [texto for _, texto, _ in resultados])
+            velocidad = len(audios) / t_total
+            referencia = referencia or velocidad
+            latencia = float(np.mean([t for _, _, t in resultados]))
+            print(f"{procesos} procesos × {hilos} hilos: {velocidad:.3f} audios/s (x{velocidad / referencia:.2f}) | "
+                  f"latencia media {latencia:.2f} s | carga {t_carga:.1f} s | "
+                  f"WER {resumen['wer_medio']:.2%} | CER {resumen['cer_medio']:.2%}")
+            filas.append((datetime.now().isoformat(timespec="seconds"), modelo, procesos, hilos, len(audios),
+                          t_carga, t_total, velocidad, velocidad / referencia, latencia,
+                          resumen["wer_medio"], resumen["cer_medio"]))
+
+    with sqlite3.connect(DB_OUTPUT) as conn:
+        conn.executemany("""
+            INSERT INTO rendimiento_paralelo (fecha, modelo, procesos, hilos, num_audios, tiempo_carga, tiempo_total,
+                                              audios_por_segundo, aceleracion, latencia_media, wer_medio, cer_medio)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, filas)
+        conn.commit()
+    print(f"\n✅ Resultados guardados en '{DB_OUTPUT}'.")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,26 @@
+import importlib
+import os
+from latencias import completar_duraciones, imprimir_informe
+
+# --- CONFIGURACIÓN ---
+# Desgloses del informe (columnas de la tabla de transcripciones)
+GRUPOS = ["tipo", "model", "model, tipo"]
+
+# Bases de datos y esquema de la prueba final (programa 13, no necesita Whisper)
+prueba_final = importlib.import_module("13_Ensayo_Final_Remoto")
+
+
+def informe():
+    if not os.path.exists(prueba_final.DB_OUTPUT):
+        print(f"⚠️ No existe '{prueba_final.DB_OUTPUT}'.")
+        return
+    prueba_final.init_db()   # añade duracion_audio y rtf a bases de datos anteriores
+    completadas = completar_duraciones(prueba_final.DB_OUTPUT, prueba_final.DB_INPUT)
+    if completadas:
+        print(f"📏 Duración del audio y RTF añadidos a {completadas} transcripciones anteriores.")
+    for grupo in GRUPOS:
+        imprimir_informe(prueba_final.DB_OUTPUT, grupo)
+
+
+if __name__ == "__main__":
+    informe()
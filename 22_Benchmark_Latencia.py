@@ -0,0 +1,152 @@
+import sqlite3
+import time
+import numpy as np
+from multiprocessing import get_context
+from latencias import duracion_wav, intervalo
+from procesado_audio import leer_wav_blob, a_float32
+from registro_ejecuciones import registrar, finalizar
+
+# --- CONFIGURACIÓN ---
+DB_INPUT = "audios_grabados_frases.db"
+DB_OUTPUT = "benchmark_latencia.db"    # Todas las medidas, para repetir el análisis o comparar ejecuciones
+MODELOS = ["tiny", "base", "small"]
+ARRANQUES_EN_FRIO = 3                  # Procesos nuevos por modelo: carga + primera transcripción
+CALENTAMIENTO = 2                      # Transcripciones sin medir antes de las medidas en caliente
+REPETICIONES = 5                       # Transcripciones medidas de cada audio en caliente
+NUM_AUDIOS = 14                        # Audios medidos, repartidos por todos los tipos
+CONFIANZA = 0.95                       # Nivel de los intervalos de confianza
+OPCIONES_DECODIFICACION = {"language": "es", "fp16": False}
+
+# "En frío" significa proceso nuevo (import, carga del modelo y primera llamada). La caché de páginas del
+# sistema operativo se conserva entre arranques; vaciarla requiere root (echo 3 > /proc/sys/vm/drop_caches).
+
+
+# === ARRANQUE EN FRÍO (en un proceso nuevo) ===
+def _arranque_en_frio(modelo, audio_blob):
+    t0 = time.perf_counter()
+    import whisper
+    model = whisper.load_model(modelo)
+    t1 = time.perf_counter()
+    model.transcribe(a_float32(leer_wav_blob(audio_blob)), **OPCIONES_DECODIFICACION)
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1
+
+
+def arranques_en_frio(modelo, audio_blob):
+    """Cada arranque en un proceso 'spawn' recién creado, sin nada heredado del proceso principal."""
+    contexto = get_context("spawn")
+    tiempos = []
+    for _ in range(ARRANQUES_EN_FRIO):
+        with contexto.Pool(1) as pool:
+            tiempos.append(pool.apply(_arranque_en_frio, (modelo, audio_blob)))
+    return np.array(tiempos)
+
+
+# === DATOS ===
+def obtener_audios():
+    """Selecciona NUM_AUDIOS grabaciones repartidas de forma uniforme entre todas (y así entre los tipos)."""
+    with sqlite3.connect(DB_INPUT) as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM grabaciones ORDER BY tipo, frase, version")]
+        if NUM_AUDIOS and len(ids) > NUM_AUDIOS:
+            ids = [ids[int(i * len(ids) / NUM_AUDIOS)] for i in range(NUM_AUDIOS)]
+        audios = []
+        for audio_id in ids:
+            audios.append(conn.execute("SELECT filename, audio, tipo FROM grabaciones WHERE id = ?",
+                                       (audio_id,)).fetchone())
+    return audios
+
+
+def init_db():
+    with sqlite3.connect(DB_OUTPUT) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS medidas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ejecucion TEXT,
+                modelo TEXT,
+                fase TEXT,
+                filename TEXT,
+                tipo INTEGER,
+                repeticion INTEGER,
+                tiempo_seg REAL,
+                duracion_audio REAL,
+                rtf REAL
+            )
+        """)
+        conn.commit()
+
+
+# === BENCHMARK ===
+def benchmark():
+    import whisper
+
+    audios = obtener_audios()
+    if not audios:
+        print(f"⚠️ No hay grabaciones en '{DB_INPUT}'.")
+        return
+    init_db()
+    ejecucion = registrar(DB_OUTPUT, globals(), MODELOS)
+    entradas = [a_float32(leer_wav_blob(blob)) for _, blob, _ in audios]   # decodificadas fuera de las medidas
+    duraciones = np.array([duracion_wav(blob) for _, blob, _ in audios])
+    print(f"🔊 {len(audios)} audios | {ARRANQUES_EN_FRIO} arranques en frío | {CALENTAMIENTO} de calentamiento | "
+          f"{REPETICIONES} repeticiones | intervalos al {CONFIANZA:.0%}")
+
+    for modelo in MODELOS:
+        print(f"\n===== MODELO {modelo.upper()} =====")
+        filas = []
+        primero, blob, tipo_primero = audios[0]
+
+        frio = arranques_en_frio(modelo, blob)
+        for i, (t_carga, t_primera) in enumerate(frio, 1):
+            filas.append((ejecucion, modelo, "carga", primero, tipo_primero, i, t_carga, None, None))
+            filas.append((ejecucion, modelo, "frio", primero, tipo_primero, i, t_primera, duraciones[0],
+                          t_primera / duraciones[0]))
+
+        model = whisper.load_model(modelo)
+        for _ in range(CALENTAMIENTO):
+            model.transcribe(entradas[0], **OPCIONES_DECODIFICACION)
+
+        # Repeticiones en bloques intercalados (todos los audios, luego otra vez...) para no confundir
+        # una deriva lenta (temperatura de la CPU, otros procesos) con diferencias entre audios
+        caliente = np.empty((len(audios), REPETICIONES))
+        for r in range(REPETICIONES):
+            for i, entrada in enumerate(entradas):
+                t0 = time.perf_counter()
+                model.transcribe(entrada, **OPCIONES_DECODIFICACION)
+                caliente[i, r] = time.perf_counter() - t0
+        for i, (filename, _, tipo) in enumerate(audios):
+            for r in range(REPETICIONES):
+                filas.append((ejecucion, modelo, "caliente", filename, tipo, r + 1, caliente[i, r], duraciones[i],
+                              caliente[i, r] / duraciones[i]))
+
+        with sqlite3.connect(DB_OUTPUT) as conn:
+            conn.executemany("""
+                INSERT INTO medidas (ejecucion, modelo, fase, filename, tipo, repeticion, tiempo_seg,
+                                     duracion_audio, rtf)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, filas)
+            conn.commit()
+
+        # === RESUMEN ===
+        mediana_audio = np.median(caliente, axis=1)        # latencia estable de cada audio
+        rtf_audio = mediana_audio / duraciones
+        variacion = np.std(caliente, axis=1, ddof=1) / np.mean(caliente, axis=1) if REPETICIONES > 1 else None
+        carga, carga_ic = intervalo(frio[:, 0], CONFIANZA)
+        primera, primera_ic = intervalo(frio[:, 1], CONFIANZA)
+        estable, estable_ic = intervalo(mediana_audio, CONFIANZA)
+        rtf, rtf_ic = intervalo(rtf_audio, CONFIANZA)
+        print(f"Carga del modelo (proceso nuevo): {carga:.2f} s ± {carga_ic:.2f}")
+        print(f"Primera transcripción (en frío):  {primera:.2f} s ± {primera_ic:.2f} "
+              f"(x{primera / mediana_audio[0]:.2f} la del mismo audio en caliente)")
+        print(f"En caliente (mediana por audio):  {estable:.2f} s ± {estable_ic:.2f} | RTF {rtf:.2f} ± {rtf_ic:.2f}")
+        print(f"   p50 {np.percentile(caliente, 50):.2f} s | p90 {np.percentile(caliente, 90):.2f} s | "
+              f"máx {np.max(caliente):.2f} s")
+        if variacion is not None:
+            print(f"   Variación entre repeticiones del mismo audio: {np.median(variacion):.1%} (mediana) | "
+                  f"{np.max(variacion):.1%} (máx)")
+
+    finalizar(DB_OUTPUT, ejecucion)
+    print(f"\n✅ Medidas guardadas en '{DB_OUTPUT}' (ejecución {ejecucion}).")
+
+
+if __name__ == "__main__":
+    benchmark()
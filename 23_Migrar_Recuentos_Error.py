@@ -0,0 +1,86 @@
+import importlib
+import os
+import sqlite3
+from metricas import COLUMNAS_RECUENTOS, leer_detalles, tasa_global_sql
+from consultas import existe_tabla
+
+# --- CONFIGURACIÓN ---
+# Bases de datos cuyas transcripciones guardaban los recuentos como texto (str del diccionario) y programa
+# que define su esquema. Se usan las versiones remotas (8 y 11) porque no necesitan Whisper.
+ENSAYOS = {
+    "audios_transcritos.db": "8_Ensayo_Volumen_Remoto",
+    "audios_transcritos_distancia.db": "11_Ensayo_Distancia_Remoto",
+}
+
+# Los conjuntos de resultados de la re-evaluación (programa 19) también guardaban los detalles como texto
+reevaluacion = importlib.import_module("19_Reevaluar_Transcripciones")
+
+
+def migrar_tabla(conn, tabla):
+    """
+    Rellena las columnas de recuentos de las filas que sólo tienen wer_details/cer_details en texto.
+    Devuelve (filas migradas, filas cuyo texto no se pudo leer).
+    """
+    if "wer_details" not in reevaluacion.columnas(conn, tabla):
+        return 0, 0
+    filas = conn.execute(f"""
+        SELECT rowid, wer_details, cer_details FROM {tabla}
+        WHERE wer_n IS NULL AND wer_details IS NOT NULL
+    """).fetchall()
+    valores = []
+    for rowid, wer_texto, cer_texto in filas:
+        wer, cer = leer_detalles(wer_texto), leer_detalles(cer_texto)
+        if wer is not None and cer is not None:
+            valores.append((*wer, *cer, rowid))
+    asignaciones = ", ".join(f"{c} = ?" for c in COLUMNAS_RECUENTOS)
+    conn.executemany(f"UPDATE {tabla} SET {asignaciones} WHERE rowid = ?", valores)
+    return len(valores), len(filas) - len(valores)
+
+
+# === MIGRACIÓN ===
+def migrar():
+    bases = dict.fromkeys([*ENSAYOS, *(db for db, _ in reevaluacion.ENSAYOS.values())])
+    for db_path in bases:
+        if not os.path.exists(db_path):
+            print(f"⚠️ No existe '{db_path}'.")
+            continue
+        if db_path in ENSAYOS:
+            importlib.import_module(ENSAYOS[db_path]).init_db_transcripciones(db_path)   # añade las columnas
+        with sqlite3.connect(db_path) as conn:
+            tablas = []
+            if db_path in ENSAYOS:
+                tablas.append("transcripciones")
+            if existe_tabla(conn, "evaluaciones_detalle"):
+                reevaluacion.init_tablas(conn)
+                tablas.append("evaluaciones_detalle")
+            for tabla in tablas:
+                migradas, ilegibles = migrar_tabla(conn, tabla)
+                if migradas or ilegibles:
+                    print(f"🔢 {db_path} ({tabla}): recuentos numéricos añadidos a {migradas} filas"
+                          + (f" | {ilegibles} con detalles ilegibles" if ilegibles else ""))
+            conn.commit()
+
+
+# === RESUMEN ===
+def resumen():
+    """WER y CER global (errores totales / tokens totales) de cada ensayo, con una sola consulta por ensayo."""
+    for db_path in ENSAYOS:
+        if not os.path.exists(db_path):
+            continue
+        with sqlite3.connect(db_path) as conn:
+            cols = reevaluacion.columnas(conn, "transcripciones")
+            grupo = next((c for c in reevaluacion.COLUMNAS_GRUPO if c in cols), "NULL")
+            filas = conn.execute(f"""
+                SELECT {grupo}, COUNT(*), {tasa_global_sql('wer')}, {tasa_global_sql('cer')}
+                FROM transcripciones WHERE wer_n IS NOT NULL
+                GROUP BY {grupo} ORDER BY {grupo}
+            """).fetchall()
+        print(f"\n===== WER/CER GLOBAL: {db_path} =====")
+        for clave, n, wer, cer in filas:
+            etiqueta = f"{grupo} {clave}: " if clave is not None else ""
+            print(f"   {etiqueta}WER {wer:.2%} | CER {cer:.2%} ({n} transcripciones)")
+
+
+if __name__ == "__main__":
+    migrar()
+    resumen()
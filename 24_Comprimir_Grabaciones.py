@@ -0,0 +1,146 @@
+import glob
+import os
+import sqlite3
+import statistics
+import time
+import numpy as np
+from dataset_audio import DatasetAudio
+from formato_audio import formato_blob, leer_blob, recodificar
+from manifiesto import hash_audio
+
+# --- CONFIGURACIÓN ---
+DBS_GRABACIONES = sorted(glob.glob("audios_*.db"))   # Se migran las que tengan alguna de las TABLAS
+TABLAS = ("grabaciones", "audios")                   # Tablas con columna 'audio' (6_ y grabadores finales, 5_)
+FORMATO_DESTINO = "flac"        # "flac" comprime sin pérdidas; "wav" deshace la migración
+DBS_MANIFIESTO = ["audios_transcritos_frases.db"]    # Manifiestos (12 y 13) que identifican los audios por su hash
+LOTE = 100                      # Audios recodificados por transacción
+PASADAS_LECTURA = 3             # Lecturas completas para medir la velocidad (se toma la mediana)
+COMPACTAR = True                # VACUUM al terminar: sin él el fichero no se reduce (necesita espacio libre temporal)
+
+
+def tablas_audio(db_path):
+    with sqlite3.connect(db_path) as conn:
+        existentes = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [t for t in TABLAS if t in existentes]
+
+
+def ids_con_audio(db_path, tabla):
+    with sqlite3.connect(db_path) as conn:
+        return [fila[0] for fila in conn.execute(f"SELECT rowid FROM {tabla} WHERE audio IS NOT NULL ORDER BY rowid")]
+
+
+def formatos(db_path, tabla):
+    """Número de audios en cada formato, mirando sólo la cabecera ('fLaC') en SQL."""
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute(f"""
+            SELECT CASE WHEN substr(audio, 1, 4) = X'664C6143' THEN 'flac' ELSE 'wav' END, COUNT(*)
+            FROM {tabla} WHERE audio IS NOT NULL GROUP BY 1
+        """).fetchall())
+
+
+# === MEDIDA DE LECTURA ===
+def medir_lectura(db_path, tabla):
+    """
+    Lee y decodifica todos los audios de la tabla como lo hacen los programas de evaluación (DatasetAudio).
+    Devuelve (audios, segundos, bytes leídos, segundos de audio), con el tiempo mediano de PASADAS_LECTURA.
+    """
+    dataset = DatasetAudio(db_path, tabla)
+    rowids = ids_con_audio(db_path, tabla)
+    tiempos = []
+    for _ in range(PASADAS_LECTURA):
+        leidos = segundos_audio = 0
+        t0 = time.perf_counter()
+        for _, audio_blob in dataset.audios(rowids):
+            rate, audio = leer_blob(audio_blob)
+            leidos += len(audio_blob)
+            segundos_audio += len(audio) / rate
+        tiempos.append(time.perf_counter() - t0)
+    return len(rowids), statistics.median(tiempos), leidos, segundos_audio
+
+
+# === MIGRACIÓN ===
+def actualizar_manifiestos(cambios):
+    """Los audios recodificados cambian de hash: se actualiza en los manifiestos para no volver a transcribirlos."""
+    for db_path in DBS_MANIFIESTO:
+        if not os.path.exists(db_path):
+            continue
+        with sqlite3.connect(db_path) as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'manifiesto'").fetchone():
+                conn.executemany("UPDATE manifiesto SET audio_hash = ? WHERE audio_hash = ?", cambios)
+                conn.commit()
+
+
+def migrar_tabla(db_path, tabla, formato):
+    """
+    Recodifica a 'formato' los audios de la tabla que estén en otro, por lotes de LOTE en una transacción cada
+    uno. Cada audio se decodifica de nuevo y se compara con el original antes de sustituirlo.
+    Devuelve el número de audios migrados.
+    """
+    dataset = DatasetAudio(db_path, tabla)
+    rowids = ids_con_audio(db_path, tabla)
+    migrados = 0
+    with sqlite3.connect(db_path) as conn:
+        for inicio in range(0, len(rowids), LOTE):
+            filas, cambios = [], []
+            for rowid in rowids[inicio:inicio + LOTE]:
+                original = dataset.leer(rowid, conn)
+                if formato_blob(original) == formato:
+                    continue
+                nuevo = recodificar(original, formato)
+                rate_original, audio_original = leer_blob(original)
+                rate_nuevo, audio_nuevo = leer_blob(nuevo)
+                if rate_nuevo != rate_original or not np.array_equal(audio_nuevo, audio_original):
+                    raise ValueError(f"{db_path} ({tabla}, fila {rowid}): el audio recodificado no es idéntico")
+                filas.append((nuevo, rowid))
+                cambios.append((hash_audio(nuevo), hash_audio(original)))
+            if filas:
+                with conn:
+                    conn.executemany(f"UPDATE {tabla} SET audio = ? WHERE rowid = ?", filas)
+                actualizar_manifiestos(cambios)
+                migrados += len(filas)
+            print(f"   {min(inicio + LOTE, len(rowids))}/{len(rowids)} audios revisados...", end="\r")
+    return migrados
+
+
+def imprimir_lectura(formatos_tabla, medida):
+    n, segundos, leidos, segundos_audio = medida
+    if not n or segundos <= 0:
+        return
+    formato = "+".join(formatos_tabla)
+    print(f"   {formato:<8} {n / segundos:8.0f} audios/s | {leidos / 1e6 / segundos:7.1f} MB/s leídos | "
+          f"x{segundos_audio / segundos:.0f} tiempo real")
+
+
+def migrar():
+    bases = [(db, tabla) for db in DBS_GRABACIONES for tabla in tablas_audio(db)]
+    if not bases:
+        print("⚠️ No hay bases de datos de grabaciones (audios_*.db con tabla 'grabaciones' o 'audios').")
+        return
+    for db_path, tabla in bases:
+        antes = formatos(db_path, tabla)
+        if not antes:
+            continue
+        print(f"\n===== {db_path} ({tabla}) =====")
+        print("Formatos actuales: " + ", ".join(f"{n} {f}" for f, n in antes.items()))
+        tam_antes = os.path.getsize(db_path)
+        lectura_antes = medir_lectura(db_path, tabla)
+
+        t0 = time.perf_counter()
+        migrados = migrar_tabla(db_path, tabla, FORMATO_DESTINO)
+        t_migracion = time.perf_counter() - t0
+        if migrados and COMPACTAR:
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("VACUUM")
+        tam_despues = os.path.getsize(db_path)
+        lectura_despues = medir_lectura(db_path, tabla)
+
+        print(f"🗜️ {migrados} audios pasados a {FORMATO_DESTINO} en {t_migracion:.1f} s" + " " * 20)
+        print(f"Tamaño de la base de datos: {tam_antes / 1e6:.1f} MB → {tam_despues / 1e6:.1f} MB "
+              f"({tam_despues / tam_antes:.0%})")
+        print(f"Lectura + decodificación (mediana de {PASADAS_LECTURA} pasadas):")
+        imprimir_lectura(antes, lectura_antes)
+        imprimir_lectura(formatos(db_path, tabla), lectura_despues)
+
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,76 @@
+import glob
+import os
+import sqlite3
+import time
+import numpy as np
+from dataset_audio import DatasetAudio
+from dataset_pcm import DatasetPCM, exportar, ruta_exportacion
+from formato_audio import leer_blob
+
+# --- CONFIGURACIÓN ---
+DBS_GRABACIONES = sorted(glob.glob("audios_grabados*.db"))   # Bases de datos con la tabla 'grabaciones'
+FORZAR = False       # Vuelve a exportar aunque la exportación esté al día
+
+
+# === MEDIDA DE CARGA ===
+def cargar_desde_sqlite(db_path):
+    """Todos los audios decodificados desde los BLOB, como hacían hasta ahora los barridos y benchmarks."""
+    dataset = DatasetAudio(db_path)
+    rowids = [fila[0] for fila in dataset.metadatos("filename")]
+    return [leer_blob(audio_blob)[1] for _, audio_blob in dataset.audios(rowids)]
+
+
+def cargar_desde_pcm(db_path):
+    """Todos los audios como vistas del fichero PCM."""
+    pcm = DatasetPCM(ruta_exportacion(db_path))
+    return [pcm.audio(i) for i in range(len(pcm))]
+
+
+def medir(cargar, db_path):
+    """Tiempo hasta tener todos los audios y recorrerlos una vez (suma de muestras), para incluir la lectura real."""
+    t0 = time.perf_counter()
+    audios = cargar(db_path)
+    t_carga = time.perf_counter() - t0
+    total = sum(int(np.sum(a, dtype=np.int64)) for a in audios)
+    return t_carga, time.perf_counter() - t0, total
+
+
+def exportar_todo():
+    if not DBS_GRABACIONES:
+        print("⚠️ No se encontraron bases de datos 'audios_grabados*.db'.")
+        return
+    for db_path in DBS_GRABACIONES:
+        try:
+            exportar_db(db_path)
+        except (sqlite3.Error, ValueError) as e:   # una base de datos dañada no impide exportar las demás
+            print(f"⚠️ No se pudo exportar '{db_path}': {e}")
+
+
+def exportar_db(db_path):
+    """Exporta una base de datos (si no está al día) y compara la carga desde SQLite y desde el PCM."""
+    ruta = ruta_exportacion(db_path)
+    print(f"\n===== {db_path} → {ruta}.pcm =====")
+    if not FORZAR and DatasetPCM.si_actualizado(db_path):
+        print("La exportación ya está al día.")
+    else:
+        t0 = time.perf_counter()
+        exportar(db_path, ruta)
+        print(f"📦 Exportada en {time.perf_counter() - t0:.2f} s")
+
+    pcm = DatasetPCM(ruta)
+    segundos = float(np.sum(pcm.indice["longitud"] / pcm.indice["sample_rate"])) if len(pcm) else 0.0
+    print(f"{len(pcm)} audios ({segundos / 60:.1f} min) | PCM {os.path.getsize(ruta + '.pcm') / 1e6:.1f} MB | "
+          f"índice {os.path.getsize(ruta + '.npy') / 1e3:.0f} KB | base de datos "
+          f"{os.path.getsize(db_path) / 1e6:.1f} MB")
+    print("Columnas del índice: " + ", ".join(pcm.indice.dtype.names))
+
+    carga_db, total_db, suma_db = medir(cargar_desde_sqlite, db_path)
+    carga_pcm, total_pcm, suma_pcm = medir(cargar_desde_pcm, db_path)
+    if suma_db != suma_pcm:
+        print("⚠️ Las muestras exportadas no coinciden con las de la base de datos.")
+    print(f"Carga de todos los audios: SQLite {carga_db:.3f} s ({total_db:.3f} s recorriéndolos) | "
+          f"PCM {carga_pcm * 1000:.1f} ms ({total_pcm:.3f} s recorriéndolos)")
+
+
+if __name__ == "__main__":
+    exportar_todo()
@@ -0,0 +1,387 @@
+import glob
+import hashlib
+import importlib
+import math
+import os
+import sqlite3
+import time
+from consultas import agregar_columnas, crear_indices, existe_tabla
+from metricas import COLUMNAS_RECUENTOS, leer_detalles
+
+# --- CONFIGURACIÓN ---
+DB_ALMACEN = "resultados.db"   # Almacén único con los resultados de todos los ensayos
+COPIAS = "Ensayo_*"            # Carpetas con copias de las bases de datos (las filas repetidas se descartan)
+
+# Ensayos y sus bases de datos de transcripciones (volumen, distancia y frases), los mismos que re-evalúa el 19
+reevaluacion = importlib.import_module("19_Reevaluar_Transcripciones")
+
+# Columnas que se copian de cada transcripción (las que no tenga la base de datos de origen quedan a NULL)
+COLUMNAS_RESULTADO = ["filename", "tipo", "frase", "transcription", "wer", "cer", *COLUMNAS_RECUENTOS,
+                      "tiempo_seg", "duracion_audio", "rtf", "avg_rms_voz"]
+COLUMNAS_LEIDAS = [*COLUMNAS_RESULTADO, "model", "ejecucion", "normalizacion_ganancia", "reduccion_ruido",
+                   "wer_details", "cer_details"]
+# Columnas que se rellenan después en el origen (latencias.completar_duraciones, programa 23): no entran en la
+# huella y, si cambian en filas ya importadas, se completan en el almacén y se rehace el resumen de su grupo
+COLUMNAS_RELLENABLES = ["duracion_audio", "rtf", *COLUMNAS_RECUENTOS]
+MODELO_DESCONOCIDO = "desconocido"   # Filas de ensayos anteriores a la columna 'model'
+SIN_REGISTRAR = "sin registrar ({})"  # Ejecución de las filas sin ejecución registrada, una por base de datos de origen
+VERSION_HUELLA = 2                    # PRAGMA user_version del almacén: huellas sin las columnas rellenables
+
+
+# === BASE DE DATOS ===
+def init_db(conn):
+    """Dimensiones (ensayo, ejecución, modelo), tabla de hechos, importaciones y resumen precalculado."""
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS experimentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS ejecuciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            experimento_id INTEGER REFERENCES experimentos(id),
+            clave TEXT,
+            UNIQUE (experimento_id, clave)
+        );
+        CREATE TABLE IF NOT EXISTS modelos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS resultados (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ejecucion_id INTEGER REFERENCES ejecuciones(id),
+            modelo_id INTEGER REFERENCES modelos(id),
+            variante TEXT,
+            {", ".join(f"{c} {tipo_columna(c)}" for c in COLUMNAS_RESULTADO)},
+            origen TEXT,
+            origen_id INTEGER,
+            huella TEXT UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS importaciones (
+            origen TEXT PRIMARY KEY,
+            experimento_id INTEGER REFERENCES experimentos(id),
+            ultimo_id INTEGER,
+            importadas INTEGER DEFAULT 0,
+            repetidas INTEGER DEFAULT 0,
+            control_rellenables REAL,
+            fecha TEXT
+        );
+        CREATE TABLE IF NOT EXISTS resumen (
+            ejecucion_id INTEGER,
+            modelo_id INTEGER,
+            variante TEXT,
+            n INTEGER,
+            n_tiempo INTEGER,
+            suma_tiempo REAL,
+            suma_tiempo2 REAL,
+            min_tiempo REAL,
+            max_tiempo REAL,
+            suma_wer REAL,
+            suma_cer REAL,
+            errores_wer INTEGER,
+            tokens_wer INTEGER,
+            errores_cer INTEGER,
+            tokens_cer INTEGER,
+            PRIMARY KEY (ejecucion_id, modelo_id, variante)
+        );
+        CREATE VIEW IF NOT EXISTS resumen_modelo AS
+            SELECT x.nombre AS experimento, m.nombre AS modelo, r.variante,
+                   COUNT(DISTINCT r.ejecucion_id) AS ejecuciones, SUM(r.n) AS n, SUM(r.n_tiempo) AS n_tiempo,
+                   SUM(r.suma_tiempo) AS suma_tiempo, SUM(r.suma_tiempo2) AS suma_tiempo2,
+                   MIN(r.min_tiempo) AS min_tiempo, MAX(r.max_tiempo) AS max_tiempo,
+                   SUM(r.suma_wer) / SUM(r.n) AS wer_medio, SUM(r.suma_cer) / SUM(r.n) AS cer_medio,
+                   SUM(r.errores_wer) * 1.0 / NULLIF(SUM(r.tokens_wer), 0) AS wer_global,
+                   SUM(r.errores_cer) * 1.0 / NULLIF(SUM(r.tokens_cer), 0) AS cer_global
+            FROM resumen r
+            JOIN ejecuciones e ON e.id = r.ejecucion_id
+            JOIN experimentos x ON x.id = e.experimento_id
+            JOIN modelos m ON m.id = r.modelo_id
+            GROUP BY x.nombre, m.nombre, r.variante;
+    """)
+    agregar_columnas(conn, "importaciones", [("control_rellenables", "REAL")])
+    crear_indices(conn, "resultados", [["ejecucion_id", "modelo_id", "variante"], ["filename"], ["tipo", "frase"]])
+
+
+def tipo_columna(columna):
+    if columna in ("filename", "transcription"):
+        return "TEXT"
+    if columna in ("tipo", "frase") or columna in COLUMNAS_RECUENTOS:
+        return "INTEGER"
+    return "REAL"
+
+
+def valor_almacen(columna, valor):
+    """Valor tal como lo guarda la columna del almacén (afinidad INTEGER/REAL de SQLite)."""
+    if valor is None or isinstance(valor, bytes) or tipo_columna(columna) == "TEXT":
+        return valor
+    try:
+        numero = float(valor)
+    except ValueError:
+        return valor
+    if tipo_columna(columna) == "INTEGER" and numero.is_integer():
+        return int(numero)
+    return numero
+
+
+def id_dimension(conn, tabla, cache, **valores):
+    """Id de la fila de una dimensión con esos valores (la crea si no existe)."""
+    clave = tuple(valores.values())
+    if clave not in cache:
+        columnas = ", ".join(valores)
+        condicion = " AND ".join(f"{c} = ?" for c in valores)
+        conn.execute(f"INSERT OR IGNORE INTO {tabla} ({columnas}) VALUES ({', '.join('?' for _ in valores)})", clave)
+        cache[clave] = conn.execute(f"SELECT id FROM {tabla} WHERE {condicion}", clave).fetchone()[0]
+    return cache[clave]
+
+
+# === IMPORTACIÓN ===
+def origenes():
+    """(ensayo, base de datos) de cada ensayo: la de la carpeta principal y sus copias en COPIAS."""
+    for experimento, (db_path, _) in reevaluacion.ENSAYOS.items():
+        for ruta in [db_path, *sorted(glob.glob(os.path.join(COPIAS, db_path)))]:
+            if os.path.exists(ruta):
+                yield experimento, ruta
+
+
+def variante(fila):
+    if fila["normalizacion_ganancia"]:
+        return "normalizacion_ganancia"
+    if fila["reduccion_ruido"]:
+        return "reduccion_ruido"
+    return "original"
+
+
+def huella(experimento, origen_id, fila):
+    """
+    Identifica una transcripción por su contenido: la misma fila en una copia de la base de datos coincide.
+    Las columnas rellenables no cuentan, para que una copia rellenada después no parezca otra fila.
+    """
+    valores = (experimento, origen_id, fila["model"] or None, fila["ejecucion"] or None,
+               *(valor_almacen(c, fila[c]) for c in COLUMNAS_RESULTADO if c not in COLUMNAS_RELLENABLES))
+    return hashlib.sha1(repr(valores).encode()).hexdigest()
+
+
+def migrar_huellas(conn):
+    """
+    Recalcula las huellas de un almacén anterior a VERSION_HUELLA (incluían las columnas rellenables) y descarta
+    las filas que con la nueva huella resultan repetidas, rehaciendo entonces el resumen.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= VERSION_HUELLA:
+        return
+    filas = conn.execute(f"""
+        SELECT r.id, r.origen, r.origen_id, x.nombre, m.nombre, e.clave, {", ".join(f"r.{c}" for c in COLUMNAS_RESULTADO)}
+        FROM resultados r
+        JOIN ejecuciones e ON e.id = r.ejecucion_id
+        JOIN experimentos x ON x.id = e.experimento_id
+        JOIN modelos m ON m.id = r.modelo_id
+        ORDER BY r.id
+    """).fetchall()
+    huellas, repetidas = {}, []
+    for id_resultado, origen, origen_id, experimento, modelo, clave, *valores in filas:
+        fila = dict(zip(COLUMNAS_RESULTADO, valores))
+        fila["model"] = None if modelo == MODELO_DESCONOCIDO else modelo
+        fila["ejecucion"] = None if clave == SIN_REGISTRAR.format(os.path.basename(origen)) else clave
+        nueva = huella(experimento, origen_id, fila)
+        if nueva in huellas:
+            repetidas.append((id_resultado,))
+        else:
+            huellas[nueva] = id_resultado
+    conn.execute("UPDATE resultados SET huella = NULL")
+    conn.executemany("DELETE FROM resultados WHERE id = ?", repetidas)
+    conn.executemany("UPDATE resultados SET huella = ? WHERE id = ?", huellas.items())
+    if repetidas:
+        conn.execute("DELETE FROM resumen")
+        actualizar_resumen(conn, 0)
+        print(f"🧹 {len(repetidas)} filas repetidas descartadas al recalcular las huellas del almacén")
+    conn.execute(f"PRAGMA user_version = {VERSION_HUELLA}")
+
+
+def importar_origen(conn, experimento, origen, caches):
+    """
+    Copia al almacén las transcripciones de 'origen' posteriores a la última importada. Si desde la importación
+    anterior se han rellenado columnas de filas ya importadas, las vuelve a leer y las completa en el almacén.
+    Devuelve (filas nuevas, filas repetidas ya presentes desde otra copia, grupos del resumen de las completadas).
+    """
+    fila_importacion = conn.execute("SELECT ultimo_id, control_rellenables FROM importaciones WHERE origen = ?",
+                                    (origen,)).fetchone()
+    ultimo_id, control_antes = fila_importacion or (0, None)
+    with sqlite3.connect(origen) as src:
+        if not existe_tabla(src, "transcripciones"):
+            return 0, 0, []
+        cols = set(reevaluacion.columnas(src, "transcripciones"))
+        maximo = src.execute("SELECT MAX(rowid) FROM transcripciones").fetchone()[0] or 0
+        if maximo < ultimo_id:   # base de datos rehecha desde cero: se revisa entera (las huellas evitan duplicar)
+            ultimo_id = 0
+        # Suma de control de los valores rellenables de las filas ya importadas: si ha cambiado, se vuelven a leer
+        control = " + ".join(f"COUNT({c}) + TOTAL({c})" for c in COLUMNAS_RELLENABLES if c in cols) or "0"
+        control_importadas = src.execute(f"SELECT {control} FROM transcripciones WHERE rowid <= ?",
+                                         (ultimo_id,)).fetchone()[0]
+        desde_id = ultimo_id if control_importadas == control_antes else 0
+        seleccion = ", ".join(c if c in cols else "NULL" for c in COLUMNAS_LEIDAS)
+        leidas = src.execute(f"SELECT rowid, {seleccion} FROM transcripciones WHERE rowid > ? ORDER BY rowid",
+                             (desde_id,)).fetchall()
+        control_total = src.execute(f"SELECT {control} FROM transcripciones WHERE rowid <= ?", (maximo,)).fetchone()[0]
+
+    id_experimento = id_dimension(conn, "experimentos", caches["experimentos"], nombre=experimento)
+    filas, rellenables = [], []
+    for origen_id, *valores in leidas:
+        fila = dict(zip(COLUMNAS_LEIDAS, valores))
+        if fila["wer_n"] is None and fila["wer_details"] is not None:
+            wer, cer = leer_detalles(fila["wer_details"]), leer_detalles(fila["cer_details"])
+            if wer is not None and cer is not None:
+                fila.update(zip(COLUMNAS_RECUENTOS, (*wer, *cer)))
+        fila_huella = huella(experimento, origen_id, fila)
+        rellenables.append((fila_huella, *(fila[c] for c in COLUMNAS_RELLENABLES)))
+        if origen_id <= ultimo_id:
+            continue
+        # Las filas sin ejecución registrada se agrupan en una por base de datos de origen
+        clave = fila["ejecucion"] or SIN_REGISTRAR.format(os.path.basename(origen))
+        id_ejecucion = id_dimension(conn, "ejecuciones", caches["ejecuciones"],
+                                    experimento_id=id_experimento, clave=clave)
+        id_modelo = id_dimension(conn, "modelos", caches["modelos"], nombre=fila["model"] or MODELO_DESCONOCIDO)
+        filas.append((id_ejecucion, id_modelo, variante(fila), *(fila[c] for c in COLUMNAS_RESULTADO),
+                      origen, origen_id, fila_huella))
+
+    antes = conn.total_changes
+    conn.executemany(f"""
+        INSERT OR IGNORE INTO resultados (ejecucion_id, modelo_id, variante, {", ".join(COLUMNAS_RESULTADO)},
+                                          origen, origen_id, huella)
+        VALUES ({", ".join("?" for _ in range(len(COLUMNAS_RESULTADO) + 6))})
+    """, filas)
+    nuevas = conn.total_changes - antes
+    # Las repetidas y las ya importadas pueden traer del origen valores que el almacén aún no tiene
+    completadas = completar(conn, rellenables)
+    conn.execute("""
+        INSERT INTO importaciones (origen, experimento_id, ultimo_id, importadas, repetidas, control_rellenables,
+                                   fecha)
+        VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+        ON CONFLICT (origen) DO UPDATE SET ultimo_id = excluded.ultimo_id,
+            importadas = importadas + excluded.importadas, repetidas = repetidas + excluded.repetidas,
+            control_rellenables = excluded.control_rellenables, fecha = excluded.fecha
+    """, (origen, id_experimento, maximo, nuevas, len(filas) - nuevas, control_total))
+    return nuevas, len(filas) - nuevas, completadas
+
+
+def completar(conn, rellenables):
+    """
+    Copia a las filas del almacén con esas huellas los valores rellenables que traiga el origen
+    ('rellenables': (huella, *COLUMNAS_RELLENABLES)); un NULL en el origen no borra el valor guardado.
+    Devuelve el grupo del resumen (ejecución, modelo, variante) de cada fila completada.
+    """
+    conn.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS relleno (
+            huella TEXT PRIMARY KEY, {", ".join(f"{c} {tipo_columna(c)}" for c in COLUMNAS_RELLENABLES)}
+        )
+    """)
+    conn.execute("DELETE FROM relleno")
+    marcas = ", ".join("?" for _ in range(len(COLUMNAS_RELLENABLES) + 1))
+    conn.executemany(f"INSERT OR IGNORE INTO relleno VALUES ({marcas})", rellenables)
+    distinta = " OR ".join(f"(t.{c} IS NOT NULL AND t.{c} IS NOT r.{c})" for c in COLUMNAS_RELLENABLES)
+    cambiadas = conn.execute(f"""
+        SELECT r.id, r.ejecucion_id, r.modelo_id, r.variante, {", ".join(f"t.{c}" for c in COLUMNAS_RELLENABLES)}
+        FROM resultados r JOIN relleno t ON t.huella = r.huella
+        WHERE {distinta}
+    """).fetchall()
+    asignaciones = ", ".join(f"{c} = COALESCE(?, {c})" for c in COLUMNAS_RELLENABLES)
+    conn.executemany(f"UPDATE resultados SET {asignaciones} WHERE id = ?",
+                     [(*valores, id_resultado) for id_resultado, _, _, _, *valores in cambiadas])
+    return [tuple(fila[1:4]) for fila in cambiadas]
+
+
+# === RESUMEN INCREMENTAL ===
+# Suma de las filas de 'resultados' que cumplen {condicion} para cada grupo (ejecución, modelo, variante)
+SUMAS_RESUMEN = """
+    INSERT INTO resumen (ejecucion_id, modelo_id, variante, n, n_tiempo, suma_tiempo, suma_tiempo2,
+                         min_tiempo, max_tiempo, suma_wer, suma_cer, errores_wer, tokens_wer,
+                         errores_cer, tokens_cer)
+    SELECT ejecucion_id, modelo_id, variante, COUNT(*), COUNT(tiempo_seg), TOTAL(tiempo_seg),
+           TOTAL(tiempo_seg * tiempo_seg), MIN(tiempo_seg), MAX(tiempo_seg), TOTAL(wer), TOTAL(cer),
+           SUM(wer_s + wer_d + wer_i), SUM(wer_n), SUM(cer_s + cer_d + cer_i), SUM(cer_n)
+    FROM resultados WHERE {condicion}
+    GROUP BY ejecucion_id, modelo_id, variante
+"""
+
+
+def actualizar_resumen(conn, desde_id):
+    """Suma al resumen las filas de 'resultados' con id mayor que 'desde_id' (las recién importadas)."""
+    conn.execute(SUMAS_RESUMEN.format(condicion="id > ?") + """
+        ON CONFLICT (ejecucion_id, modelo_id, variante) DO UPDATE SET
+            n = n + excluded.n,
+            n_tiempo = n_tiempo + excluded.n_tiempo,
+            suma_tiempo = suma_tiempo + excluded.suma_tiempo,
+            suma_tiempo2 = suma_tiempo2 + excluded.suma_tiempo2,
+            min_tiempo = MIN(COALESCE(min_tiempo, excluded.min_tiempo), COALESCE(excluded.min_tiempo, min_tiempo)),
+            max_tiempo = MAX(COALESCE(max_tiempo, excluded.max_tiempo), COALESCE(excluded.max_tiempo, max_tiempo)),
+            suma_wer = suma_wer + excluded.suma_wer,
+            suma_cer = suma_cer + excluded.suma_cer,
+            errores_wer = COALESCE(errores_wer, 0) + COALESCE(excluded.errores_wer, 0),
+            tokens_wer = COALESCE(tokens_wer, 0) + COALESCE(excluded.tokens_wer, 0),
+            errores_cer = COALESCE(errores_cer, 0) + COALESCE(excluded.errores_cer, 0),
+            tokens_cer = COALESCE(tokens_cer, 0) + COALESCE(excluded.tokens_cer, 0)
+    """, (desde_id,))
+
+
+def rehacer_resumen(conn, grupos):
+    """Vuelve a sumar desde 'resultados' el resumen de esos grupos (los que tienen filas completadas)."""
+    condicion = "ejecucion_id = ? AND modelo_id = ? AND variante = ?"
+    for grupo in grupos:
+        conn.execute(f"DELETE FROM resumen WHERE {condicion}", grupo)
+        conn.execute(SUMAS_RESUMEN.format(condicion=condicion), grupo)
+
+
+def importar(db_path=DB_ALMACEN):
+    """
+    Importa las filas nuevas de todas las bases de datos, completa las ya importadas que se han rellenado
+    en el origen y actualiza el resumen en la misma transacción.
+    """
+    t0 = time.perf_counter()
+    caches = {"experimentos": {}, "ejecuciones": {}, "modelos": {}}
+    with sqlite3.connect(db_path) as conn:
+        init_db(conn)
+        migrar_huellas(conn)
+        desde_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM resultados").fetchone()[0]
+        total, grupos = 0, set()
+        for experimento, origen in origenes():
+            nuevas, repetidas, completadas = importar_origen(conn, experimento, origen, caches)
+            total += nuevas
+            grupos.update(completadas)
+            if nuevas or repetidas:
+                print(f"📥 {origen} ({experimento}): {nuevas} filas nuevas"
+                      + (f" | {repetidas} repetidas (ya importadas desde otra copia)" if repetidas else ""))
+            if completadas:
+                print(f"🔄 {origen} ({experimento}): {len(completadas)} filas ya importadas completadas "
+                      f"(duración, RTF o recuentos rellenados en el origen)")
+        actualizar_resumen(conn, desde_id)
+        rehacer_resumen(conn, grupos)
+        conn.commit()
+    print(f"{total} filas importadas en {time.perf_counter() - t0:.2f} s" if total or grupos
+          else "El almacén ya está al día.")
+
+
+# === INFORME ===
+def imprimir_resumen(db_path=DB_ALMACEN):
+    """Comparación entre ensayos de cada modelo, leída del resumen precalculado (sin recorrer los resultados)."""
+    with sqlite3.connect(db_path) as conn:
+        filas = conn.execute("""
+            SELECT modelo, experimento, variante, ejecuciones, n, n_tiempo, suma_tiempo, suma_tiempo2,
+                   wer_medio, cer_medio, wer_global, cer_global
+            FROM resumen_modelo ORDER BY modelo, experimento, variante
+        """).fetchall()
+    modelo_actual = None
+    for (modelo, experimento, var, ejecuciones, n, n_tiempo, suma_t, suma_t2,
+         wer_medio, cer_medio, wer_global, cer_global) in filas:
+        if modelo != modelo_actual:
+            print(f"\n===== MODELO {modelo.upper()} =====")
+            modelo_actual = modelo
+        texto = f"   {experimento:<10} {var:<22} {n:5d} filas ({ejecuciones} ejec.) | WER {wer_medio:.2%}"
+        texto += f" (global {wer_global:.2%})" if wer_global is not None else ""
+        texto += f" | CER {cer_medio:.2%}"
+        if n_tiempo:
+            media = suma_t / n_tiempo
+            std = math.sqrt(max(suma_t2 / n_tiempo - media * media, 0.0))
+            texto += f" | tiempo {media:.2f} s ± {std:.2f}"
+        print(texto)
+
+
+if __name__ == "__main__":
+    importar()
+    imprimir_resumen()
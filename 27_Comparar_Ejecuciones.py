@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import numpy as np
+from scipy import stats
+from latencias import intervalo
+from registro_ejecuciones import leer
+
+# --- CONFIGURACIÓN ---
+DB_RESULTADOS = "audios_transcritos_frases.db"   # Salida de un ensayo (7, 8, 10-13) o del benchmark 22
+EJECUCION_A = None   # Ejecución de referencia (None = la penúltima terminada)
+EJECUCION_B = None   # Ejecución a comparar (None = la última terminada)
+ALFA = 0.05          # Nivel de significación de las pruebas
+
+# Métricas comparadas: en todas, un valor mayor es peor
+METRICAS = {"tiempo_seg": "Latencia (s)", "rtf": "RTF", "wer": "WER", "cer": "CER"}
+METRICAS_TIEMPO = ("tiempo_seg", "rtf")
+# Ensayos locales cuyas ejecuciones sin 'tiempo_mel' (anteriores a esa columna) dejaban la decodificación y el
+# log-mel fuera de tiempo_seg, y en los que la caché de log-mel (columna 'mel_cache') acorta tiempo_seg: su
+# latencia sólo se compara entre ejecuciones que la midan igual
+PROGRAMAS_MEL = ("10_Ensayo_Distancia_Local", "12_Ensayo_Final_Local")
+
+
+# === DATOS ===
+def ultimas_ejecuciones(conn):
+    return [fila[0] for fila in conn.execute(
+        "SELECT id FROM ejecuciones WHERE fin IS NOT NULL ORDER BY inicio DESC, rowid DESC LIMIT 2")]
+
+
+def valores_ejecucion(conn, ejecucion):
+    """
+    {métrica: {(modelo, variante, filename): valor}} de una ejecución. En las medidas del benchmark 22 se toma
+    la mediana de las repeticiones en caliente de cada audio; en las transcripciones, la media si un audio se
+    repite.
+    """
+    tablas = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "medidas" in tablas:
+        filas = conn.execute("""
+            SELECT modelo, 'original', filename, tiempo_seg, rtf, NULL, NULL
+            FROM medidas WHERE ejecucion = ? AND fase = 'caliente'
+        """, (ejecucion,)).fetchall()
+        agregar = np.median
+    else:
+        cols = {fila[1] for fila in conn.execute("PRAGMA table_info(transcripciones)")}
+        variante = ("CASE WHEN normalizacion_ganancia THEN 'normalizacion_ganancia' ELSE 'original' END"
+                    if "normalizacion_ganancia" in cols else
+                    "CASE WHEN reduccion_ruido THEN 'reduccion_ruido' ELSE 'original' END"
+                    if "reduccion_ruido" in cols else "'original'")
+        seleccion = ", ".join(c if c in cols else "NULL" for c in METRICAS)
+        filas = conn.execute(f"""
+            SELECT COALESCE(model, '?'), {variante}, filename, {seleccion}
+            FROM transcripciones WHERE ejecucion = ?
+        """, (ejecucion,)).fetchall()
+        agregar = np.mean
+
+    por_clave = {metrica: {} for metrica in METRICAS}
+    for modelo, var, filename, *valores in filas:
+        for metrica, valor in zip(METRICAS, valores):
+            if valor is not None:
+                por_clave[metrica].setdefault((modelo, var, filename), []).append(valor)
+    return {metrica: {clave: float(agregar(v)) for clave, v in datos.items()} for metrica, datos in por_clave.items()}
+
+
+def medida_mel(conn, ejecucion):
+    """(¿incluye tiempo_seg el log-mel?, proporción de log-mel leídos de la caché) de una ejecución."""
+    cols = {fila[1] for fila in conn.execute("PRAGMA table_info(transcripciones)")}
+    if "tiempo_mel" not in cols:
+        return False, 0.0
+    cache = "AVG(COALESCE(mel_cache, 0))" if "mel_cache" in cols else "0.0"
+    con_mel, de_cache = conn.execute(f"""
+        SELECT COUNT(tiempo_mel), {cache} FROM transcripciones WHERE ejecucion = ?
+    """, (ejecucion,)).fetchone()
+    return con_mel > 0, de_cache or 0.0
+
+
+def tiempos_no_comparables(conn, ejec_a, ejec_b):
+    """Motivo por el que la latencia de dos ejecuciones locales no se mide igual, o None si es comparable."""
+    if ejec_a["programa"] not in PROGRAMAS_MEL or ejec_b["programa"] not in PROGRAMAS_MEL:
+        return None
+    (mel_a, cache_a), (mel_b, cache_b) = medida_mel(conn, ejec_a["id"]), medida_mel(conn, ejec_b["id"])
+    if mel_a != mel_b:
+        return "sólo una de las ejecuciones incluye la decodificación y el log-mel en tiempo_seg (columna tiempo_mel)"
+    if cache_a != cache_b:
+        return (f"log-mel leídos de la caché: {cache_a:.0%} en A y {cache_b:.0%} en B (columna mel_cache); "
+                "su lectura cuenta en tiempo_seg en lugar de su cálculo")
+    return None
+
+
+# === ESTADÍSTICA ===
+def comparar(a, b):
+    """
+    Compara dos muestras de una métrica. Con audios comunes, prueba de Wilcoxon sobre las diferencias
+    pareadas (B - A); si no hay, Mann-Whitney entre las dos muestras. Devuelve un diccionario con n, medias,
+    diferencia, intervalo de la diferencia (sólo pareada), p-valor y tipo de prueba.
+    """
+    comunes = sorted(set(a) & set(b))
+    if comunes:
+        va = np.array([a[k] for k in comunes])
+        vb = np.array([b[k] for k in comunes])
+        diferencias = vb - va
+        _, semiancho = intervalo(diferencias, 1 - ALFA)
+        if len(comunes) < 2 or np.all(diferencias == 0):
+            p = 1.0
+        else:
+            p = float(stats.wilcoxon(diferencias).pvalue)
+        return {"n": len(comunes), "media_a": float(np.mean(va)), "media_b": float(np.mean(vb)),
+                "diferencia": float(np.mean(diferencias)), "intervalo": semiancho, "p": p, "prueba": "Wilcoxon"}
+    va, vb = np.array(list(a.values())), np.array(list(b.values()))
+    p = float(stats.mannwhitneyu(va, vb).pvalue) if len(va) and len(vb) else float("nan")
+    return {"n": min(len(va), len(vb)), "media_a": float(np.mean(va)) if len(va) else float("nan"),
+            "media_b": float(np.mean(vb)) if len(vb) else float("nan"),
+            "diferencia": float(np.mean(vb) - np.mean(va)) if len(va) and len(vb) else float("nan"),
+            "intervalo": float("nan"), "p": p, "prueba": "Mann-Whitney"}
+
+
+def veredicto(r):
+    if not r["p"] < ALFA:
+        return "sin diferencia significativa"
+    return "⚠️ PEOR" if r["diferencia"] > 0 else "✅ mejor"
+
+
+# === INFORME ===
+def aplanar(datos, prefijo=""):
+    """{'versiones': {'torch': '2.1'}} → {'versiones.torch': '2.1'}"""
+    plano = {}
+    for clave, valor in datos.items():
+        if isinstance(valor, dict):
+            plano.update(aplanar(valor, f"{prefijo}{clave}."))
+        else:
+            plano[f"{prefijo}{clave}"] = valor
+    return plano
+
+
+def imprimir_diferencias(ejec_a, ejec_b):
+    """Configuración y entorno que cambian entre las dos ejecuciones."""
+    cambios = []
+    for seccion in ("configuracion", "entorno"):
+        a, b = aplanar(ejec_a[seccion]), aplanar(ejec_b[seccion])
+        for clave in sorted(set(a) | set(b)):
+            if clave != "temperatura_c" and a.get(clave) != b.get(clave):
+                cambios.append(f"   {seccion}.{clave}: {a.get(clave)} → {b.get(clave)}")
+    print("\nCambios de configuración y entorno:" if cambios else "\nMisma configuración y entorno.")
+    for linea in cambios:
+        print(linea)
+    temperaturas = [e["entorno"].get("temperatura_c") for e in (ejec_a, ejec_b)]
+    if None not in temperaturas:
+        print(f"   (temperatura de la CPU al empezar: {temperaturas[0]:.0f} °C → {temperaturas[1]:.0f} °C)")
+
+
+def formato(metrica, valor):
+    return f"{valor:.2%}" if metrica in ("wer", "cer") else f"{valor:.3f}"
+
+
+def comparar_ejecuciones(db_path=DB_RESULTADOS, id_a=EJECUCION_A, id_b=EJECUCION_B):
+    if not os.path.exists(db_path):
+        print(f"⚠️ No existe '{db_path}'.")
+        return
+    with sqlite3.connect(db_path) as conn:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ejecuciones'").fetchone():
+            print(f"⚠️ '{db_path}' no tiene ejecuciones registradas.")
+            return
+        if id_a is None or id_b is None:
+            ultimas = ultimas_ejecuciones(conn)
+            if len(ultimas) < 2:
+                print(f"⚠️ Hacen falta dos ejecuciones terminadas en '{db_path}'.")
+                return
+            id_b = id_b or ultimas[0]
+            id_a = id_a or ultimas[1]
+        ejec_a, ejec_b = leer(conn, id_a), leer(conn, id_b)
+        if ejec_a is None or ejec_b is None:
+            print(f"⚠️ No existe la ejecución {id_a if ejec_a is None else id_b} en '{db_path}'.")
+            return
+        valores_a, valores_b = valores_ejecucion(conn, id_a), valores_ejecucion(conn, id_b)
+        motivo = tiempos_no_comparables(conn, ejec_a, ejec_b)
+
+    print(f"===== COMPARACIÓN DE EJECUCIONES ({db_path}) =====")
+    for etiqueta, e in (("A", ejec_a), ("B", ejec_b)):
+        print(f"{etiqueta}: {e['id']} | {e['programa']} | {e['hostname']} | modelos {e['modelos'] or '?'} | "
+              f"hilos {e['hilos'] or '?'} | gobernador {e['gobernador'] or '?'}" + ("" if e["fin"] else " | ⚠️ sin terminar"))
+    imprimir_diferencias(ejec_a, ejec_b)
+    if motivo:
+        print(f"⚠️ La latencia y el RTF no se comparan: {motivo}.")
+
+    grupos = sorted({(modelo, var) for datos in (*valores_a.values(), *valores_b.values()) for modelo, var, _ in datos})
+    regresiones = 0
+    for modelo, var in grupos:
+        print(f"\n----- Modelo {modelo}" + (f" ({var})" if var != "original" else "") + " -----")
+        for metrica, nombre in METRICAS.items():
+            a = {k[2]: v for k, v in valores_a[metrica].items() if k[:2] == (modelo, var)}
+            b = {k[2]: v for k, v in valores_b[metrica].items() if k[:2] == (modelo, var)}
+            if not a or not b or (metrica in METRICAS_TIEMPO and motivo):
+                continue
+            r = comparar(a, b)
+            relativa = f" ({r['diferencia'] / r['media_a']:+.1%})" if r["media_a"] else ""
+            intervalo = f" ± {formato(metrica, r['intervalo'])}" if not np.isnan(r["intervalo"]) else ""
+            print(f"   {nombre:<13} A {formato(metrica, r['media_a'])} → B {formato(metrica, r['media_b'])} | "
+                  f"Δ {'+' if r['diferencia'] >= 0 else ''}{formato(metrica, r['diferencia'])}{intervalo}{relativa} | "
+                  f"p={r['p']:.3g} ({r['prueba']}, n={r['n']}) → {veredicto(r)}")
+            regresiones += veredicto(r).startswith("⚠️")
+
+    if regresiones:
+        print(f"\n⚠️ Métricas que empeoran de forma significativa (α = {ALFA}): {regresiones}")
+    else:
+        print(f"\n✅ Ninguna métrica empeora de forma significativa (α = {ALFA}).")
+
+
+if __name__ == "__main__":
+    comparar_ejecuciones()
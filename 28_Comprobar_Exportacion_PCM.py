@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import tempfile
+import numpy as np
+from dataset_pcm import DatasetPCM, exportar
+from formato_audio import codificar
+
+
+# === COMPROBACIÓN ===
+def comprobar_exportacion():
+    """
+    Exporta una base de datos temporal con el esquema del programa 6, con los RMS guardados como np.float32
+    (BLOB de 4 bytes, como en las grabaciones antiguas) y como REAL, y comprueba muestras y metadatos.
+    """
+    rng = np.random.default_rng(0)
+    audios = [(rng.standard_normal(n) * 1000).astype(np.int16) for n in (16000, 0, 8000)]
+    rms = [np.float32(123.5), 45.25, np.float32(0.0)]
+    with tempfile.TemporaryDirectory() as directorio:
+        db_path = os.path.join(directorio, "audios_grabados.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE grabaciones (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT, audio BLOB,
+                                          max_rms REAL, avg_rms REAL, avg_rms_voz REAL)
+            """)
+            conn.executemany("INSERT INTO grabaciones (filename, audio, max_rms, avg_rms, avg_rms_voz) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             [(f"audio_{i}.wav", codificar(a, 16000), r.tobytes() if isinstance(r, np.float32) else r,
+                               r.tobytes() if isinstance(r, np.float32) else r, None)
+                              for i, (a, r) in enumerate(zip(audios, rms))])
+            conn.commit()
+        pcm = DatasetPCM(exportar(db_path, os.path.join(directorio, "prueba")))
+        correcto = (len(pcm) == len(audios)
+                    and all(np.array_equal(pcm.audio(i), a) for i, a in enumerate(audios))
+                    and np.allclose(pcm.indice["max_rms"], [float(r) for r in rms])
+                    and pcm.indice["avg_rms_voz"].dtype.kind == "f")
+        del pcm   # cierra el memmap antes de borrar el directorio
+    if not correcto:
+        raise RuntimeError("La comprobación del exportador PCM ha fallado")
+    print("🧪 Exportador PCM (RMS guardados como BLOB float32 y como REAL): correcto")
+
+
+if __name__ == "__main__":
+    comprobar_exportacion()
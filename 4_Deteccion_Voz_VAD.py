@@ -5,6 +5,8 @@ import numpy as np
 import webrtcvad            # Detector de voz (Voice Activity Detection)
 import scipy.io.wavfile as wav  
 import tempfile, os, sys
+from palabra_clave import DetectorPalabraClave
+from procesado_audio import normalizar_ganancia
 
 # CONFIGURACIÓN
 SAMPLE_RATE = 16000          # Frecuencia de muestreo (Hz)
@@ -14,8 +16,11 @@ FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION / 1000)  # Muestras por frame
 VAD_MODE = 2                 # Nivel de sensibilidad del VAD (0 = más sensible, 3 = más estricto)
 MAX_SILENCE_FRAMES = int(0.8 * 1000 / FRAME_DURATION)  # Límite de silencio (para detener grabación)
 MIN_AUDIO_FRAMES = int(0.5 * 1000 / FRAME_DURATION)    # Duración mínima aceptada del audio
+PALABRA_CLAVE = None         # Plantillas del programa 16 (p. ej. "plantillas_palabra_clave.npz"); None = sólo VAD
+NORMALIZAR_GANANCIA = False  # Lleva la voz grabada al RMS objetivo (con limitador) antes de guardarla
 
 vad = webrtcvad.Vad(VAD_MODE)  # Inicializa el detector de voz con la sensibilidad elegida
+detector = DetectorPalabraClave.desde_fichero(PALABRA_CLAVE) if PALABRA_CLAVE else None
 
 
 # DETECCIÓN DE VOZ EN UN FRAME
@@ -29,7 +34,7 @@ def is_speech(frame_bytes, frame_array):
 
 
 # GRABACIÓN AUTOMÁTICA BASADA EN VOZ
-def record_voice():
+def record_voice(fuente=None):
     print("Esperando voz...")
     recording = []           # Almacena los bloques de audio grabados
     silence_counter = 0      # Cuenta los frames de silencio consecutivos
@@ -49,6 +54,13 @@ def record_voice():
         audio_int16 = (audio * 32767).astype(np.int16)  # Convierte float32 → int16
         frame_bytes = audio_int16.tobytes()      # Convierte a bytes para VAD
 
+        # Con palabra clave no se empieza a grabar (ni se transcribe) hasta oír la frase de activación
+        if detector is not None and not started:
+            if detector.procesar(audio_int16):
+                print("Palabra clave detectada. Grabando...")
+                started = True
+            return
+
         speech, rms = is_speech(frame_bytes, audio_int16)  # Evalúa si hay voz
 
         if speech:
@@ -68,12 +80,14 @@ def record_voice():
                 if silence_counter > MAX_SILENCE_FRAMES:
                     print("Fin de grabación por silencio prolongado")
                     stop_recording = True
-
-    # Inicia la captura de audio con el callback
-    with sd.InputStream(channels=CHANNELS, samplerate=SAMPLE_RATE,
-                        blocksize=FRAME_SIZE, dtype='float32',
-                        callback=callback):
-        while not stop_recording:
+                    raise sd.CallbackStop  # Detiene el stream sin procesar más frames
+
+    # Inicia la captura de audio con el callback (micrófono o fuente alternativa, p. ej. FuenteArchivo)
+    abrir_stream = fuente.abrir if fuente is not None else sd.InputStream
+    with abrir_stream(channels=CHANNELS, samplerate=SAMPLE_RATE,
+                      blocksize=FRAME_SIZE, dtype='float32',
+                      callback=callback) as stream:
+        while not stop_recording and stream.active:
             sd.sleep(100)  # Espera 100 ms entre iteraciones
 
     print("Finalizando y guardando audio")
@@ -84,6 +98,9 @@ def record_voice():
         return None
 
     audio_data = np.concatenate(recording)  # Une todos los bloques grabados
+    if NORMALIZAR_GANANCIA:
+        audio_data, ganancia = normalizar_ganancia(audio_data)
+        print(f"Ganancia aplicada: x{ganancia:.2f}")
 
     print("Directorio actual:", os.getcwd())
 
@@ -115,6 +132,8 @@ def transcribir_audio(ruta_audio, modelo='tiny', idioma='es'):
 if __name__ == "__main__":
     while True:
         archivo_grabado = record_voice()  # Espera y graba cuando detecta voz
+        if detector is not None:
+            print(f"Detector de palabra clave: {detector.uso_cpu:.2%} de un núcleo")
         if archivo_grabado:
             try:
                 texto = transcribir_audio(archivo_grabado)
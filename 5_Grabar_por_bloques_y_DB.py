@@ -6,6 +6,10 @@ import scipy.io.wavfile as wav
 import os, time, sqlite3
 from datetime import datetime
 from collections import deque   # Estructura FIFO usada como buffer circular
+from palabra_clave import DetectorPalabraClave
+from procesado_audio import normalizar_ganancia
+from formato_audio import recodificar
+from persistencia_audio import PersistenciaAudio
 
 # --- CONFIGURACIÓN ---
 SAMPLE_RATE = 16000             # Frecuencia de muestreo (Hz) (necesaria para pasar de señal analógica a digital)
@@ -18,8 +22,13 @@ SEGMENTO_DURACION = 10.0        # Duración máxima de cada bloque grabado (segu
 PRE_BUFFER_DUR = 0.5            # Audio previo antes de detectar voz (segundos)
 ENERGY_THRESHOLD = 500         # Umbral RMS mínimo para considerar voz
 DB_PATH = "audios_distancia.db" # Ruta de la base de datos SQLite
+PALABRA_CLAVE = None            # Plantillas del programa 16 (p. ej. "plantillas_palabra_clave.npz"); None = sólo VAD
+NORMALIZAR_GANANCIA = False     # Lleva la voz grabada al RMS objetivo (con limitador) antes de guardarla
+FORMATO_AUDIO = "wav"           # Audio guardado: "wav" o "flac" (sin pérdidas y más pequeño; necesita soundfile)
+GUARDADO_ASINCRONO = True       # Guarda en un hilo aparte (persistencia_audio): no se espera a SQLite para seguir
 
 vad = webrtcvad.Vad(VAD_MODE)   # Inicializa el detector de voz
+detector = DetectorPalabraClave.desde_fichero(PALABRA_CLAVE) if PALABRA_CLAVE else None
 
 # === BASE DE DATOS ===
 def init_db(db_path=DB_PATH): # Crea una base de datos para almacenar los audios grabados y las transcripciones
@@ -41,11 +50,29 @@ def init_db(db_path=DB_PATH): # Crea una base de datos para almacenar los audios
         """)
         conn.commit()
 
+def abrir_persistencia(db_path=DB_PATH):
+    """Cola de guardado en segundo plano para la tabla 'audios' (se cierra con 'with' o cerrar())."""
+    return PersistenciaAudio(db_path, "audios", ["filename", "transcription", "max_rms", "reference_text",
+                                                 "grabacion_duracion", "transcripcion_duracion"],
+                             formato=FORMATO_AUDIO)
+
 def save_to_db(filename, transcription=None, max_rms=None, reference_text=None,
-               grabacion_duracion=None, transcripcion_duracion=None, db_path=DB_PATH):
-    """Guarda el audio y su información en la base de datos."""
+               grabacion_duracion=None, transcripcion_duracion=None, db_path=DB_PATH,
+               audio=None, persistencia=None):
+    """
+    Guarda el audio y su información en la base de datos. Con 'persistencia' (abrir_persistencia) sólo
+    entrega el array 'audio' a la cola y vuelve enseguida; el hilo de guardado hace la escritura.
+    """
+    if persistencia is not None:
+        if audio is None:
+            _, audio = wav.read(filename)
+        persistencia.guardar(audio, SAMPLE_RATE, filename=os.path.basename(filename), transcription=transcription,
+                             max_rms=max_rms, reference_text=reference_text,
+                             grabacion_duracion=grabacion_duracion, transcripcion_duracion=transcripcion_duracion)
+        print(f"Audio '{os.path.basename(filename)}' en cola de guardado ({persistencia.pendientes} pendientes).")
+        return
     with open(filename, "rb") as f:
-        audio_blob = f.read()  # Carga el archivo en binario
+        audio_blob = recodificar(f.read(), FORMATO_AUDIO)  # Carga el archivo en binario (en FLAC si se pide)
     with sqlite3.connect(db_path) as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -78,19 +105,20 @@ def hay_voz(audio_chunk):
     return False
 
 # === GRABACIÓN ===
-def grabar_por_bloques():
-    """Graba audio en bloques hasta detectar silencio prolongado."""
+def grabar_por_bloques(fuente=None):
+    """Graba audio en bloques hasta detectar silencio prolongado (del micrófono o de una fuente alternativa)."""
     print("Esperando voz... (Ctrl+C para salir)")
 
     pre_buffer = deque(maxlen=int(PRE_BUFFER_DUR * SAMPLE_RATE))  # Guarda audio previo
     recording = []              # Lista donde se acumulan frames
     en_grabacion = False
     max_rms = 0.0
-    inicio_bloque = None
+    muestras_bloque = 0          # Muestras grabadas en el bloque actual
     tiempo_inicio = time.time()  # Inicio de la sesión completa
+    abrir_stream = fuente.abrir if fuente is not None else sd.InputStream
 
     try:
-        with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="int16") as stream:
+        with abrir_stream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="int16") as stream:
             while True:
                 frame, _ = stream.read(FRAME_SIZE)     # Lee un bloque de audio
                 frame = frame[:, 0]                    # Canal único
@@ -99,18 +127,22 @@ def grabar_por_bloques():
 
                 if not en_grabacion:
                     pre_buffer.extend(frame)           # Guarda los últimos frames previos
-                    if hay_voz(frame):                 # Si hay voz → inicia grabación
-                        print("Voz detectada, iniciando grabación...")
+                    # Con palabra clave sólo se graba (y se transcribe) tras la frase de activación
+                    disparo = detector.procesar(frame) if detector is not None else hay_voz(frame)
+                    if disparo:                        # Si hay voz → inicia grabación
+                        print("Palabra clave detectada, iniciando grabación..." if detector is not None
+                              else "Voz detectada, iniciando grabación...")
                         en_grabacion = True
-                        inicio_bloque = time.time()
+                        muestras_bloque = 0
                         recording.append(np.array(pre_buffer))
                         pre_buffer.clear()
                 else:
                     recording.append(frame)
-                    tiempo_actual = time.time()
-                    # Cada 10 s verifica si sigue habiendo voz
-                    if tiempo_actual - inicio_bloque >= SEGMENTO_DURACION:
-                        inicio_bloque = tiempo_actual
+                    muestras_bloque += len(frame)
+                    # Cada 10 s de audio verifica si sigue habiendo voz (contado en muestras, no en reloj,
+                    # para que una fuente reproducida más rápido que el tiempo real se comporte igual)
+                    if muestras_bloque >= SEGMENTO_DURACION * SAMPLE_RATE:
+                        muestras_bloque = 0
                         verif_frames = []
                         for _ in range(int(0.5 * 1000 / FRAME_DURATION)):  # 0.5 s de verificación
                             frame_verif, _ = stream.read(FRAME_SIZE)
@@ -126,21 +158,24 @@ def grabar_por_bloques():
 
     except KeyboardInterrupt:
         print("\nInterrumpido por usuario.")
-        return None, None, None
+        return None, None, None, None
 
     if not recording:
         print("No se grabó ningún audio.")
-        return None, None, None
+        return None, None, None, None
 
     # --- Guardar el audio grabado ---
     audio_data = np.concatenate(recording)
+    if NORMALIZAR_GANANCIA:                                 # Evita que una consulta en voz baja necesite un modelo mayor
+        audio_data, ganancia = normalizar_ganancia(audio_data)
+        print(f"Ganancia aplicada: x{ganancia:.2f}")
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")   # Nombre único con fecha/hora para cada audio (así no se sobreescriben)
     filename = os.path.join(os.getcwd(), f"audio_{timestamp}.wav")
     wav.write(filename, SAMPLE_RATE, audio_data)            # Guarda el archivo WAV
     tiempo_fin = time.time()
     duracion = tiempo_fin - tiempo_inicio                   # Duración total
     print(f"Audio guardado: {filename} (Duración: {duracion:.2f} s)")
-    return filename, max_rms, duracion
+    return filename, audio_data, max_rms, duracion
 
 # === TRANSCRIPCIÓN ===
 def transcribir_audio(ruta_audio, modelo=MODEL):
@@ -165,15 +200,25 @@ def transcribir_audio(ruta_audio, modelo=MODEL):
 # === MAIN ===
 if __name__ == "__main__":
     init_db()  # Crea la base de datos si no existe
+    persistencia = abrir_persistencia() if GUARDADO_ASINCRONO else None
 
-    archivo, max_rms, duracion_grabacion = grabar_por_bloques()
-    if archivo:
-        texto, duracion_transcripcion = transcribir_audio(archivo) # Llama a la función que transcribe y muestra todo por terminal
-        # Guarda todo en la base de datos
-        save_to_db(
-            archivo,
-            transcription=texto,
-            max_rms=max_rms,
-            grabacion_duracion=duracion_grabacion,
-            transcripcion_duracion=duracion_transcripcion
-        )
+    try:
+        archivo, audio, max_rms, duracion_grabacion = grabar_por_bloques()
+        if detector is not None:
+            print(f"Detector de palabra clave: {detector.uso_cpu:.2%} de un núcleo "
+                  f"({detector.muestras_procesadas / SAMPLE_RATE:.1f} s escuchados)")
+        if archivo:
+            texto, duracion_transcripcion = transcribir_audio(archivo) # Llama a la función que transcribe y muestra todo por terminal
+            # Guarda todo en la base de datos (en segundo plano si GUARDADO_ASINCRONO)
+            save_to_db(
+                archivo,
+                transcription=texto,
+                max_rms=max_rms,
+                grabacion_duracion=duracion_grabacion,
+                transcripcion_duracion=duracion_transcripcion,
+                audio=audio,
+                persistencia=persistencia
+            )
+    finally:
+        if persistencia is not None:
+            persistencia.cerrar()  # Espera a que termine de guardarse lo encolado
@@ -4,6 +4,8 @@ import scipy.io.wavfile as wav
 import os
 import sqlite3
 import webrtcvad
+from formato_audio import recodificar
+from persistencia_audio import PersistenciaAudio
 
 # --- CONFIGURACIÓN ---
 SAMPLE_RATE = 16000
@@ -13,6 +15,8 @@ FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION / 1000)
 SEGMENTO_DURACION = 10.0  # segundos
 DB_PATH = "audios_grabados.db"
 VAD_MODE = 1  # 0 = menos estricto, 3 = más estricto
+FORMATO_AUDIO = "wav"  # Audio guardado: "wav" o "flac" (sin pérdidas y más pequeño; necesita soundfile)
+GUARDADO_ASINCRONO = True  # Guarda en un hilo aparte (persistencia_audio): se puede grabar otro sin esperar
 
 
 # === FUNCIONES AUXILIARES ===
@@ -59,10 +63,23 @@ def init_db(db_path=DB_PATH):
         conn.commit()
 
 
-def save_audio(filename, max_rms, avg_rms, avg_rms_voz, db_path=DB_PATH):
-    """Guarda el audio y sus métricas básicas."""
+def abrir_persistencia(db_path=DB_PATH):
+    """Cola de guardado en segundo plano para la tabla 'grabaciones'."""
+    return PersistenciaAudio(db_path, "grabaciones", ["filename", "max_rms", "avg_rms", "avg_rms_voz"],
+                             formato=FORMATO_AUDIO)
+
+
+def save_audio(filename, max_rms, avg_rms, avg_rms_voz, db_path=DB_PATH, audio=None, persistencia=None):
+    """Guarda el audio y sus métricas básicas (con 'persistencia', sólo lo encola con el array 'audio')."""
+    if persistencia is not None:
+        if audio is None:
+            _, audio = wav.read(filename)
+        persistencia.guardar(audio, SAMPLE_RATE, filename=os.path.basename(filename), max_rms=max_rms,
+                             avg_rms=avg_rms, avg_rms_voz=avg_rms_voz)
+        print(f"Audio '{filename}' en cola de guardado ({persistencia.pendientes} pendientes).")
+        return
     with open(filename, "rb") as f:
-        audio_blob = f.read()
+        audio_blob = recodificar(f.read(), FORMATO_AUDIO)
     with sqlite3.connect(db_path) as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -74,7 +91,7 @@ def save_audio(filename, max_rms, avg_rms, avg_rms_voz, db_path=DB_PATH):
 
 
 # === GRABACIÓN ===
-def grabar_audio():
+def grabar_audio(fuente=None):
     print("Grabando audio de 10 segundos... (Ctrl+C para cancelar)")
 
     total_frames = int(SAMPLE_RATE * SEGMENTO_DURACION)
@@ -83,9 +100,10 @@ def grabar_audio():
     recording = []
     rms_values = []
     max_rms = 0.0
+    abrir_stream = fuente.abrir if fuente is not None else sd.InputStream  # micrófono o FuenteArchivo
 
     try:
-        with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="int16") as stream:
+        with abrir_stream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="int16") as stream:
             for _ in range(num_chunks):
                 frame, _ = stream.read(FRAME_SIZE)
                 frame = frame[:, 0]
@@ -97,7 +115,7 @@ def grabar_audio():
         print("\nGrabación completada.")
     except KeyboardInterrupt:
         print("\nGrabación interrumpida por el usuario.")
-        return None, None, None, None
+        return None, None, None, None, None
 
     audio_data = np.concatenate(recording)
     avg_rms = float(np.mean(rms_values)) if rms_values else 0.0
@@ -123,19 +141,24 @@ def grabar_audio():
     print(f"RMS promedio (solo voz): {avg_rms_voz:.4f}")
     print(f"RMS redondeado: {rms_int}")
 
-    return final_filename, max_rms, avg_rms, avg_rms_voz
+    return final_filename, audio_data, max_rms, avg_rms, avg_rms_voz
 
 
 # === MAIN ===
 if __name__ == "__main__":
     init_db()
+    persistencia = abrir_persistencia() if GUARDADO_ASINCRONO else None
 
-    while True:
-        archivo, max_rms, avg_rms, avg_rms_voz = grabar_audio()
-        if archivo:
-            save_audio(archivo, max_rms, avg_rms, avg_rms_voz)
-
-        print("\n¿Deseas grabar otro audio? (Y para continuar, otra tecla para salir)")
-        if input("> ").strip().lower() != "y":
-            print("Saliendo del programa.")
-            break
+    try:
+        while True:
+            archivo, audio, max_rms, avg_rms, avg_rms_voz = grabar_audio()
+            if archivo:
+                save_audio(archivo, max_rms, avg_rms, avg_rms_voz, audio=audio, persistencia=persistencia)
+
+            print("\n¿Deseas grabar otro audio? (Y para continuar, otra tecla para salir)")
+            if input("> ").strip().lower() != "y":
+                print("Saliendo del programa.")
+                break
+    finally:
+        if persistencia is not None:
+            persistencia.cerrar()  # Espera a que termine de guardarse lo encolado
@@ -1,15 +1,20 @@
-import whisper
 import sqlite3
-import os
 import numpy as np
 import re
-import difflib
+from procesado_audio import normalizar_ganancia, a_float32
+from metricas import Evaluador, COLUMNAS_RECUENTOS, recuentos
+from audio_whisper import cargar_modelos, decodificar, MelCompartido, CacheMel
+from escritor_resultados import EscritorResultados
+from consultas import agregar_columnas, crear_indices
+from registro_ejecuciones import registrar, finalizar
 
 # --- CONFIGURACIÓN ---
 DB_INPUT = "audios_grabados.db"
 DB_OUTPUT = "audios_transcritos.db"
-MODEL = "small"
+MODELOS = ["small"]   # Se evalúan todos en la misma ejecución sobre los mismos audios (ej: ["tiny", "base", "small"])
 REFERENCIA = "el volumen de mi voz cambia en cada grabación"
+NORMALIZAR_GANANCIA = "no"  # "no" = audio original, "si" = voz llevada al RMS objetivo, "comparar" = ambas variantes
+CACHE_MEL = None   # Caché de log-mel entre ejecuciones (ej: "cache_mel.db"); sus aciertos acortan tiempo_seg
 
 
 # === FUNCIONES AUXILIARES ===
@@ -22,51 +27,6 @@ def normalize_for_wer(text):
     return text
 
 
-def normalize_for_cer(text):
-    if text is None:
-        return ""
-    text = normalize_for_wer(text)
-    return text.replace(" ", "")
-
-
-def word_error_details(reference, hypothesis):
-    ref_words = reference.split()
-    hyp_words = hypothesis.split()
-    seq = difflib.SequenceMatcher(None, ref_words, hyp_words)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == 'replace':
-            S += max(i2 - i1, j2 - j1)
-        elif tag == 'delete':
-            D += i2 - i1
-        elif tag == 'insert':
-            I += j2 - j1
-        elif tag == 'equal':
-            M += (i2 - i1)
-    N = len(ref_words)
-    wer = (S + D + I) / N if N > 0 else 0.0
-    return {"wer": wer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
-def char_error_details(reference, hypothesis):
-    ref_chars = list(reference)
-    hyp_chars = list(hypothesis)
-    seq = difflib.SequenceMatcher(None, ref_chars, hyp_chars)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == 'replace':
-            S += max(i2 - i1, j2 - j1)
-        elif tag == 'delete':
-            D += i2 - i1
-        elif tag == 'insert':
-            I += j2 - j1
-        elif tag == 'equal':
-            M += (i2 - i1)
-    N = len(ref_chars)
-    cer = (S + D + I) / N if N > 0 else 0.0
-    return {"cer": cer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
 # === BASE DE DATOS ===
 def init_db_transcripciones(db_path=DB_OUTPUT):
     with sqlite3.connect(db_path) as conn:
@@ -78,10 +38,16 @@ def init_db_transcripciones(db_path=DB_OUTPUT):
                 transcription TEXT,
                 wer REAL,
                 cer REAL,
-                wer_details TEXT,
-                cer_details TEXT
+                normalizacion_ganancia INTEGER DEFAULT 0,
+                ganancia REAL,
+                model TEXT,
+                ejecucion TEXT
             )
         """)
+        agregar_columnas(cursor, "transcripciones", [("normalizacion_ganancia", "INTEGER DEFAULT 0"),
+                                                     ("ganancia", "REAL"), ("model", "TEXT"), ("ejecucion", "TEXT"),
+                                                     *[(c, "INTEGER") for c in COLUMNAS_RECUENTOS]])
+        crear_indices(cursor, "transcripciones", [["filename"], ["model"], ["ejecucion"]])
         conn.commit()
 
 
@@ -140,55 +106,79 @@ def obtener_audios_por_id(ids):
 
 
 def transcribir_y_guardar(audios):
-    model = whisper.load_model(MODEL)
-    print(f"\nModelo '{MODEL}' cargado correctamente.")
-
-    wers = []
-    cers = []
-
-    for idx, (audio_id, filename, audio_blob) in enumerate(audios, 1):
-        temp_path = f"temp_{filename}"
-        with open(temp_path, "wb") as f:
-            f.write(audio_blob)
-
-        print(f"\n[{idx}/{len(audios)}] Transcribiendo: {filename}")
-        result = model.transcribe(temp_path, language="es")
-        texto = result.get("text", "").strip()
-
-        ref_wer = normalize_for_wer(REFERENCIA)
-        hyp_wer = normalize_for_wer(texto)
-        ref_cer = normalize_for_cer(REFERENCIA)
-        hyp_cer = normalize_for_cer(texto)
-
-        wer_info = word_error_details(ref_wer, hyp_wer)
-        cer_info = char_error_details(ref_cer, hyp_cer)
-
-        os.remove(temp_path)
-
-        with sqlite3.connect(DB_OUTPUT) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO transcripciones (filename, transcription, wer, cer, wer_details, cer_details)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (filename, texto, wer_info["wer"], cer_info["cer"], str(wer_info), str(cer_info)))
-            conn.commit()
-
-        wers.append(wer_info["wer"])
-        cers.append(cer_info["cer"])
-
-        print(f"{filename}:")
-        print(f"   → Transcripción: {texto}")
-        print(f"   → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
+    modelos = cargar_modelos(MODELOS)
+    ejecucion = registrar(DB_OUTPUT, globals(), modelos)   # agrupa las filas de esta ejecución
+
+    # Variantes a evaluar: audio original (False) y/o con normalización de ganancia (True)
+    variantes = [False, True] if NORMALIZAR_GANANCIA == "comparar" else [NORMALIZAR_GANANCIA == "si"]
+    wers = {(m, v): [] for m in modelos for v in variantes}
+    cers = {(m, v): [] for m in modelos for v in variantes}
+    mels_calculados = mels_usados = 0
+    cache = CacheMel(CACHE_MEL) if CACHE_MEL else None
+
+    evaluador = Evaluador(normalize_for_wer)   # la referencia se normaliza una sola vez
+
+    # Una conexión para toda la ejecución; las filas se escriben por lotes (ver escritor_resultados.py)
+    with EscritorResultados(DB_OUTPUT, "transcripciones",
+                            ["filename", "transcription", "wer", "cer", *COLUMNAS_RECUENTOS,
+                             "normalizacion_ganancia", "ganancia", "model", "ejecucion"]) as escritor:
+        for idx, (audio_id, filename, audio_blob) in enumerate(audios, 1):
+            muestras = decodificar(audio_blob)   # una sola decodificación por audio para todos los modelos
+
+            for con_ganancia in variantes:
+                ganancia = None
+                entrada = muestras
+                if con_ganancia:
+                    entrada, ganancia = normalizar_ganancia(muestras)
+                compartido = MelCompartido(a_float32(entrada), cache)
+                compartido.preparar(modelos.values())
+
+                etiqueta = f" (ganancia x{ganancia:.2f})" if con_ganancia else ""
+                for nombre, model in modelos.items():
+                    print(f"\n[{idx}/{len(audios)}] Transcribiendo: {filename}{etiqueta} (modelo: {nombre})")
+                    result = compartido.transcribir(model, language="es")
+                    texto = result.get("text", "").strip()
+
+                    wer_info, cer_info = evaluador.evaluar(REFERENCIA, texto)
+
+                    escritor.agregar((filename, texto, wer_info["wer"], cer_info["cer"], *recuentos(wer_info, cer_info),
+                                      int(con_ganancia), ganancia, nombre, ejecucion))
+
+                    wers[nombre, con_ganancia].append(wer_info["wer"])
+                    cers[nombre, con_ganancia].append(cer_info["cer"])
+
+                    print(f"{filename}{etiqueta}:")
+                    print(f"   → Transcripción: {texto}")
+                    print(f"   → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
+
+                mels_calculados += compartido.calculados
+                mels_usados += compartido.reutilizados
 
     # === RESUMEN FINAL ===
-    if wers and cers:
-        wer_mean, cer_mean = np.mean(wers), np.mean(cers)
-        wer_std, cer_std = np.std(wers), np.std(cers)
-        print("\n=== RESUMEN FINAL ===")
-        print(f"WER medio: {wer_mean:.2%} (±{wer_std:.2%})")
-        print(f"CER medio: {cer_mean:.2%} (±{cer_std:.2%})")
-        print(f"WER máx: {np.max(wers):.2%} | WER mín: {np.min(wers):.2%}")
-        print(f"CER máx: {np.max(cers):.2%} | CER mín: {np.min(cers):.2%}")
+    for nombre in modelos:
+        for con_ganancia in variantes:
+            clave = (nombre, con_ganancia)
+            if not wers[clave]:
+                continue
+            wer_mean, cer_mean = np.mean(wers[clave]), np.mean(cers[clave])
+            wer_std, cer_std = np.std(wers[clave]), np.std(cers[clave])
+            print(f"\n=== RESUMEN FINAL: {nombre.upper()}" +
+                  (" (CON NORMALIZACIÓN DE GANANCIA)" if con_ganancia else "") + " ===")
+            print(f"WER medio: {wer_mean:.2%} (±{wer_std:.2%})")
+            print(f"CER medio: {cer_mean:.2%} (±{cer_std:.2%})")
+            print(f"WER máx: {np.max(wers[clave]):.2%} | WER mín: {np.min(wers[clave]):.2%}")
+            print(f"CER máx: {np.max(cers[clave]):.2%} | CER mín: {np.min(cers[clave]):.2%}")
+
+        if len(variantes) == 2 and wers[nombre, False]:
+            print(f"\nDiferencia con normalización de ganancia ({nombre}) → "
+                  f"WER: {np.mean(wers[nombre, True]) - np.mean(wers[nombre, False]):+.2%} | "
+                  f"CER: {np.mean(cers[nombre, True]) - np.mean(cers[nombre, False]):+.2%}")
+
+    print(f"\nLog-mel calculados: {mels_calculados} para {mels_usados} transcripciones")
+    if cache:
+        cache.imprimir_resumen()
+        cache.cerrar()
+    finalizar(DB_OUTPUT, ejecucion)
 
 
 if __name__ == "__main__":
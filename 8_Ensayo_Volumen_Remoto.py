@@ -2,13 +2,18 @@ import sqlite3
 import os
 import numpy as np
 import re
-import difflib
 import requests
+from procesado_audio import leer_wav_blob, normalizar_ganancia, wav_a_bytes
+from formato_audio import recodificar
+from metricas import Evaluador, COLUMNAS_RECUENTOS, recuentos
+from consultas import agregar_columnas, crear_indices
+from registro_ejecuciones import registrar, finalizar
 
 # --- CONFIGURACIÓN ---
 DB_INPUT = "audios_grabados.db"
 DB_OUTPUT = "audios_transcritos.db"
 REFERENCIA = "el volumen de mi voz cambia en cada grabación"
+NORMALIZAR_GANANCIA = "no"  # "no" = audio original, "si" = voz llevada al RMS objetivo, "comparar" = ambas variantes
 
 # Configuración del servidor remoto
 TRANSCRIBE_SERVER = os.environ.get("TRANSCRIBE_SERVER", "http://192.168.1.12:8000")
@@ -26,49 +31,6 @@ def normalize_for_wer(text):
     return text
 
 
-def normalize_for_cer(text):
-    return normalize_for_wer(text).replace(" ", "")
-
-
-# === FUNCIONES DE ERROR DETALLADAS ===
-def word_error_details(reference, hypothesis):
-    ref_words = reference.split()
-    hyp_words = hypothesis.split()
-    seq = difflib.SequenceMatcher(None, ref_words, hyp_words)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == 'replace':
-            S += max(i2 - i1, j2 - j1)
-        elif tag == 'delete':
-            D += i2 - i1
-        elif tag == 'insert':
-            I += j2 - j1
-        elif tag == 'equal':
-            M += (i2 - i1)
-    N = len(ref_words)
-    wer = (S + D + I) / N if N > 0 else 0.0
-    return {"wer": wer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
-def char_error_details(reference, hypothesis):
-    ref_chars = list(reference)
-    hyp_chars = list(hypothesis)
-    seq = difflib.SequenceMatcher(None, ref_chars, hyp_chars)
-    S = D = I = M = 0
-    for tag, i1, i2, j1, j2 in seq.get_opcodes():
-        if tag == 'replace':
-            S += max(i2 - i1, j2 - j1)
-        elif tag == 'delete':
-            D += i2 - i1
-        elif tag == 'insert':
-            I += j2 - j1
-        elif tag == 'equal':
-            M += (i2 - i1)
-    N = len(ref_chars)
-    cer = (S + D + I) / N if N > 0 else 0.0
-    return {"cer": cer, "S": S, "D": D, "I": I, "M": M, "N": N}
-
-
 # === BASE DE DATOS ===
 def init_db_transcripciones(db_path=DB_OUTPUT):
     """Crea la tabla de transcripciones si no existe."""
@@ -81,11 +43,16 @@ def init_db_transcripciones(db_path=DB_OUTPUT):
             transcription TEXT,
             wer REAL,
             cer REAL,
-            wer_details TEXT,
-            cer_details TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            normalizacion_ganancia INTEGER DEFAULT 0,
+            ganancia REAL,
+            ejecucion TEXT
         )
         """)
+        agregar_columnas(cursor, "transcripciones", [("normalizacion_ganancia", "INTEGER DEFAULT 0"),
+                                                     ("ganancia", "REAL"), ("ejecucion", "TEXT"),
+                                                     *[(c, "INTEGER") for c in COLUMNAS_RECUENTOS]])
+        crear_indices(cursor, "transcripciones", [["filename"], ["ejecucion"]])
         conn.commit()
 
 
@@ -143,55 +110,77 @@ def enviar_a_servidor(filename, audio_blob, language="es"):
 
 # === PROCESO PRINCIPAL ===
 def transcribir_lote(audios):
-    wers, cers = [], []
+    ejecucion = registrar(DB_OUTPUT, globals())   # agrupa las filas de esta ejecución
+    # Variantes a evaluar: audio original (False) y/o con normalización de ganancia (True)
+    variantes = [False, True] if NORMALIZAR_GANANCIA == "comparar" else [NORMALIZAR_GANANCIA == "si"]
+    wers = {v: [] for v in variantes}
+    cers = {v: [] for v in variantes}
+    evaluador = Evaluador(normalize_for_wer)   # la referencia se normaliza una sola vez
 
     for idx, (audio_id, filename, audio_blob) in enumerate(audios, 1):
-        print(f"\n[{idx}/{len(audios)}] Enviando '{filename}' al servidor...")
-
-        texto = enviar_a_servidor(filename, audio_blob)
-        if texto is None:
-            continue
-
-        ref = REFERENCIA
-
-        wer_info = word_error_details(normalize_for_wer(ref), normalize_for_wer(texto))
-        cer_info = char_error_details(normalize_for_cer(ref), normalize_for_cer(texto))
-
-        wers.append(wer_info["wer"])
-        cers.append(cer_info["cer"])
-
-        print(f"{filename}")
-        print(f" → Transcripción: {texto.strip()}")
-        print(f" → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
-
-        with sqlite3.connect(DB_OUTPUT) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-            INSERT INTO transcripciones (filename, transcription, wer, cer, wer_details, cer_details)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                filename,
-                texto,
-                wer_info["wer"],
-                cer_info["cer"],
-                str(wer_info),
-                str(cer_info)
-            ))
-            conn.commit()
+        for con_ganancia in variantes:
+            envio = recodificar(audio_blob, "wav")   # el servidor recibe WAV aunque se guarde en FLAC
+            ganancia = None
+            if con_ganancia:
+                audio, ganancia = normalizar_ganancia(leer_wav_blob(audio_blob))
+                envio = wav_a_bytes(audio)
+
+            etiqueta = f" (ganancia x{ganancia:.2f})" if con_ganancia else ""
+            print(f"\n[{idx}/{len(audios)}] Enviando '{filename}' al servidor{etiqueta}...")
+
+            texto = enviar_a_servidor(filename, envio)
+            if texto is None:
+                continue
+
+            ref = REFERENCIA
+
+            wer_info, cer_info = evaluador.evaluar(ref, texto)
+
+            wers[con_ganancia].append(wer_info["wer"])
+            cers[con_ganancia].append(cer_info["cer"])
+
+            print(f"{filename}{etiqueta}")
+            print(f" → Transcripción: {texto.strip()}")
+            print(f" → WER: {wer_info['wer']:.2%} | CER: {cer_info['cer']:.2%}")
+
+            with sqlite3.connect(DB_OUTPUT) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                INSERT INTO transcripciones (filename, transcription, wer, cer, {", ".join(COLUMNAS_RECUENTOS)},
+                                             normalizacion_ganancia, ganancia, ejecucion)
+                VALUES (?, ?, ?, ?, {", ".join("?" for _ in COLUMNAS_RECUENTOS)}, ?, ?, ?)
+                """, (
+                    filename,
+                    texto,
+                    wer_info["wer"],
+                    cer_info["cer"],
+                    *recuentos(wer_info, cer_info),
+                    int(con_ganancia),
+                    ganancia,
+                    ejecucion
+                ))
+                conn.commit()
 
     # --- Mostrar estadísticas globales solo en consola ---
-    if wers:
-        wer_mean, cer_mean = np.mean(wers), np.mean(cers)
-        wer_std, cer_std = np.std(wers), np.std(cers)
-        wer_max, wer_min = np.max(wers), np.min(wers)
-        cer_max, cer_min = np.max(cers), np.min(cers)
+    for con_ganancia in variantes:
+        if not wers[con_ganancia]:
+            continue
+        wer_mean, cer_mean = np.mean(wers[con_ganancia]), np.mean(cers[con_ganancia])
+        wer_std, cer_std = np.std(wers[con_ganancia]), np.std(cers[con_ganancia])
+        wer_max, wer_min = np.max(wers[con_ganancia]), np.min(wers[con_ganancia])
+        cer_max, cer_min = np.max(cers[con_ganancia]), np.min(cers[con_ganancia])
 
-        print("\n=== RESULTADOS GLOBALES ===")
+        print("\n=== RESULTADOS GLOBALES" + (" (CON NORMALIZACIÓN DE GANANCIA)" if con_ganancia else "") + " ===")
         print(f"WER medio: {wer_mean:.2%} (±{wer_std:.2%})")
         print(f"CER medio: {cer_mean:.2%} (±{cer_std:.2%})")
         print(f"WER máx: {wer_max:.2%} | WER mín: {wer_min:.2%}")
         print(f"CER máx: {cer_max:.2%} | CER mín: {cer_min:.2%}")
 
+    if len(variantes) == 2 and wers[False] and wers[True]:
+        print(f"\nDiferencia con normalización de ganancia → WER: {np.mean(wers[True]) - np.mean(wers[False]):+.2%} | "
+              f"CER: {np.mean(cers[True]) - np.mean(cers[False]):+.2%}")
+    finalizar(DB_OUTPUT, ejecucion)
+
 
 # === MAIN ===
 if __name__ == "__main__":
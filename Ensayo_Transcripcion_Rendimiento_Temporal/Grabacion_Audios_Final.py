@@ -4,7 +4,6 @@ import scipy.io.wavfile as wav
 import os
 import sqlite3
 import webrtcvad
-import time
 from collections import deque
 
 # --- CONFIGURACIÓN ---
@@ -99,16 +98,18 @@ def save_audio(filename, max_rms, avg_rms, avg_rms_voz, tipo, frase, version, db
 
 
 # === GRABACIÓN AUTOMÁTICA ===
-def grabar_por_voz(tipo, frase, version):
+def grabar_por_voz(tipo, frase, version, fuente=None):
     print("\n🎤 Esperando voz... (Ctrl+C para salir)")
     pre_buffer = deque(maxlen=int(PRE_BUFFER_DUR * SAMPLE_RATE))
     recording = []
     en_grabacion = False
     max_rms = 0.0
     rms_values = []
+    muestras_bloque = 0
+    abrir_stream = fuente.abrir if fuente is not None else sd.InputStream  # micrófono o FuenteArchivo
 
     try:
-        with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="int16") as stream:
+        with abrir_stream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="int16") as stream:
             while True:
                 frame, _ = stream.read(FRAME_SIZE)
                 frame = frame[:, 0]
@@ -124,11 +125,12 @@ def grabar_por_voz(tipo, frase, version):
                         en_grabacion = True
                         recording.append(np.array(pre_buffer))
                         pre_buffer.clear()
-                        inicio_bloque = time.time()
+                        muestras_bloque = 0
                 else:
                     recording.append(frame)
-                    tiempo_actual = time.time()
-                    if tiempo_actual - inicio_bloque >= SEGMENTO_DURACION:
+                    muestras_bloque += len(frame)
+                    # Bloque contado en muestras (no en reloj) para que funcione igual con fuentes reproducidas
+                    if muestras_bloque >= SEGMENTO_DURACION * SAMPLE_RATE:
                         # Se cumple el bloque de 10s → verificamos si hay voz
                         verif_frames = []
                         for _ in range(int(0.5 * 1000 / FRAME_DURATION)):
@@ -142,7 +144,7 @@ def grabar_por_voz(tipo, frase, version):
                             break
                         else:
                             print("📢 Se sigue detectando voz, continuando grabación...")
-                            inicio_bloque = tiempo_actual
+                            muestras_bloque = 0
     except KeyboardInterrupt:
         print("\nInterrumpido por usuario.")
         return None, None, None, None
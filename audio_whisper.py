@@ -0,0 +1,203 @@
+# audio_whisper.py
+# Entrada común a Whisper para los programas que evalúan varios modelos sobre los mismos audios (7, 10 y 12).
+# Cada audio se decodifica una sola vez desde el BLOB de la base de datos (sin ficheros temporales ni ffmpeg)
+# y su espectrograma log-mel se calcula una vez y se reutiliza en todos los modelos con el mismo nº de bandas.
+# Con CacheMel los log-mel se guardan además en disco y las ejecuciones siguientes ya no los calculan.
+
+import hashlib
+import importlib
+import sqlite3
+import time
+import zlib
+import numpy as np
+from scipy.signal import resample_poly
+import torch
+import whisper
+from formato_audio import leer_blob
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE   # 16 kHz
+N_SAMPLES = whisper.audio.N_SAMPLES       # relleno de 30 s que añade model.transcribe
+
+# model.transcribe calcula el log-mel llamando a esta función del módulo whisper.transcribe
+_modulo_transcribe = importlib.import_module("whisper.transcribe")
+_log_mel_original = _modulo_transcribe.log_mel_spectrogram
+
+
+def cargar_modelos(nombres):
+    """Carga una vez cada modelo de la lista. Devuelve {nombre: modelo}."""
+    modelos = {}
+    for nombre in nombres:
+        modelos[nombre] = whisper.load_model(nombre)
+        print(f"Modelo '{nombre}' cargado correctamente.")
+    return modelos
+
+
+def decodificar(audio_blob):
+    """BLOB WAV o FLAC → audio int16 mono a 16 kHz (se remuestrea si la grabación tiene otra frecuencia)."""
+    rate, audio = leer_blob(audio_blob)
+    if len(audio.shape) > 1:
+        audio = audio[:, 0]
+    if audio.dtype != np.int16:
+        raise ValueError(f"Se esperaba audio int16 y el BLOB contiene {audio.dtype}")
+    if rate != SAMPLE_RATE:
+        audio = np.clip(resample_poly(audio.astype(np.float32), SAMPLE_RATE, rate), -32768, 32767).astype(np.int16)
+    return audio
+
+
+class CacheMel:
+    """
+    Log-mel ya calculados, en una base de datos aparte (float16 comprimido con zlib). La clave es el hash de las
+    muestras que recibe el modelo (cada variante de preprocesado tiene las suyas y no depende de cómo esté
+    guardado el audio), el número de bandas, el relleno y la versión de Whisper.
+    """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS mels (
+                audio_hash TEXT,
+                n_mels INTEGER,
+                padding INTEGER,
+                version TEXT,
+                frames INTEGER,
+                tiempo_calculo REAL,
+                datos BLOB,
+                PRIMARY KEY (audio_hash, n_mels, padding, version)
+            )
+        """)
+        self.version = getattr(whisper, "__version__", "")
+        self.aciertos = 0
+        self.fallos = 0
+        self.tiempo_lectura = 0.0    # segundos leyendo log-mel de la caché (aciertos)
+        self.tiempo_calculo = 0.0    # segundos calculando log-mel que no estaban (fallos)
+        self.tiempo_ahorrado = 0.0   # cálculo evitado menos lectura de la caché
+
+    @staticmethod
+    def hash_audio(audio):
+        return hashlib.sha1(np.ascontiguousarray(audio).tobytes()).hexdigest()
+
+    def obtener(self, audio_hash, n_mels, padding, calcular):
+        """
+        Log-mel de la caché o, si no está, calcular() guardado en ella. En los dos casos se devuelve el valor
+        en float16, para que la transcripción no dependa de si el log-mel venía de la caché.
+        """
+        t0 = time.perf_counter()
+        fila = self.conn.execute("""
+            SELECT frames, tiempo_calculo, datos FROM mels
+            WHERE audio_hash = ? AND n_mels = ? AND padding = ? AND version = ?
+        """, (audio_hash, n_mels, padding, self.version)).fetchone()
+        if fila:
+            frames, tiempo_calculo, datos = fila
+            mel = np.frombuffer(zlib.decompress(datos), dtype=np.float16).reshape(n_mels, frames)
+            self.aciertos += 1
+            lectura = time.perf_counter() - t0
+            self.tiempo_lectura += lectura
+            self.tiempo_ahorrado += tiempo_calculo - lectura
+        else:
+            t0 = time.perf_counter()
+            calculado = calcular()
+            tiempo_calculo = time.perf_counter() - t0
+            calculado = calculado.cpu().numpy() if hasattr(calculado, "cpu") else np.asarray(calculado)
+            mel = calculado.astype(np.float16)
+            self.conn.execute("INSERT OR REPLACE INTO mels VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (audio_hash, n_mels, padding, self.version, mel.shape[1], tiempo_calculo,
+                               zlib.compress(mel.tobytes(), 1)))
+            self.conn.commit()
+            self.fallos += 1
+            self.tiempo_calculo += tiempo_calculo
+        return torch.from_numpy(mel.astype(np.float32))
+
+    def imprimir_resumen(self):
+        total = self.aciertos + self.fallos
+        if total:
+            print(f"🗃️ Caché de log-mel: {self.aciertos} de {total} leídos de la caché ({self.aciertos / total:.0%}) en "
+                  f"{self.tiempo_lectura:.2f} s | {self.fallos} calculados en {self.tiempo_calculo:.2f} s | "
+                  f"{self.tiempo_ahorrado:.1f} s de cálculo ahorrados")
+            if self.aciertos:
+                print("   ⚠️ Los log-mel leídos de la caché cuentan en tiempo_seg su lectura, no su cálculo "
+                      "(filas con mel_cache = 1).")
+
+    def cerrar(self):
+        self.conn.close()
+
+
+class MelCompartido:
+    """
+    Un audio float32 (a_float32 de procesado_audio) y sus espectrogramas log-mel (uno por número de bandas). 'transcribir' llama a
+    model.transcribe con ese audio y hace que reutilice el log-mel ya calculado en lugar de repetirlo.
+    Con una CacheMel, los log-mel se buscan primero en ella. tiempo_mel() y mel_cache() dicen, para cada
+    modelo, cuánto costó su log-mel y si se leyó de la caché, para sumarlo a su tiempo de transcripción.
+    """
+
+    def __init__(self, audio, cache=None):
+        self.audio = audio
+        self.cache = cache
+        self.calculados = 0      # log-mel calculados (o leídos de la caché)
+        self.reutilizados = 0    # veces que un modelo ha usado uno ya calculado
+        self._mels = {}
+        self._tiempos = {}       # segundos de cálculo (o de lectura de la caché) de cada log-mel
+        self._de_cache = {}      # True si el log-mel se leyó de la caché
+        self._hash = None
+
+    def _calcular(self, n_mels, padding, device=None):
+        t0 = time.perf_counter()
+        aciertos = self.cache.aciertos if self.cache is not None else 0
+        if self.cache is None or device is not None:
+            mel = _log_mel_original(self.audio, n_mels, padding=padding, device=device)
+        else:
+            if self._hash is None:
+                self._hash = self.cache.hash_audio(self.audio)
+            mel = self.cache.obtener(self._hash, n_mels, padding,
+                                     lambda: _log_mel_original(self.audio, n_mels, padding=padding))
+        clave = (n_mels, padding, str(device))
+        self._tiempos[clave] = time.perf_counter() - t0
+        self._de_cache[clave] = self.cache is not None and self.cache.aciertos > aciertos
+        return mel
+
+    def _log_mel(self, audio, n_mels=80, padding=0, device=None):
+        if audio is not self.audio:
+            return _log_mel_original(audio, n_mels, padding=padding, device=device)
+        clave = (n_mels, padding, str(device))
+        if clave in self._mels:
+            self.reutilizados += 1
+        else:
+            self._mels[clave] = self._calcular(n_mels, padding, device)
+            self.calculados += 1
+        return self._mels[clave]
+
+    def preparar(self, modelos):
+        """
+        Calcula por adelantado el log-mel que usará cada modelo (una vez por número de bandas). Su tiempo no se
+        pierde: los programas lo suman al de cada modelo con tiempo_mel(), como cuando cada uno lo calculaba.
+        """
+        for n_mels in sorted({model.dims.n_mels for model in modelos}):
+            clave = (n_mels, N_SAMPLES, str(None))
+            if clave not in self._mels:
+                self._mels[clave] = self._calcular(n_mels, N_SAMPLES)
+                self.calculados += 1
+
+    def tiempo_mel(self, model):
+        """Segundos que costó el log-mel de este modelo (calculado o leído de la caché; 0 si no se ha hecho)."""
+        return self._tiempos.get((model.dims.n_mels, N_SAMPLES, str(None)), 0.0)
+
+    def mel_cache(self, model):
+        """True si el log-mel de este modelo se leyó de la caché en lugar de calcularse."""
+        return self._de_cache.get((model.dims.n_mels, N_SAMPLES, str(None)), False)
+
+    def transcribir(self, model, **opciones):
+        _modulo_transcribe.log_mel_spectrogram = self._log_mel
+        try:
+            return model.transcribe(self.audio, **opciones)
+        finally:
+            _modulo_transcribe.log_mel_spectrogram = _log_mel_original
+
+
+def calentar(model, audio, veces=1, **opciones):
+    """
+    Transcripciones sin medir antes de las medidas: la primera llamada a model.transcribe paga costes
+    únicos (reserva de memoria, inicialización de kernels, páginas del modelo aún sin leer del disco).
+    """
+    for _ in range(veces):
+        model.transcribe(audio, **opciones)
@@ -0,0 +1,67 @@
+# consultas.py
+# Consultas de análisis sobre las tablas de resultados. Número de filas, media, desviación típica, mínimo y
+# máximo por grupo se calculan en SQL (GROUP BY sobre columnas indexadas); los percentiles, con NumPy sobre
+# las columnas leídas de una vez. Un informe sobre decenas de miles de filas tarda milisegundos.
+
+import sqlite3
+import numpy as np
+from latencias import PERCENTILES, percentiles_agrupados
+
+
+def crear_indices(conn, tabla, indices):
+    """Crea (si no existen) los índices indicados, cada uno como lista de columnas."""
+    for columnas in indices:
+        nombre = f"idx_{tabla}_{'_'.join(columnas)}"
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({', '.join(columnas)})")
+
+
+def agregar_columnas(cursor, tabla, columnas):
+    """Añade a una tabla ya existente (bases de datos de ensayos anteriores) las columnas que le falten."""
+    existentes = {fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})")}
+    for nombre, tipo in columnas:
+        if nombre not in existentes:
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}")
+
+
+def existe_tabla(conn, tabla):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone() is not None
+
+
+def estadisticas(db_path, valores, grupo, origen="transcripciones", donde=None, parametros=(),
+                 percentiles=PERCENTILES):
+    """
+    Estadísticas de las columnas 'valores' por 'grupo' (una o varias columnas), sobre 'origen' (tabla o JOIN)
+    filtrado con 'donde'. Devuelve {clave: {valor: {"n", "media", "std", "min", "max", "p50", ...}}};
+    la clave es una tupla si el grupo tiene varias columnas. Los NULL no cuentan.
+    """
+    filtro = f"WHERE {donde}" if donde else ""
+    agregados = ", ".join(f"COUNT({v}), AVG({v}), AVG({v} * {v}), MIN({v}), MAX({v})" for v in valores)
+    columnas = ", ".join(valores)
+    with sqlite3.connect(db_path) as conn:
+        resumen = conn.execute(f"SELECT {grupo}, {agregados} FROM {origen} {filtro} GROUP BY {grupo} ORDER BY {grupo}",
+                               parametros).fetchall()
+        filas = conn.execute(f"SELECT {grupo}, {columnas} FROM {origen} {filtro} ORDER BY {grupo}",
+                             parametros).fetchall() if percentiles else []
+
+    num_grupo = len(resumen[0]) - 5 * len(valores) if resumen else 0
+    resultado = {}
+    for fila in resumen:
+        clave = fila[:num_grupo] if num_grupo > 1 else fila[0]
+        resultado[clave] = {}
+        for i, valor in enumerate(valores):
+            n, media, media_cuadrados, minimo, maximo = fila[num_grupo + 5 * i:num_grupo + 5 * (i + 1)]
+            std = float(np.sqrt(max(media_cuadrados - media * media, 0.0))) if n else None   # como np.std
+            resultado[clave][valor] = {"n": n, "media": media, "std": std, "min": minimo, "max": maximo}
+
+    if filas:
+        leidas = list(zip(*filas))   # columnas
+        grupos = zip(*leidas[:num_grupo]) if num_grupo > 1 else leidas[0]
+        claves = {}
+        indices = np.fromiter((claves.setdefault(c, len(claves)) for c in grupos), dtype=np.int64, count=len(filas))
+        for i, valor in enumerate(valores):
+            datos = np.array(leidas[num_grupo + i], dtype=np.float64)   # NULL → NaN, que no cuenta
+            _, tabla = percentiles_agrupados(indices, datos, percentiles)
+            for clave, g in claves.items():
+                for p, v in zip(percentiles, tabla[g]):
+                    resultado[clave][valor][f"p{p}"] = float(v)
+    return resultado
@@ -0,0 +1,100 @@
+# dataset_audio.py
+# Lectura de las grabaciones de una base de datos sin cargar todos los BLOB en memoria: primero sólo los
+# metadatos (nombre, tipo, frase...) y después los audios uno a uno con la E/S incremental de BLOB de
+# SQLite, leyendo por delante en otro hilo hasta PREFETCH audios. La memoria no crece con el tamaño del ensayo.
+
+import hashlib
+import queue
+import sqlite3
+import threading
+
+PREFETCH = 2                 # Audios leídos por delante mientras se transcribe el actual
+TAM_BLOQUE = 64 * 1024       # Bytes por lectura del BLOB
+
+
+class DatasetAudio:
+    """Grabaciones de 'tabla' (columna 'audio'), identificadas por su rowid."""
+
+    def __init__(self, db_path, tabla="grabaciones", columna="audio", prefetch=PREFETCH):
+        self.db_path = db_path
+        self.tabla = tabla
+        self.columna = columna
+        self.prefetch = prefetch
+
+    def metadatos(self, columnas, orden=None):
+        """Lista de (rowid, *columnas) sin leer los audios."""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(f"SELECT rowid, {columnas} FROM {self.tabla}"
+                                + (f" ORDER BY {orden}" if orden else "")).fetchall()
+
+    def _bloques(self, conn, rowid):
+        """Trozos de TAM_BLOQUE bytes del BLOB, sin cargarlo entero en memoria."""
+        if not hasattr(conn, "blobopen"):   # Python < 3.11: el BLOB entero con un SELECT
+            yield conn.execute(f"SELECT {self.columna} FROM {self.tabla} WHERE rowid = ?", (rowid,)).fetchone()[0]
+            return
+        with conn.blobopen(self.tabla, self.columna, rowid, readonly=True) as blob:
+            while True:
+                bloque = blob.read(TAM_BLOQUE)
+                if not bloque:
+                    return
+                yield bloque
+
+    def leer(self, rowid, conn=None):
+        """BLOB completo de una grabación."""
+        if conn is None:
+            with sqlite3.connect(self.db_path) as conn:
+                return b"".join(self._bloques(conn, rowid))
+        return b"".join(self._bloques(conn, rowid))
+
+    def hashes(self, rowids):
+        """{rowid: sha1 del audio}, igual que manifiesto.hash_audio pero leyendo el BLOB por trozos."""
+        resultado = {}
+        with sqlite3.connect(self.db_path) as conn:
+            for rowid in rowids:
+                h = hashlib.sha1()
+                for bloque in self._bloques(conn, rowid):
+                    h.update(bloque)
+                resultado[rowid] = h.hexdigest()
+        return resultado
+
+    def audios(self, rowids):
+        """
+        Genera (rowid, BLOB) en el orden de 'rowids'. Un hilo lector con su propia conexión va leyendo por
+        delante; la cola limita a 'prefetch' los audios en memoria además del que se está procesando.
+        """
+        cola = queue.Queue(maxsize=max(self.prefetch, 1))
+        parar = threading.Event()
+
+        def poner(elemento):
+            while not parar.is_set():
+                try:
+                    cola.put(elemento, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def lector():
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    for rowid in rowids:
+                        if not poner((rowid, self.leer(rowid, conn))):
+                            return
+            except Exception as e:
+                poner(e)
+                return
+            poner(None)
+
+        hilo = threading.Thread(target=lector, daemon=True)
+        hilo.start()
+        try:
+            while True:
+                elemento = cola.get()
+                if elemento is None:
+                    return
+                if isinstance(elemento, Exception):
+                    raise elemento
+                yield elemento
+        finally:
+            parar.set()   # si el consumidor se detiene antes (interrupción), el lector termina
+            hilo.join()
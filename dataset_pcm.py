@@ -0,0 +1,131 @@
+# dataset_pcm.py
+# Exportación de una tabla de grabaciones a un único fichero de muestras int16 contiguas (.pcm) más un índice
+# NumPy (.npy) con la posición, la longitud y los metadatos de cada audio (id, filename, tipo, frase, RMS...).
+# El fichero se abre con np.memmap: cada audio es una vista sin copia, no hay BLOB ni cabeceras que leer, y los
+# procesos de un Pool comparten las mismas páginas de memoria. Lo generan los programas 25 y los usan 14 y 20.
+
+import os
+import sqlite3
+import numpy as np
+from dataset_audio import DatasetAudio
+from formato_audio import leer_blob
+
+DIR_PCM = "pcm"   # Carpeta de las exportaciones, una por base de datos de grabaciones
+
+
+def ruta_exportacion(db_path, directorio=DIR_PCM):
+    """Ruta base (sin extensión) de la exportación de una base de datos."""
+    return os.path.join(directorio, os.path.splitext(os.path.basename(db_path))[0])
+
+
+def _valor_columna(valor):
+    """
+    Valor de una columna de metadatos tal como se guarda en el índice. Las versiones antiguas del programa 6
+    guardaban los RMS como np.float32, que SQLite almacena como BLOB de 4 bytes (ver safe_float en el 7).
+    """
+    if isinstance(valor, (bytes, bytearray)):
+        if len(valor) == 4:
+            return float(np.frombuffer(valor, dtype=np.float32)[0])
+        if len(valor) == 8:
+            return float(np.frombuffer(valor, dtype=np.float64)[0])
+        return float("nan")
+    return valor
+
+
+def _tipo_columna(valores):
+    """dtype del índice para una columna de la tabla: entero, real o texto de ancho fijo."""
+    presentes = [v for v in valores if v is not None]
+    if not presentes:
+        return np.float64, np.nan   # columna vacía (p. ej. avg_rms_voz sin calcular)
+    if all(isinstance(v, int) for v in presentes):
+        return np.int64, -1
+    if all(isinstance(v, (int, float)) for v in presentes):
+        return np.float64, np.nan
+    return f"U{max([len(str(v)) for v in presentes] or [1])}", ""
+
+
+def exportar(db_path, ruta=None, tabla="grabaciones"):
+    """
+    Escribe <ruta>.pcm y <ruta>.npy a partir de la tabla (audio mono int16). Los audios se leen de uno en uno
+    con DatasetAudio, así que la memoria no depende del tamaño de la base de datos. Devuelve la ruta base.
+    """
+    ruta = ruta or ruta_exportacion(db_path)
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with sqlite3.connect(db_path) as conn:
+        columnas = [fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})") if fila[1] != "audio"]
+    dataset = DatasetAudio(db_path, tabla)
+    metadatos = dataset.metadatos(", ".join(columnas), orden="rowid")
+
+    inicios, longitudes, frecuencias, rms, picos = [], [], [], [], []
+    posicion = 0
+    with open(ruta + ".pcm", "wb") as f:
+        for rowid, audio_blob in dataset.audios([fila[0] for fila in metadatos]):
+            rate, audio = leer_blob(audio_blob)
+            if len(audio.shape) > 1:
+                audio = audio[:, 0]
+            if audio.dtype != np.int16:
+                raise ValueError(f"{db_path} (fila {rowid}): se esperaba audio int16 y es {audio.dtype}")
+            f.write(np.ascontiguousarray(audio).tobytes())
+            inicios.append(posicion)
+            longitudes.append(len(audio))
+            frecuencias.append(rate)
+            rms.append(float(np.sqrt(np.mean(audio.astype(np.float32) ** 2))) if len(audio) else 0.0)
+            picos.append(int(np.abs(audio.astype(np.int32)).max()) if len(audio) else 0)
+            posicion += len(audio)
+
+    campos = [("rowid", np.int64), ("inicio", np.int64), ("longitud", np.int64), ("sample_rate", np.int32),
+              ("rms", np.float32), ("pico", np.int32)]
+    valores_columnas = ([[_valor_columna(v) for v in valores] for valores in list(zip(*metadatos))[1:]]
+                        if metadatos else [[] for _ in columnas])
+    vacios = []
+    for nombre, valores in zip(columnas, valores_columnas):
+        tipo, vacio = _tipo_columna(valores)
+        campos.append((nombre, tipo))
+        vacios.append(vacio)
+    indice = np.zeros(len(metadatos), dtype=campos)
+    indice["rowid"] = [fila[0] for fila in metadatos]
+    indice["inicio"], indice["longitud"], indice["sample_rate"] = inicios, longitudes, frecuencias
+    indice["rms"], indice["pico"] = rms, picos
+    for nombre, valores, vacio in zip(columnas, valores_columnas, vacios):
+        indice[nombre] = [vacio if v is None else v for v in valores]
+    np.save(ruta + ".npy", indice)
+    return ruta
+
+
+class DatasetPCM:
+    """Audios de una exportación: audio(i) es una vista int16 del fichero (sin copia), indice sus metadatos."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.indice = np.load(ruta + ".npy")
+        tamano = os.path.getsize(ruta + ".pcm")
+        # np.memmap no admite ficheros vacíos
+        self.pcm = np.memmap(ruta + ".pcm", dtype=np.int16, mode="r") if tamano else np.zeros(0, dtype=np.int16)
+
+    @classmethod
+    def si_actualizado(cls, db_path, ruta=None, tabla="grabaciones"):
+        """La exportación de la base de datos si existe y tiene las mismas filas que la tabla; si no, None."""
+        ruta = ruta or ruta_exportacion(db_path)
+        if not (os.path.exists(ruta + ".npy") and os.path.exists(ruta + ".pcm")):
+            return None
+        if os.path.getmtime(ruta + ".npy") < os.path.getmtime(db_path):
+            return None
+        dataset = cls(ruta)
+        with sqlite3.connect(db_path) as conn:
+            rowids = [fila[0] for fila in conn.execute(f"SELECT rowid FROM {tabla} ORDER BY rowid")]
+        return dataset if rowids == dataset.indice["rowid"].tolist() else None
+
+    def __len__(self):
+        return len(self.indice)
+
+    def audio(self, i):
+        """Audio int16 de la posición i del índice, como vista del fichero."""
+        inicio, longitud = int(self.indice["inicio"][i]), int(self.indice["longitud"][i])
+        return self.pcm[inicio:inicio + longitud]
+
+    def __getitem__(self, i):
+        return self.audio(i)
+
+    def orden(self, *columnas):
+        """Posiciones del índice ordenadas por las columnas indicadas (la primera es la principal)."""
+        return np.lexsort([self.indice[c] for c in reversed(columnas)]) if columnas else np.arange(len(self))
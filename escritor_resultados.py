@@ -0,0 +1,72 @@
+# escritor_resultados.py
+# Escritura de los resultados de los programas de evaluación (7, 10, 12 y 13) con una sola conexión abierta
+# en modo WAL. Las filas se acumulan y se insertan con executemany en una transacción cada MAX_FILAS filas
+# o MAX_SEGUNDOS segundos, y al cerrar; así la tarjeta SD hace un fsync por lote y no uno por audio.
+
+import sqlite3
+import time
+
+MAX_FILAS = 50       # Filas acumuladas antes de escribir
+MAX_SEGUNDOS = 10.0  # Tiempo máximo que una fila espera en memoria
+
+
+class EscritorResultados:
+    """
+    Inserta filas en 'tabla' por lotes. A 'agregar' se le puede pasar una función al_guardar(conn, id_fila)
+    que se ejecuta en la misma transacción que el lote (p. ej. Manifiesto.al_guardar), de modo que tras un
+    corte se conservan la fila y su registro o ninguno de los dos. Se usa como gestor de contexto.
+    """
+
+    def __init__(self, db_path, tabla, columnas, max_filas=MAX_FILAS, max_segundos=MAX_SEGUNDOS):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")   # en WAL sólo sincroniza en los checkpoints
+        self._sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' for _ in columnas)})"
+        self.max_filas = max_filas
+        self.max_segundos = max_segundos
+        self._pendientes = []
+        self._desde = time.perf_counter()
+        self.filas = 0
+        self.transacciones = 0
+        self.tiempo_escritura = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()   # también si se interrumpe: las filas acumuladas ya son resultados válidos
+
+    def agregar(self, fila, al_guardar=None):
+        if not self._pendientes:
+            self._desde = time.perf_counter()
+        self._pendientes.append((fila, al_guardar))
+        if len(self._pendientes) >= self.max_filas or time.perf_counter() - self._desde >= self.max_segundos:
+            self.vaciar()
+
+    def vaciar(self):
+        """Escribe las filas acumuladas en una sola transacción."""
+        if not self._pendientes:
+            return
+        t0 = time.perf_counter()
+        with self.conn:   # commit al salir, rollback si falla
+            self.conn.executemany(self._sql, [fila for fila, _ in self._pendientes])
+            # Con la base de datos bloqueada por la transacción, los ids del lote son consecutivos
+            ultimo = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            primero = ultimo - len(self._pendientes) + 1
+            for id_fila, (_, al_guardar) in enumerate(self._pendientes, primero):
+                if al_guardar:
+                    al_guardar(self.conn, id_fila)
+        self.tiempo_escritura += time.perf_counter() - t0
+        self.filas += len(self._pendientes)
+        self.transacciones += 1
+        self._pendientes = []
+
+    def cerrar(self):
+        try:
+            self.vaciar()
+        finally:
+            self.conn.close()
+        if self.filas:
+            velocidad = self.filas / max(self.tiempo_escritura, 1e-9)
+            print(f"💾 {self.filas} filas en {self.transacciones} transacciones | "
+                  f"{self.tiempo_escritura:.3f} s escribiendo ({velocidad:.0f} filas/s)")
@@ -0,0 +1,67 @@
+# formato_audio.py
+# Formato de los BLOB de audio de las bases de datos de grabaciones. Por defecto se guarda el fichero WAV tal
+# cual; con "flac" se guarda comprimido sin pérdidas (las mismas muestras int16 en bastante menos espacio).
+# Al leer, el formato se reconoce por la cabecera ("RIFF" o "fLaC"), así que todos los programas leen igual
+# las bases de datos antiguas, las nuevas y las migradas con el programa 24.
+
+import io
+import wave
+import numpy as np
+import scipy.io.wavfile as wav
+
+try:
+    import soundfile as sf   # libsndfile, sólo necesario para FLAC (pip install soundfile)
+except (ImportError, OSError):
+    sf = None
+
+FORMATOS = ("wav", "flac")
+
+
+def formato_blob(audio_blob):
+    """'flac' o 'wav' según la cabecera del BLOB."""
+    return "flac" if audio_blob[:4] == b"fLaC" else "wav"
+
+
+def _soundfile():
+    if sf is None:
+        raise ImportError("El formato FLAC necesita el paquete 'soundfile' (pip install soundfile)")
+    return sf
+
+
+def codificar(audio, sample_rate, formato="wav"):
+    """Array int16 (mono o con canales) → BLOB en el formato indicado."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de audio desconocido: {formato} (válidos: {', '.join(FORMATOS)})")
+    if formato == "flac" and audio.dtype != np.int16:
+        raise ValueError(f"FLAC guarda muestras int16 y el audio es {audio.dtype}")
+    buffer = io.BytesIO()
+    if formato == "flac":
+        _soundfile().write(buffer, audio, sample_rate, format="FLAC", subtype="PCM_16")
+    else:
+        wav.write(buffer, sample_rate, audio)
+    return buffer.getvalue()
+
+
+def leer_blob(audio_blob):
+    """BLOB WAV o FLAC → (frecuencia, array con las muestras tal como se grabaron)."""
+    if formato_blob(audio_blob) == "flac":
+        audio, rate = _soundfile().read(io.BytesIO(audio_blob), dtype="int16")
+        return rate, audio
+    return wav.read(io.BytesIO(audio_blob))
+
+
+def duracion_blob(audio_blob):
+    """Duración en segundos (sólo lee la cabecera)."""
+    if formato_blob(audio_blob) == "flac":
+        info = _soundfile().info(io.BytesIO(audio_blob))
+        return info.frames / info.samplerate
+    with wave.open(io.BytesIO(audio_blob)) as w:
+        return w.getnframes() / w.getframerate()
+
+
+def recodificar(audio_blob, formato):
+    """El mismo audio en otro formato; si ya está en él, se devuelve sin tocar."""
+    if formato_blob(audio_blob) == formato:
+        return audio_blob
+    rate, audio = leer_blob(audio_blob)
+    return codificar(audio, rate, formato)
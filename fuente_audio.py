@@ -0,0 +1,156 @@
+# fuente_audio.py
+# Fuente de audio alternativa al micrófono para los grabadores (4_, 5_, 6_ y Grabacion_Audios_Final).
+# Reproduce audios WAV o BLOBs de las bases de datos con la misma interfaz que sd.InputStream,
+# en tiempo real o tan rápido como sea posible, de modo que se puedan probar sin tarjeta de sonido.
+
+import sqlite3
+import threading
+import time
+import numpy as np
+import scipy.io.wavfile as wav
+from formato_audio import leer_blob
+
+try:
+    from sounddevice import CallbackStop   # el callback la lanza para detener el stream, como con el micrófono
+except (ImportError, OSError):
+    class CallbackStop(Exception):
+        pass
+
+
+class FinDeAudio(EOFError):
+    """Se lanza al agotar el audio de la fuente (incluido el silencio final)."""
+
+
+class FuenteArchivo:
+    """
+    Concatena uno o varios audios int16 (separados por silencio) y los entrega como si fuera un micrófono.
+    Los grabadores la usan a través de 'abrir', que acepta los mismos argumentos que sd.InputStream.
+    La posición se conserva entre aperturas, así que varias grabaciones seguidas consumen el audio en orden.
+    """
+
+    def __init__(self, audios, samplerate=16000, tiempo_real=True, silencio_entre=1.5, silencio_final=11.0):
+        self.samplerate = samplerate
+        self.tiempo_real = tiempo_real    # False → entrega los frames tan rápido como se pidan
+        silencio = np.zeros(int(silencio_entre * samplerate), dtype=np.int16)
+        partes = []
+        for audio in audios:
+            partes.extend([np.asarray(audio, dtype=np.int16), silencio])
+        # Silencio final para que los grabadores cierren la última grabación antes de agotar la fuente
+        partes.append(np.zeros(int(silencio_final * samplerate), dtype=np.int16))
+        self.audio = np.concatenate(partes)
+        self.pos = 0
+        self._t0 = None
+        self._pos0 = 0
+
+    @classmethod
+    def desde_wav(cls, rutas, **kwargs):
+        """Crea la fuente a partir de uno o varios ficheros WAV."""
+        if isinstance(rutas, str):
+            rutas = [rutas]
+        audios = []
+        samplerate = kwargs.pop("samplerate", None)
+        for ruta in rutas:
+            rate, audio = wav.read(ruta)
+            audios.append(audio[:, 0] if len(audio.shape) > 1 else audio)
+            samplerate = samplerate or rate
+        return cls(audios, samplerate=samplerate or 16000, **kwargs)
+
+    @classmethod
+    def desde_db(cls, db_path, ids=None, tabla="grabaciones", **kwargs):
+        """Crea la fuente a partir de los BLOBs de audio de una base de datos (todos o los IDs indicados)."""
+        query = f"SELECT audio FROM {tabla}"
+        params = []
+        if ids:
+            query += f" WHERE id IN ({','.join('?' for _ in ids)})"
+            params = list(ids)
+        audios = []
+        samplerate = kwargs.pop("samplerate", None)
+        with sqlite3.connect(db_path) as conn:
+            for (audio_blob,) in conn.execute(query + " ORDER BY id", params):
+                rate, audio = leer_blob(audio_blob)
+                audios.append(audio[:, 0] if len(audio.shape) > 1 else audio)
+                samplerate = samplerate or rate
+        return cls(audios, samplerate=samplerate or 16000, **kwargs)
+
+    @property
+    def segundos_leidos(self):
+        return self.pos / self.samplerate
+
+    @property
+    def duracion(self):
+        return len(self.audio) / self.samplerate
+
+    def abrir(self, samplerate=None, channels=1, dtype="float32", blocksize=0, callback=None, **_):
+        """Equivalente a sd.InputStream(...) para esta fuente."""
+        if samplerate is not None and int(samplerate) != self.samplerate:
+            raise ValueError(f"La fuente está a {self.samplerate} Hz y se pidió {samplerate} Hz")
+        return _StreamArchivo(self, channels, dtype, blocksize, callback)
+
+    def _leer(self, frames):
+        """Devuelve los siguientes 'frames' de audio (int16), esperando si se reproduce en tiempo real."""
+        if self.pos >= len(self.audio):
+            raise FinDeAudio("Fin del audio de la fuente")
+        bloque = self.audio[self.pos:self.pos + frames]
+        if len(bloque) < frames:
+            bloque = np.concatenate([bloque, np.zeros(frames - len(bloque), dtype=np.int16)])
+        self.pos += frames
+
+        if self.tiempo_real:
+            if self._t0 is None:
+                self._t0, self._pos0 = time.perf_counter(), self.pos - frames
+            espera = self._t0 + (self.pos - self._pos0) / self.samplerate - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+        return bloque
+
+
+class _StreamArchivo:
+    """Vista de una FuenteArchivo con el formato (canales, dtype) y el modo (read o callback) pedidos."""
+
+    def __init__(self, fuente, channels, dtype, blocksize, callback):
+        self.fuente = fuente
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.blocksize = blocksize or int(fuente.samplerate * 30 / 1000)
+        self.callback = callback
+        self.active = False
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def _formatear(self, bloque):
+        if self.dtype == np.float32:
+            bloque = bloque.astype(np.float32) / 32768.0
+        else:
+            bloque = bloque.astype(self.dtype)
+        return np.repeat(bloque[:, None], self.channels, axis=1)
+
+    def read(self, frames):
+        """Igual que InputStream.read: devuelve (datos, overflowed)."""
+        return self._formatear(self.fuente._leer(frames)), False
+
+    def _bucle_callback(self):
+        while not self._parar.is_set():
+            try:
+                bloque = self.fuente._leer(self.blocksize)
+            except FinDeAudio:
+                break
+            try:
+                self.callback(self._formatear(bloque), self.blocksize, None, None)
+            except CallbackStop:
+                break
+        self.active = False
+
+    def __enter__(self):
+        self.fuente._t0 = None   # mientras el stream está cerrado el audio "no avanza"
+        self.active = True
+        if self.callback is not None:
+            self._hilo = threading.Thread(target=self._bucle_callback, daemon=True)
+            self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        self.active = False
+        return False
@@ -0,0 +1,134 @@
+# latencias.py
+# Latencia y factor de tiempo real (RTF = tiempo de transcripción / duración del audio) de las pruebas de
+# transcripción. Los percentiles se calculan con NumPy sobre las columnas leídas de la base de datos,
+# para todos los grupos (tipo de frase, modelo...) a la vez, sin bucles por grupo.
+
+import os
+import sqlite3
+from urllib.request import pathname2url
+import numpy as np
+from scipy import stats
+from formato_audio import duracion_blob
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def duracion_wav(audio_blob):
+    """Duración en segundos de un BLOB de audio, WAV o FLAC (sólo lee la cabecera)."""
+    return duracion_blob(audio_blob)
+
+
+def factor_tiempo_real(tiempo, duracion_audio):
+    """RTF (< 1: más rápido que el audio); None (NULL en la base de datos) si el audio no tiene muestras."""
+    return tiempo / duracion_audio if duracion_audio else None
+
+
+def texto_rtf(rtf):
+    return f"RTF {rtf:.2f}" if rtf is not None else "RTF -"
+
+
+def intervalo(valores, confianza=0.95):
+    """Media y semiancho del intervalo de confianza (t de Student) de una muestra (NaN con menos de 2 valores)."""
+    valores = np.asarray(valores, dtype=np.float64)
+    media = float(np.mean(valores))
+    if len(valores) < 2:
+        return media, float("nan")
+    error = stats.sem(valores)
+    return media, float(error * stats.t.ppf((1 + confianza) / 2, len(valores) - 1))
+
+
+def percentiles_agrupados(grupos, valores, percentiles=PERCENTILES):
+    """
+    Percentiles (interpolación lineal, como np.percentile) de 'valores' para cada grupo.
+    'grupos' son índices enteros 0..G-1. Devuelve (número de valores por grupo, matriz G × percentiles);
+    los valores NaN se descartan y los grupos sin valores quedan a NaN.
+    """
+    grupos = np.asarray(grupos, dtype=np.int64)
+    valores = np.asarray(valores, dtype=np.float64)
+    n_grupos = int(grupos.max()) + 1 if grupos.size else 0
+    validos = ~np.isnan(valores)
+    grupos, valores = grupos[validos], valores[validos]
+
+    orden = np.lexsort((valores, grupos))   # ordenados por grupo y, dentro de cada uno, por valor
+    ordenados = valores[orden]
+    cuentas = np.bincount(grupos, minlength=n_grupos)
+    if ordenados.size == 0:
+        return cuentas, np.full((n_grupos, len(percentiles)), np.nan)
+    inicios = np.concatenate(([0], np.cumsum(cuentas)[:-1]))
+
+    posicion = np.maximum(cuentas[:, None] - 1, 0) * (np.asarray(percentiles, dtype=np.float64) / 100.0)
+    bajo = np.floor(posicion).astype(np.int64)
+    alto = np.ceil(posicion).astype(np.int64)
+    fraccion = posicion - bajo
+    indice_bajo = np.minimum(inicios[:, None] + bajo, ordenados.size - 1)
+    indice_alto = np.minimum(inicios[:, None] + alto, ordenados.size - 1)
+    resultado = ordenados[indice_bajo] * (1 - fraccion) + ordenados[indice_alto] * fraccion
+    resultado[cuentas == 0] = np.nan
+    return cuentas, resultado
+
+
+def informe_latencias(db_path, grupo, tabla="transcripciones"):
+    """
+    Percentiles de latencia (tiempo_seg) y RTF de la tabla, desglosados por 'grupo' (una o varias columnas,
+    p. ej. "tipo" o "model, tipo"). Devuelve una lista de (clave, n, percentiles de latencia, percentiles de RTF).
+    """
+    with sqlite3.connect(db_path) as conn:
+        filas = conn.execute(f"""
+            SELECT {grupo}, tiempo_seg, rtf FROM {tabla}
+            WHERE tiempo_seg IS NOT NULL ORDER BY {grupo}
+        """).fetchall()
+    if not filas:
+        return []
+
+    num_columnas = len(filas[0]) - 2
+    claves = {}
+    indices = np.fromiter((claves.setdefault(fila[:num_columnas], len(claves)) for fila in filas),
+                          dtype=np.int64, count=len(filas))
+    tiempos = np.array([fila[-2] for fila in filas], dtype=np.float64)
+    rtf = np.array([np.nan if fila[-1] is None else fila[-1] for fila in filas], dtype=np.float64)
+
+    n, p_latencia = percentiles_agrupados(indices, tiempos)
+    _, p_rtf = percentiles_agrupados(indices, rtf)
+    return [(clave if num_columnas > 1 else clave[0], int(n[i]), p_latencia[i], p_rtf[i])
+            for clave, i in claves.items()]
+
+
+def imprimir_informe(db_path, grupo, titulo=None):
+    """Muestra la tabla de percentiles de latencia y RTF por 'grupo'."""
+    informe = informe_latencias(db_path, grupo)
+    if not informe:
+        return
+    cabecera = " ".join(f"p{p:<5}" for p in PERCENTILES)
+    print(f"\n===== {titulo or 'LATENCIA Y RTF POR ' + grupo.upper()} =====")
+    print(f"{grupo:<18} {'n':>5} | latencia (s): {cabecera} | RTF: {cabecera}")
+    for clave, n, p_latencia, p_rtf in informe:
+        etiqueta = " / ".join(str(c) for c in clave) if isinstance(clave, tuple) else str(clave)
+        latencia = " ".join(f"{v:<6.2f}" for v in p_latencia)
+        rtf = " ".join(f"{v:<6.2f}" for v in p_rtf)
+        print(f"{etiqueta:<18} {n:>5} | {'':14}{latencia} | {'':5}{rtf}")
+
+
+def completar_duraciones(db_path, db_grabaciones, tabla="transcripciones"):
+    """
+    Rellena duracion_audio y rtf de las filas guardadas antes de que existieran esas columnas, leyendo la
+    cabecera de la grabación con el mismo nombre de fichero. Devuelve el número de filas completadas.
+    La base de datos de grabaciones se abre sólo para lectura; si no existe, no se completa nada.
+    """
+    if not os.path.exists(db_grabaciones):
+        print(f"⚠️ No existe '{db_grabaciones}': no se completan la duración del audio ni el RTF.")
+        return 0
+    with sqlite3.connect(db_path, uri=True) as conn:   # uri=True: permite adjuntar con mode=ro
+        conn.create_function("duracion_wav", 1, duracion_wav, deterministic=True)
+        uri = f"file:{pathname2url(os.path.abspath(db_grabaciones))}?mode=ro"
+        conn.execute("ATTACH DATABASE ? AS entrada", (uri,))
+        contar = f"SELECT COUNT(*) FROM {tabla} WHERE duracion_audio IS NOT NULL"
+        antes = conn.execute(contar).fetchone()[0]
+        conn.execute(f"""
+            UPDATE {tabla} SET duracion_audio = (
+                SELECT duracion_wav(g.audio) FROM entrada.grabaciones g WHERE g.filename = {tabla}.filename LIMIT 1
+            )
+            WHERE duracion_audio IS NULL
+        """)
+        conn.execute(f"UPDATE {tabla} SET rtf = tiempo_seg / duracion_audio WHERE rtf IS NULL AND duracion_audio > 0")
+        conn.commit()
+        return conn.execute(contar).fetchone()[0] - antes
@@ -0,0 +1,78 @@
+# manifiesto.py
+# Manifiesto de ejecución para los programas de evaluación (12 y 13): registra qué audios se han transcrito
+# ya con cada modelo y opciones de decodificación, identificando cada audio por el hash de su contenido.
+# Una ejecución interrumpida (corte de luz en la Raspberry Pi, caída del servidor...) continúa donde se
+# quedó, sin repetir audios ni duplicar filas en la tabla de transcripciones.
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+
+
+def hash_audio(audio_blob):
+    """Huella del contenido del audio (no depende del nombre del fichero)."""
+    return hashlib.sha1(audio_blob).hexdigest()
+
+
+class Manifiesto:
+    """
+    Tabla 'manifiesto' en la base de datos de resultados, con clave (hash del audio, modelo, opciones).
+    Cada entrada apunta a la fila de 'transcripciones' con su resultado y se escribe en la misma
+    transacción que esa fila, así que tras un corte se conservan las dos o ninguna.
+    """
+
+    def __init__(self, db_path, modelo, opciones=None, tabla="transcripciones"):
+        self.db_path = db_path
+        self.modelo = modelo
+        self.opciones = json.dumps(opciones or {}, sort_keys=True)
+        self.tabla = tabla
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS manifiesto (
+                    audio_hash TEXT,
+                    modelo TEXT,
+                    opciones TEXT,
+                    transcripcion_id INTEGER,
+                    fecha TEXT,
+                    PRIMARY KEY (audio_hash, modelo, opciones)
+                )
+            """)
+            conn.commit()
+            self.completados = dict(conn.execute(
+                "SELECT audio_hash, transcripcion_id FROM manifiesto WHERE modelo = ? AND opciones = ?",
+                (self.modelo, self.opciones)))
+
+    def completado(self, audio_hash):
+        return audio_hash in self.completados
+
+    def registrar(self, conn, audio_hash, transcripcion_id):
+        """Marca el audio como completado; llamar antes del commit que guarda su resultado."""
+        conn.execute("""
+            INSERT OR REPLACE INTO manifiesto (audio_hash, modelo, opciones, transcripcion_id, fecha)
+            VALUES (?, ?, ?, ?, ?)
+        """, (audio_hash, self.modelo, self.opciones, transcripcion_id, datetime.now().isoformat(timespec="seconds")))
+        self.completados[audio_hash] = transcripcion_id
+
+    def al_guardar(self, audio_hash):
+        """Para EscritorResultados.agregar: registra el audio en la transacción que escribe su fila."""
+        return lambda conn, transcripcion_id: self.registrar(conn, audio_hash, transcripcion_id)
+
+    def resultados_previos(self, columnas):
+        """Columnas indicadas de las transcripciones ya completadas con este modelo y opciones."""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(f"""
+                SELECT {columnas} FROM manifiesto m JOIN {self.tabla} t ON t.id = m.transcripcion_id
+                WHERE m.modelo = ? AND m.opciones = ? ORDER BY t.id
+            """, (self.modelo, self.opciones)).fetchall()
+
+
+def filtro_resultados(manifiestos):
+    """
+    Origen, condición y parámetros para consultar (consultas.estadisticas) sólo las transcripciones
+    registradas en estos manifiestos: las de la ejecución actual y las anteriores con el mismo modelo y opciones.
+    """
+    tabla = manifiestos[0].tabla
+    condicion = " OR ".join("(m.modelo = ? AND m.opciones = ?)" for _ in manifiestos)
+    parametros = [valor for man in manifiestos for valor in (man.modelo, man.opciones)]
+    return f"{tabla} t JOIN manifiesto m ON m.transcripcion_id = t.id", f"({condicion})", parametros
@@ -0,0 +1,377 @@
+# metricas.py
+# Cálculo de WER/CER con un alineamiento de Levenshtein exacto (distancia de edición mínima), en lugar
+# de difflib.SequenceMatcher, que busca bloques comunes y puede inflar los recuentos de S/D/I.
+# Incluye también la normalización de texto de la prueba final, compilada una sola vez.
+
+import ast
+import re
+import unicodedata
+from functools import lru_cache
+
+INF = 1 << 30
+
+
+def _a_enteros(ref, hyp):
+    """Traduce los tokens (palabras o caracteres) a enteros para que las comparaciones sean baratas."""
+    ids = {}
+    ref_ids = [ids.setdefault(t, len(ids)) for t in ref]
+    hyp_ids = [ids.setdefault(t, len(ids)) for t in hyp]
+    return ref_ids, hyp_ids
+
+
+def _matriz_banda(r, h, k):
+    """
+    Programación dinámica de Levenshtein limitada a las diagonales |j - i| <= k (banda de Ukkonen).
+    Sólo se guarda la banda: la celda (i, j) está en filas[i][j - i + k] y cada fila tiene 2k + 2 enteros
+    (el último, siempre INF, hace de borde). Las celdas fuera de la banda valen INF.
+    """
+    n, m = len(r), len(h)
+    ancho = 2 * k + 1
+    filas = [[INF] * (ancho + 1) for _ in range(n + 1)]
+    fila = filas[0]
+    for j in range(min(m, k) + 1):
+        fila[j + k] = j
+    for i in range(1, n + 1):
+        previa, fila = fila, filas[i]
+        ri = r[i - 1]
+        j_ini = max(1, i - k)
+        j_fin = min(m, i + k)
+        desplazamiento = k - i   # j → posición en la fila
+        if i <= k:
+            fila[desplazamiento] = i
+        izquierda = fila[j_ini - 1 + desplazamiento]
+        for j in range(j_ini, j_fin + 1):
+            d = j + desplazamiento
+            mejor = previa[d] + (ri != h[j - 1])   # acierto / sustitución: (i - 1, j - 1)
+            borrado = previa[d + 1] + 1             # (i - 1, j)
+            if borrado < mejor:
+                mejor = borrado
+            insercion = izquierda + 1               # (i, j - 1)
+            if insercion < mejor:
+                mejor = insercion
+            fila[d] = izquierda = mejor
+    return filas
+
+
+def _matriz_completa(r, h):
+    """Programación dinámica de Levenshtein sobre la matriz (n + 1) × (m + 1) completa."""
+    n, m = len(r), len(h)
+    fila = list(range(m + 1))
+    filas = [fila]
+    for i in range(1, n + 1):
+        previa, fila = fila, [i] + [0] * m
+        ri = r[i - 1]
+        izquierda = i
+        for j in range(1, m + 1):
+            mejor = previa[j - 1] + (ri != h[j - 1])
+            borrado = previa[j] + 1
+            if borrado < mejor:
+                mejor = borrado
+            insercion = izquierda + 1
+            if insercion < mejor:
+                mejor = insercion
+            fila[j] = izquierda = mejor
+        filas.append(fila)
+    return filas
+
+
+def alinear(ref, hyp, banda=False):
+    """
+    Alineamiento de distancia de edición mínima entre dos secuencias de tokens.
+    Por defecto se rellena la matriz completa, lo más rápido en frases cortas (tras quitar el prefijo y el
+    sufijo comunes quedan pocos tokens). Con banda=True se calcula sólo una franja alrededor de la diagonal
+    que se duplica hasta que el resultado cabe en ella (sigue siendo exacto): compensa en textos largos con
+    pocos errores (programa 17).
+    Devuelve {"S", "D", "I", "M", "N", "alineamiento"}, con el alineamiento como lista de
+    (operación, token_ref, token_hyp) y operación en "M" (acierto), "S", "D" o "I".
+    """
+    # Prefijo y sufijo comunes: aciertos seguros que no hace falta pasar por la matriz
+    inicio = 0
+    limite = min(len(ref), len(hyp))
+    while inicio < limite and ref[inicio] == hyp[inicio]:
+        inicio += 1
+    fin = 0
+    while fin < limite - inicio and ref[-1 - fin] == hyp[-1 - fin]:
+        fin += 1
+    prefijo = [("M", t, t) for t in ref[:inicio]]
+    sufijo = [("M", t, t) for t in ref[len(ref) - fin:]]
+    ref, hyp = ref[inicio:len(ref) - fin], hyp[inicio:len(hyp) - fin]
+
+    r, h = _a_enteros(ref, hyp)
+    n, m = len(r), len(h)
+
+    if banda and n and m:
+        k = max(1, abs(n - m))
+        while True:
+            filas = _matriz_banda(r, h, k)
+            if filas[n][m - n + k] <= k or k >= max(n, m):
+                break
+            k *= 2
+
+        def celda(i, j):
+            d = j - i + k
+            return filas[i][d] if 0 <= d <= 2 * k else INF
+    else:
+        filas = _matriz_completa(r, h)
+
+        def celda(i, j):
+            return filas[i][j]
+
+    # Recorrido inverso: prioridad a acierto/sustitución, después borrado e inserción
+    S = D = I = M = 0
+    alineamiento = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        actual = celda(i, j)
+        if i > 0 and j > 0 and celda(i - 1, j - 1) + (r[i - 1] != h[j - 1]) == actual:
+            if r[i - 1] == h[j - 1]:
+                M += 1
+                alineamiento.append(("M", ref[i - 1], hyp[j - 1]))
+            else:
+                S += 1
+                alineamiento.append(("S", ref[i - 1], hyp[j - 1]))
+            i -= 1
+            j -= 1
+        elif i > 0 and celda(i - 1, j) + 1 == actual:
+            D += 1
+            alineamiento.append(("D", ref[i - 1], None))
+            i -= 1
+        else:
+            I += 1
+            alineamiento.append(("I", None, hyp[j - 1]))
+            j -= 1
+    alineamiento.reverse()
+    M += inicio + fin
+    return {"S": S, "D": D, "I": I, "M": M, "N": n + inicio + fin,
+            "alineamiento": prefijo + alineamiento + sufijo}
+
+
+def detalles_error(ref_tokens, hyp_tokens):
+    """Recuentos S/D/I/M/N y tasa de error (S + D + I) / N entre dos secuencias de tokens."""
+    info = alinear(ref_tokens, hyp_tokens)
+    N = info["N"]
+    tasa = (info["S"] + info["D"] + info["I"]) / N if N > 0 else 0.0
+    return tasa, {k: info[k] for k in ("S", "D", "I", "M", "N")}
+
+
+# === EVALUACIÓN EN BLOQUE ===
+class Evaluador:
+    """
+    Calcula WER y CER frente a un conjunto de referencias, normalizando y tokenizando cada referencia una
+    sola vez. 'normalizar' es la normalización para WER del programa (normalize_for_wer); para el CER se
+    usa el mismo texto sin espacios.
+    """
+
+    def __init__(self, normalizar):
+        self.normalizar = normalizar
+        self._referencias = {}
+
+    def _tokens(self, texto):
+        normalizado = self.normalizar(texto or "")
+        return normalizado.split(), normalizado.replace(" ", "")
+
+    def referencia(self, texto):
+        """Palabras y caracteres de una referencia (se calculan la primera vez y se guardan)."""
+        tokens = self._referencias.get(texto)
+        if tokens is None:
+            tokens = self._referencias[texto] = self._tokens(texto)
+        return tokens
+
+    def evaluar(self, referencia, hipotesis):
+        """Devuelve (wer_info, cer_info): {"wer"/"cer", "S", "D", "I", "M", "N"} de una transcripción."""
+        ref_palabras, ref_caracteres = self.referencia(referencia)
+        hyp_palabras, hyp_caracteres = self._tokens(hipotesis)
+        wer, wer_info = detalles_error(ref_palabras, hyp_palabras)
+        cer, cer_info = detalles_error(ref_caracteres, hyp_caracteres)
+        return {"wer": wer, **wer_info}, {"cer": cer, **cer_info}
+
+    def evaluar_lote(self, referencias, hipotesis):
+        """
+        Evalúa una lista de transcripciones de una vez. 'referencias' es una lista del mismo tamaño o una
+        única referencia común. Devuelve (lista de (wer_info, cer_info), resumen), donde el resumen incluye
+        la media y desviación por audio y el WER/CER global (errores totales / tokens de referencia totales).
+        """
+        if isinstance(referencias, str):
+            referencias = [referencias] * len(hipotesis)
+        resultados = [self.evaluar(ref, hyp) for ref, hyp in zip(referencias, hipotesis)]
+        return resultados, resumir(resultados)
+
+
+def resumir(resultados):
+    """Resumen agregado de una lista de (wer_info, cer_info)."""
+    resumen = {"n": len(resultados)}
+    for indice, clave in enumerate(("wer", "cer")):
+        infos = [r[indice] for r in resultados]
+        tasas = [info[clave] for info in infos]
+        media = sum(tasas) / len(tasas) if tasas else 0.0
+        errores = sum(info["S"] + info["D"] + info["I"] for info in infos)
+        tokens = sum(info["N"] for info in infos)
+        resumen[f"{clave}_medio"] = media
+        resumen[f"{clave}_std"] = (sum((t - media) ** 2 for t in tasas) / len(tasas)) ** 0.5 if tasas else 0.0
+        resumen[f"{clave}_global"] = errores / tokens if tokens else 0.0
+    return resumen
+
+
+# === RECUENTOS EN LA BASE DE DATOS ===
+# Cada transcripción guarda sus recuentos como columnas enteras (wer_s, wer_d, wer_i, wer_m, wer_n y las
+# mismas para el CER), así el WER global de cualquier conjunto de filas es una sola consulta SQL.
+RECUENTOS = ("S", "D", "I", "M", "N")
+COLUMNAS_RECUENTOS = [f"{metrica}_{k.lower()}" for metrica in ("wer", "cer") for k in RECUENTOS]
+
+
+def recuentos(wer_info, cer_info):
+    """Valores de COLUMNAS_RECUENTOS de una transcripción, en el mismo orden."""
+    return tuple(int(info[k]) for info in (wer_info, cer_info) for k in RECUENTOS)
+
+
+def leer_detalles(texto):
+    """Recuentos S/D/I/M/N de un detalle guardado como str(dict) (filas antiguas), o None si falta o no se puede leer."""
+    try:
+        info = ast.literal_eval(texto)
+        return [int(info[k]) for k in RECUENTOS]
+    except (ValueError, SyntaxError, TypeError, KeyError):
+        return None
+
+
+def tasa_global_sql(metrica):
+    """Expresión SQL del WER o CER global: errores totales / tokens de referencia totales."""
+    return f"SUM({metrica}_s + {metrica}_d + {metrica}_i) * 1.0 / SUM({metrica}_n)"
+
+
+# === NORMALIZACIÓN DE TEXTO ===
+_PALABRA_O_ESPACIO = re.compile(r"[\w\s]")
+_TOKENS = re.compile(r"\d+|\w+")
+
+
+def quitar_tildes(text):
+    """Elimina tildes y diacríticos."""
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+class _TablaCaracteres(dict):
+    """
+    Tabla de str.translate que se completa la primera vez que aparece cada carácter: quita tildes y
+    diacríticos y convierte en espacio todo lo que no es letra, dígito o espacio (guiones y puntuación).
+    """
+
+    def __missing__(self, codigo):
+        salida = "".join(c if _PALABRA_O_ESPACIO.match(c) else " " for c in quitar_tildes(chr(codigo)))
+        self[codigo] = salida
+        return salida
+
+
+# Multiplicadores de los numerales compuestos y formas que sólo cuentan como número dentro de uno
+MULTIPLICADORES = {"mil": 1000, "millon": 10 ** 6, "millones": 10 ** 6}
+UNO_APOCOPADO = {"un": 1}     # "treinta y un años", "un millón"; "un" suelto se deja como palabra
+
+
+class NormalizadorTexto:
+    """
+    Normalización para WER de la prueba final (programas 12 y 13): minúsculas, sin tildes, guiones y
+    puntuación como espacios, números escritos con palabras convertidos a cifras y espacios colapsados.
+    Hace una sola pasada por carácter (str.translate) y recuerda los tokens y los textos ya normalizados.
+
+    Con compuestos=True los numerales de varias palabras se leen enteros ("doscientos treinta y siete"
+    → 237, "dos mil veinticinco" → 2025) buscando en un solo recorrido de los tokens el numeral más
+    largo que empieza en cada uno. Con compuestos=False se convierte palabra a palabra, como antes.
+    """
+
+    def __init__(self, numeros, tam_cache=4096, compuestos=True):
+        self.numeros = numeros
+        self.compuestos = compuestos
+        # Palabras numéricas sueltas (sin tildes); las entradas de varias palabras, como "treinta y uno",
+        # las cubre la lectura de numerales compuestos
+        self._atomos = {quitar_tildes(k): v for k, v in numeros.items() if " " not in k}
+        self._tabla = _TablaCaracteres()
+        self._tokens = {}
+        self._normalizar = lru_cache(maxsize=tam_cache)(self._normalizar_texto)
+
+    def __call__(self, text):
+        if text is None:
+            return ""
+        return self._normalizar(text)
+
+    def vaciar_cache(self):
+        """Olvida los caracteres, tokens y textos ya normalizados."""
+        self._tabla.clear()
+        self._tokens.clear()
+        self._normalizar.cache_clear()
+
+    def _token(self, token):
+        """Token en minúsculas y sin tildes; se calcula una vez por token distinto."""
+        limpio = self._tokens.get(token)
+        if limpio is None:
+            limpio = self._tokens[token] = quitar_tildes(token.lower())
+        return limpio
+
+    def _valor(self, token):
+        return self._atomos.get(token, UNO_APOCOPADO.get(token))
+
+    def _leer_numeral(self, tokens, i):
+        """
+        Numeral más largo que empieza en tokens[i]. Devuelve (valor, posición siguiente) o None.
+        Cada grupo de tres cifras es [centena] [decena [y unidad] | unidad | 10-29], seguido
+        opcionalmente de "mil" o "millones"; "mil" puede ir solo y los multiplicadores deben decrecer.
+        """
+        total = 0
+        grupo = None            # valor del grupo de tres cifras en curso
+        estado = "vacio"        # vacio → centena → decena → cerrado (sólo admite multiplicador)
+        nivel = float("inf")    # último multiplicador usado
+        j = fin = i
+        while j < len(tokens):
+            token = tokens[j]
+            multiplicador = MULTIPLICADORES.get(token)
+            if multiplicador is not None:
+                if multiplicador >= nivel or (grupo is None and multiplicador != 1000):
+                    break
+                total += (1 if grupo is None else grupo) * multiplicador
+                grupo, estado, nivel = None, "vacio", multiplicador
+                j = fin = j + 1
+                continue
+
+            if estado == "decena" and token == "y" and j + 1 < len(tokens):
+                unidad = self._valor(tokens[j + 1])
+                if unidad is not None and 1 <= unidad <= 9:
+                    grupo += unidad
+                    estado = "cerrado"
+                    j = fin = j + 2
+                    continue
+                break
+
+            valor = self._valor(token)
+            if valor is None or estado == "cerrado":
+                break
+            if estado == "vacio" and valor >= 100 and valor % 100 == 0:
+                grupo = valor
+                estado = "cerrado" if token == "cien" else "centena"
+            elif (estado in ("vacio", "centena") and 0 < valor < 100) or (estado == "vacio" and valor == 0):
+                grupo = (grupo or 0) + valor
+                estado = "decena" if valor >= 30 and valor % 10 == 0 else "cerrado"
+            else:
+                break
+            j = fin = j + 1
+
+        if fin == i or (fin == i + 1 and tokens[i] in UNO_APOCOPADO):
+            return None
+        return total + (grupo or 0), fin
+
+    def _normalizar_texto(self, text):
+        tokens = list(map(self._token, _TOKENS.findall(text.lower().translate(self._tabla))))
+        if not self.compuestos:
+            atomos = self._atomos
+            return " ".join(str(atomos[t]) if t in atomos else t for t in tokens)
+
+        salida = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            numeral = None
+            if token in self._atomos or token in MULTIPLICADORES or token in UNO_APOCOPADO:
+                numeral = self._leer_numeral(tokens, i)
+            if numeral is None:
+                salida.append(token)
+                i += 1
+            else:
+                salida.append(str(numeral[0]))
+                i = numeral[1]
+        return " ".join(salida)
@@ -0,0 +1,168 @@
+# palabra_clave.py
+# Detector ligero de palabra clave (MFCC + DTW con plantillas grabadas por nosotros) para que Whisper
+# sólo se ejecute después de la frase de activación. Pensado para funcionar de forma continua en la
+# Raspberry Pi: los MFCC se calculan de forma incremental y la DTW sólo se evalúa cuando hay energía.
+
+import time
+from functools import lru_cache
+import numpy as np
+
+SAMPLE_RATE = 16000
+VENTANA = 400          # 25 ms por frame de análisis
+SALTO = 160            # 10 ms entre frames de análisis
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+PREENFASIS = 0.97
+
+
+# === MFCC ===
+@lru_cache(maxsize=None)
+def _matrices(sample_rate=SAMPLE_RATE):
+    """Ventana de Hamming, banco de filtros mel y matriz DCT-II (se calculan una sola vez)."""
+    def hz_a_mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+
+    def mel_a_hz(m):
+        return 700.0 * (10 ** (m / 2595.0) - 1.0)
+
+    puntos = mel_a_hz(np.linspace(hz_a_mel(0), hz_a_mel(sample_rate / 2), N_MELS + 2))
+    bins = np.floor((N_FFT + 1) * puntos / sample_rate).astype(int)
+    banco = np.zeros((N_MELS, N_FFT // 2 + 1), dtype=np.float32)
+    for m in range(1, N_MELS + 1):
+        izq, centro, der = bins[m - 1], bins[m], bins[m + 1]
+        if centro > izq:
+            banco[m - 1, izq:centro] = (np.arange(izq, centro) - izq) / (centro - izq)
+        if der > centro:
+            banco[m - 1, centro:der] = (der - np.arange(centro, der)) / (der - centro)
+
+    n = np.arange(N_MELS)
+    dct = np.cos(np.pi / N_MELS * (n[None, :] + 0.5) * np.arange(N_MFCC)[:, None]) * np.sqrt(2.0 / N_MELS)
+    dct[0] /= np.sqrt(2.0)
+    return np.hamming(VENTANA).astype(np.float32), banco, dct.astype(np.float32)
+
+
+def mfcc(audio, sample_rate=SAMPLE_RATE):
+    """MFCC (frames x N_MFCC) de un audio int16, todos los frames de una vez."""
+    x = audio.astype(np.float32) / 32768.0
+    if len(x) < VENTANA:
+        return np.zeros((0, N_MFCC), dtype=np.float32)
+    x = np.append(x[0], x[1:] - PREENFASIS * x[:-1])
+    num_frames = 1 + (len(x) - VENTANA) // SALTO
+    indices = np.arange(VENTANA)[None, :] + SALTO * np.arange(num_frames)[:, None]
+    hamming, banco, dct = _matrices(sample_rate)
+    espectro = np.abs(np.fft.rfft(x[indices] * hamming, N_FFT)) ** 2 / N_FFT
+    log_mel = np.log(espectro @ banco.T + 1e-10)
+    return (log_mel @ dct.T).astype(np.float32)
+
+
+def normalizar_cmn(caracteristicas):
+    """Resta la media de cada coeficiente (CMN) para independizar del micrófono y del nivel."""
+    return caracteristicas - caracteristicas.mean(axis=0, keepdims=True)
+
+
+def recortar_voz(audio, margen=0.1, factor_ruido=3.0):
+    """Recorta el silencio inicial y final de una grabación usando la energía de cada frame de 10 ms."""
+    num = len(audio) // SALTO
+    if num == 0:
+        return audio
+    rms = np.sqrt(np.mean(audio[:num * SALTO].reshape(num, SALTO).astype(np.float32) ** 2, axis=1))
+    voz = np.flatnonzero(rms > max(np.percentile(rms, 10), 1.0) * factor_ruido)
+    if len(voz) == 0:
+        return audio
+    m = int(margen * SAMPLE_RATE / SALTO)
+    inicio = max(0, voz[0] - m) * SALTO
+    fin = min(num, voz[-1] + 1 + m) * SALTO
+    return audio[inicio:fin]
+
+
+# === DTW ===
+def distancia_dtw(ventana, plantilla):
+    """
+    DTW entre la ventana (n x d) y una plantilla (m x d), normalizada por la longitud del camino.
+    Cada paso avanza un frame de la ventana y 0, 1 o 2 de la plantilla (pendiente entre 0 y 2), de modo
+    que cada fila de la matriz se calcula de una vez con NumPy.
+    """
+    coste = np.sqrt(np.maximum(
+        np.sum(ventana ** 2, axis=1)[:, None] + np.sum(plantilla ** 2, axis=1)[None, :]
+        - 2.0 * ventana @ plantilla.T, 0.0))
+    acumulado = np.full(plantilla.shape[0], np.inf, dtype=np.float32)
+    acumulado[0] = coste[0, 0]
+    for i in range(1, coste.shape[0]):
+        previo = acumulado.copy()
+        previo[1:] = np.minimum(previo[1:], acumulado[:-1])
+        previo[2:] = np.minimum(previo[2:], acumulado[:-2])
+        acumulado = coste[i] + previo
+    return float(acumulado[-1]) / coste.shape[0]
+
+
+# === DETECTOR ===
+class DetectorPalabraClave:
+    """
+    Compara de forma continua las últimas características del audio con las plantillas de la palabra clave.
+    'procesar' recibe los frames tal como llegan del micrófono y devuelve True cuando la frase se detecta.
+    """
+
+    def __init__(self, plantillas, umbral, paso_evaluacion=10, energia_minima=500, sample_rate=SAMPLE_RATE):
+        self.plantillas = [normalizar_cmn(np.asarray(p, dtype=np.float32)) for p in plantillas]
+        self.umbral = umbral
+        self.paso_evaluacion = paso_evaluacion      # frames de 10 ms entre evaluaciones (100 ms)
+        self.energia_minima = energia_minima        # RMS mínimo en la ventana para evaluar la DTW
+        self.sample_rate = sample_rate
+        self.longitud = max(len(p) for p in self.plantillas)
+        self.tiempo_cpu = 0.0                       # CPU consumida por el detector (s)
+        self.muestras_procesadas = 0
+        self.evaluaciones = 0
+        self.ultima_distancia = np.inf
+        self.reiniciar()
+
+    @classmethod
+    def desde_fichero(cls, ruta, **kwargs):
+        """Carga las plantillas y el umbral guardados por el programa 16."""
+        datos = np.load(ruta)
+        plantillas = [datos[k] for k in sorted(datos.files) if k.startswith("plantilla_")]
+        return cls(plantillas, float(datos["umbral"]), **kwargs)
+
+    @property
+    def uso_cpu(self):
+        """Fracción de un núcleo usada por el detector respecto al audio procesado."""
+        segundos = self.muestras_procesadas / self.sample_rate
+        return self.tiempo_cpu / segundos if segundos else 0.0
+
+    def reiniciar(self):
+        self._resto = np.zeros(0, dtype=np.int16)
+        self._caracteristicas = np.zeros((0, N_MFCC), dtype=np.float32)
+        self._rms = np.zeros(0, dtype=np.float32)
+        self._pendientes = 0
+
+    def distancia(self, caracteristicas):
+        """Menor distancia DTW entre unas características y las plantillas."""
+        return min(distancia_dtw(normalizar_cmn(caracteristicas[-len(p):]), p) for p in self.plantillas)
+
+    def procesar(self, frame):
+        """Añade un frame int16 y devuelve True si se ha detectado la palabra clave."""
+        t0 = time.thread_time()
+        self.muestras_procesadas += len(frame)
+        audio = np.concatenate([self._resto, frame])
+        nuevos = (len(audio) - VENTANA) // SALTO + 1 if len(audio) >= VENTANA else 0
+        detectado = False
+        if nuevos > 0:
+            usado = audio[:(nuevos - 1) * SALTO + VENTANA]
+            tramas = usado[:nuevos * SALTO].reshape(nuevos, SALTO).astype(np.float32)
+            self._caracteristicas = np.concatenate([self._caracteristicas, mfcc(usado, self.sample_rate)])[-self.longitud:]
+            self._rms = np.concatenate([self._rms, np.sqrt(np.mean(tramas ** 2, axis=1))])[-self.longitud:]
+            self._resto = audio[nuevos * SALTO:]
+            self._pendientes += nuevos
+
+            if self._pendientes >= self.paso_evaluacion and len(self._caracteristicas) == self.longitud:
+                self._pendientes = 0
+                if np.max(self._rms) > self.energia_minima:   # sin energía no hay palabra clave
+                    self.evaluaciones += 1
+                    self.ultima_distancia = self.distancia(self._caracteristicas)
+                    if self.ultima_distancia < self.umbral:
+                        detectado = True
+                        self.reiniciar()
+        else:
+            self._resto = audio
+        self.tiempo_cpu += time.thread_time() - t0
+        return detectado
@@ -0,0 +1,126 @@
+# persistencia_audio.py
+# Guardado de las grabaciones en un hilo aparte. Los grabadores (programas 5 y 6) entregan el array int16 y sus
+# metadatos a una cola y vuelven a escuchar enseguida; el hilo codifica cada audio (WAV o FLAC) y los inserta
+# con una sola conexión en modo WAL, en una transacción por cada lote de grabaciones que se haya acumulado
+# mientras se escribía el anterior. Informa de la profundidad de la cola y de la latencia de guardado.
+
+import queue
+import sqlite3
+import threading
+import time
+import numpy as np
+from formato_audio import codificar
+
+MAX_FILAS = 20   # Grabaciones por transacción como máximo
+_FIN = object()  # Marca de cierre en la cola
+
+
+class PersistenciaAudio:
+    """
+    Cola de grabaciones pendientes de guardar en 'tabla' ('columnas' son los metadatos; el BLOB va en la
+    columna 'audio'). guardar() no espera a SQLite; cerrar() (o salir del bloque with) espera a que se haya
+    escrito todo lo encolado. Si el hilo falla, el error se lanza en la siguiente llamada del hilo principal.
+    """
+
+    def __init__(self, db_path, tabla, columnas, formato="wav", max_filas=MAX_FILAS):
+        self.db_path = db_path
+        self.columnas = list(columnas)
+        self._sql = (f"INSERT INTO {tabla} (audio, {', '.join(self.columnas)}) "
+                     f"VALUES (?{', ?' * len(self.columnas)})")
+        self.formato = formato
+        self.max_filas = max_filas
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._error = None
+        self.max_pendientes = 0
+        self.guardadas = 0
+        self.transacciones = 0
+        self.tiempo_escritura = 0.0
+        self.latencias = []   # Segundos desde guardar() hasta el commit, por grabación
+        self._hilo = threading.Thread(target=self._trabajar, name="persistencia_audio", daemon=True)
+        self._hilo.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()   # también si se interrumpe: lo ya grabado se guarda
+
+    @property
+    def pendientes(self):
+        """Grabaciones entregadas que aún no están confirmadas en la base de datos."""
+        return self._pendientes
+
+    def guardar(self, audio, sample_rate, **valores):
+        """Encola una grabación (array int16) con los valores de sus columnas y vuelve sin esperar."""
+        self._comprobar()
+        desconocidas = set(valores) - set(self.columnas)
+        if desconocidas:
+            raise ValueError(f"Columnas desconocidas: {', '.join(sorted(desconocidas))}")
+        fila = tuple(valores.get(c) for c in self.columnas)
+        with self._lock:
+            self._pendientes += 1
+            self.max_pendientes = max(self.max_pendientes, self._pendientes)
+        self._cola.put((time.perf_counter(), np.ascontiguousarray(audio), sample_rate, fila))
+
+    def _comprobar(self):
+        if self._error is not None:
+            raise RuntimeError(f"El guardado en segundo plano en '{self.db_path}' ha fallado") from self._error
+
+    # === HILO DE ESCRITURA ===
+    def _trabajar(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")   # en WAL sólo sincroniza en los checkpoints
+        try:
+            fin = False
+            while not fin:
+                # Espera la primera grabación y se lleva también las que ya estén en la cola
+                lote = [self._cola.get()]
+                while lote[-1] is not _FIN and len(lote) < self.max_filas:
+                    try:
+                        lote.append(self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                if lote[-1] is _FIN:
+                    fin = True
+                    lote.pop()
+                if lote:
+                    self._escribir(conn, lote)
+        except Exception as e:
+            self._error = e
+        finally:
+            conn.close()
+
+    def _escribir(self, conn, lote):
+        t0 = time.perf_counter()
+        filas = [(codificar(audio, rate, self.formato), *fila) for _, audio, rate, fila in lote]
+        with conn:   # commit al salir, rollback si falla
+            conn.executemany(self._sql, filas)
+        t_fin = time.perf_counter()
+        self.tiempo_escritura += t_fin - t0
+        self.latencias.extend(t_fin - t_entrega for t_entrega, *_ in lote)
+        self.transacciones += 1
+        with self._lock:
+            self._pendientes -= len(lote)
+            self.guardadas += len(lote)
+
+    # === CIERRE ===
+    def cerrar(self):
+        """Espera a que se guarde todo lo encolado y muestra el resumen."""
+        if self._hilo.is_alive():
+            if self._pendientes:
+                print(f"⏳ Guardando {self._pendientes} grabaciones pendientes...")
+            self._cola.put(_FIN)
+            self._hilo.join()
+        self.imprimir_resumen()
+        self._comprobar()
+
+    def imprimir_resumen(self):
+        if not self.guardadas:
+            return
+        p50, p95 = np.percentile(self.latencias, [50, 95]) * 1000
+        print(f"💾 {self.guardadas} grabaciones en {self.transacciones} transacciones | "
+              f"{self.tiempo_escritura:.3f} s escribiendo | cola máx. {self.max_pendientes} | "
+              f"latencia de guardado p50 {p50:.0f} ms, p95 {p95:.0f} ms, máx. {max(self.latencias) * 1000:.0f} ms")
@@ -0,0 +1,135 @@
+# procesado_audio.py
+# Preprocesado opcional del audio antes de Whisper, implementado sólo con NumPy/SciPy para que sea
+# barato en la Raspberry Pi. Trabaja con audio int16 a 16 kHz, como el que guardan los grabadores.
+
+import io
+import numpy as np
+import scipy.io.wavfile as wav
+from scipy.ndimage import uniform_filter, minimum_filter1d
+from formato_audio import leer_blob
+
+SAMPLE_RATE = 16000
+
+# Reducción de ruido por puerta espectral
+N_FFT = 512                 # 32 ms por frame de la STFT
+SALTO_STFT = N_FFT // 4     # 75 % de solapamiento
+PROPORCION_RUIDO = 0.2      # Fracción de frames más silenciosos usados para estimar el ruido
+N_STD_UMBRAL = 1.5          # Umbral = media del ruido + N_STD_UMBRAL desviaciones (en dB, por frecuencia)
+REDUCCION_DB = 12.0         # Atenuación máxima aplicada a lo que se considera ruido
+SUAVIZADO = (5, 5)          # Suavizado de la máscara (frames, bins) para evitar "ruido musical"
+
+# Normalización de ganancia
+FRAME_GANANCIA = int(SAMPLE_RATE * 30 / 1000)  # Frames de 30 ms, como en los grabadores
+RMS_OBJETIVO = 2000         # RMS de voz objetivo: centro de la banda 1250-3750 en la que el ensayo de volumen da WER ≈ 0
+GANANCIA_MAX = 20.0         # Ganancia máxima (+26 dB) para no amplificar audios casi vacíos
+RMS_MIN_VOZ = 50            # Por debajo de este RMS un frame nunca se considera voz
+FACTOR_RUIDO = 3.0          # Voz = frames ~10 dB por encima del ruido de fondo del propio audio
+HUECO_MAX_FRAMES = 10       # Pausas de hasta 300 ms no separan segmentos de voz
+LIMITE_PICO = 0.9 * 32767   # Pico máximo al que el limitador lleva cada frame tras aplicar la ganancia
+
+
+def leer_wav_blob(audio_blob):
+    """Decodifica un BLOB de audio de la base de datos (WAV o FLAC) a un array int16 mono."""
+    _, audio = leer_blob(audio_blob)
+    return audio[:, 0] if len(audio.shape) > 1 else audio
+
+
+def wav_a_bytes(audio, sample_rate=SAMPLE_RATE):
+    """Codifica un array int16 como fichero WAV en memoria (para guardarlo o enviarlo al servidor)."""
+    buffer = io.BytesIO()
+    wav.write(buffer, sample_rate, audio)
+    return buffer.getvalue()
+
+
+def a_float32(audio):
+    """Convierte int16 a float32 en [-1, 1], el formato que acepta model.transcribe."""
+    return audio.astype(np.float32) / 32768.0
+
+
+# === REDUCCIÓN DE RUIDO ===
+def _stft(x, ventana):
+    frames = np.lib.stride_tricks.sliding_window_view(x, N_FFT)[::SALTO_STFT]
+    return np.fft.rfft(frames * ventana, axis=1)
+
+
+def _istft(espectro, ventana, longitud):
+    """Suma con solapamiento vectorizada: N_FFT / SALTO_STFT sumas desplazadas en lugar de un bucle por frame."""
+    frames = np.fft.irfft(espectro, n=N_FFT, axis=1) * ventana
+    num = frames.shape[0]
+    salida = np.zeros((num + N_FFT // SALTO_STFT - 1) * SALTO_STFT, dtype=np.float32)
+    normalizacion = np.zeros_like(salida)
+    ventana2 = np.tile(ventana ** 2, (num, 1))
+    for k in range(N_FFT // SALTO_STFT):
+        trozo = slice(k * SALTO_STFT, (k + 1) * SALTO_STFT)
+        salida[k * SALTO_STFT:k * SALTO_STFT + num * SALTO_STFT] += frames[:, trozo].reshape(-1)
+        normalizacion[k * SALTO_STFT:k * SALTO_STFT + num * SALTO_STFT] += ventana2[:, trozo].reshape(-1)
+    return (salida / np.maximum(normalizacion, 1e-8))[:longitud]
+
+
+def reducir_ruido(audio):
+    """
+    Puerta espectral: estima el ruido de fondo en los frames más silenciosos del propio audio y atenúa
+    los bins de la STFT que no lo superan claramente. Devuelve un array int16 de la misma longitud.
+    """
+    if len(audio) < N_FFT:
+        return audio
+    x = audio.astype(np.float32) / 32768.0
+    relleno = N_FFT // 2
+    x_pad = np.pad(x, (relleno, relleno + SALTO_STFT), mode="reflect")
+    ventana = np.hanning(N_FFT + 1)[:-1].astype(np.float32)   # Hann periódica
+
+    espectro = _stft(x_pad, ventana)
+    db = 20 * np.log10(np.abs(espectro) + 1e-10)
+
+    # Perfil de ruido por frecuencia a partir de los frames con menos energía
+    energia = db.mean(axis=1)
+    num_ruido = max(1, int(PROPORCION_RUIDO * len(energia)))
+    ruido = db[np.argsort(energia)[:num_ruido]]
+    umbral = ruido.mean(axis=0) + N_STD_UMBRAL * ruido.std(axis=0)
+
+    mascara = uniform_filter((db > umbral[None, :]).astype(np.float32), size=SUAVIZADO)
+    suelo = 10 ** (-REDUCCION_DB / 20)
+    limpio = _istft(espectro * (suelo + (1 - suelo) * mascara), ventana, len(x_pad))[relleno:relleno + len(x)]
+    return np.clip(limpio * 32768.0, -32768, 32767).astype(np.int16)
+
+
+# === NORMALIZACIÓN DE GANANCIA ===
+def normalizar_ganancia(audio, rms_objetivo=RMS_OBJETIVO):
+    """
+    Escala cada segmento de voz hacia el RMS de voz objetivo y aplica un limitador para no saturar.
+    El ruido fuera de los segmentos de voz no se amplifica. Devuelve (audio int16, ganancia mediana aplicada).
+    """
+    num = len(audio) // FRAME_GANANCIA
+    if num == 0:
+        return audio, 1.0
+    frames = audio[:num * FRAME_GANANCIA].reshape(num, FRAME_GANANCIA).astype(np.float32)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voz = rms > max(np.percentile(rms, 10) * FACTOR_RUIDO, RMS_MIN_VOZ)
+    if not voz.any():
+        return audio, 1.0
+
+    # Segmentos de voz: frames con voz separados por pausas cortas
+    indices = np.flatnonzero(voz)
+    cortes = np.flatnonzero(np.diff(indices) > HUECO_MAX_FRAMES)
+    inicios = indices[np.r_[0, cortes + 1]]
+    fines = indices[np.r_[cortes, len(indices) - 1]] + 1
+
+    ganancia_frames = np.ones(num, dtype=np.float32)
+    ganancias = []
+    for inicio, fin in zip(inicios, fines):
+        rms_segmento = np.sqrt(np.mean(rms[inicio:fin][voz[inicio:fin]] ** 2))
+        ganancia = float(np.clip(rms_objetivo / rms_segmento, 1.0 / GANANCIA_MAX, GANANCIA_MAX))
+        ganancia_frames[inicio:fin] = ganancia
+        ganancias.append(ganancia)
+
+    # Curva de ganancia suave (en dB) interpolada muestra a muestra
+    ganancia_frames = 10 ** (uniform_filter(20 * np.log10(ganancia_frames), size=5, mode="nearest") / 20)
+    centros = (np.arange(num) + 0.5) * FRAME_GANANCIA
+    muestras = np.arange(len(audio))
+    salida = audio.astype(np.float32) * np.interp(muestras, centros, ganancia_frames)
+
+    # Limitador: reduce los frames cuyo pico supera el límite (con margen de un frame a cada lado)
+    picos = np.abs(salida[:num * FRAME_GANANCIA]).reshape(num, FRAME_GANANCIA).max(axis=1)
+    reduccion = minimum_filter1d(np.minimum(1.0, LIMITE_PICO / np.maximum(picos, 1.0)), size=3)
+    salida *= np.interp(muestras, centros, reduccion)
+    return np.clip(salida, -32768, 32767).astype(np.int16), float(np.median(ganancias))
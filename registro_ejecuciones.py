@@ -0,0 +1,144 @@
+# registro_ejecuciones.py
+# Registro de cada ejecución de un ensayo o benchmark en la tabla 'ejecuciones' de su base de datos de salida:
+# identificador (el valor de la columna 'ejecucion' de las filas que escribe), configuración del programa
+# (sus constantes en mayúsculas) y entorno (máquina, gobernador y frecuencia de la CPU, hilos de PyTorch,
+# versiones de Python y de las bibliotecas). Lo usan los programas 7, 8, 10, 11, 12, 13 y 22; el 27 compara dos.
+
+import hashlib
+import json
+import os
+import platform
+import secrets
+import socket
+import sqlite3
+import sys
+from datetime import datetime
+from importlib import metadata
+
+PAQUETES = ("openai-whisper", "torch", "numpy", "scipy", "jiwer", "soundfile", "requests")
+OCULTAS = ("API_TOKEN",)   # Constantes que no se guardan
+MAX_VALOR = 500            # Valores más largos (listas de referencias...) se guardan como hash
+CPUFREQ = "/sys/devices/system/cpu/cpu0/cpufreq"
+
+
+def _leer(ruta):
+    try:
+        with open(ruta) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def modelo_cpu():
+    """Nombre de la CPU según /proc/cpuinfo ('Model' en la Raspberry Pi, 'model name' en x86)."""
+    for linea in (_leer("/proc/cpuinfo") or "").splitlines():
+        clave, _, valor = linea.partition(":")
+        if clave.strip() in ("model name", "Model"):
+            return valor.strip()
+    return platform.processor() or None
+
+
+def entorno():
+    """Instantánea de la máquina y del software con que se ejecuta el programa."""
+    versiones = {}
+    for paquete in PAQUETES:
+        try:
+            versiones[paquete] = metadata.version(paquete)
+        except metadata.PackageNotFoundError:
+            continue
+    torch = sys.modules.get("torch")   # sólo si el programa lo usa (los remotos no lo cargan)
+    temperatura = _leer("/sys/class/thermal/thermal_zone0/temp")
+    return {
+        "hostname": socket.gethostname(),
+        "plataforma": platform.platform(),
+        "python": platform.python_version(),
+        "cpu": modelo_cpu(),
+        "nucleos": os.cpu_count(),
+        "gobernador": _leer(f"{CPUFREQ}/scaling_governor"),
+        "frecuencia_max_khz": _leer(f"{CPUFREQ}/scaling_max_freq"),
+        "temperatura_c": int(temperatura) / 1000 if temperatura else None,
+        "hilos_torch": torch.get_num_threads() if torch is not None else None,
+        "omp_num_threads": os.environ.get("OMP_NUM_THREADS"),
+        "versiones": versiones,
+    }
+
+
+def configuracion(espacio):
+    """Constantes de configuración (nombres en mayúsculas) de un programa a partir de sus globals()."""
+    resultado = {}
+    for nombre, valor in espacio.items():
+        if not nombre.isupper() or nombre.startswith("_") or nombre in OCULTAS:
+            continue
+        try:
+            texto = json.dumps(valor, ensure_ascii=False, sort_keys=True)
+        except TypeError:
+            continue   # módulos, funciones, objetos...
+        if len(texto) > MAX_VALOR:
+            valor = f"sha1:{hashlib.sha1(texto.encode()).hexdigest()[:12]}"
+        resultado[nombre] = valor
+    return resultado
+
+
+def init_tabla(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ejecuciones (
+            id TEXT PRIMARY KEY,
+            programa TEXT,
+            inicio TEXT,
+            fin TEXT,
+            modelos TEXT,
+            hilos INTEGER,
+            hostname TEXT,
+            gobernador TEXT,
+            configuracion TEXT,
+            entorno TEXT
+        )
+    """)
+
+
+def registrar(db_path, espacio, modelos=()):
+    """
+    Registra una ejecución del programa cuyos globals() son 'espacio' y devuelve su id, que el programa guarda
+    en la columna 'ejecucion' de sus filas. El id empieza por la fecha, así que ordena las ejecuciones.
+    """
+    id_ejecucion = f"{datetime.now().isoformat(timespec='seconds')}-{secrets.token_hex(2)}"
+    datos = entorno()
+    with sqlite3.connect(db_path) as conn:
+        init_tabla(conn)
+        conn.execute("""
+            INSERT INTO ejecuciones (id, programa, inicio, modelos, hilos, hostname, gobernador, configuracion, entorno)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (id_ejecucion, os.path.splitext(os.path.basename(espacio.get("__file__", "")))[0],
+              datetime.now().isoformat(timespec="seconds"), ",".join(modelos), datos["hilos_torch"],
+              datos["hostname"], datos["gobernador"],
+              json.dumps(configuracion(espacio), ensure_ascii=False, sort_keys=True),
+              json.dumps(datos, ensure_ascii=False, sort_keys=True)))
+        conn.commit()
+    print(f"🏷️ Ejecución {id_ejecucion} ({datos['hostname']}, gobernador {datos['gobernador'] or 'desconocido'})")
+    return id_ejecucion
+
+
+def finalizar(db_path, id_ejecucion, modelos=None):
+    """
+    Marca la ejecución como terminada (las que no tienen 'fin' se interrumpieron). 'modelos' sustituye a los
+    registrados al empezar (en los ensayos remotos el modelo lo indica el servidor en cada respuesta).
+    """
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE ejecuciones SET fin = ? WHERE id = ?",
+                     (datetime.now().isoformat(timespec="seconds"), id_ejecucion))
+        if modelos is not None:
+            conn.execute("UPDATE ejecuciones SET modelos = ? WHERE id = ?", (",".join(sorted(modelos)), id_ejecucion))
+        conn.commit()
+
+
+def leer(conn, id_ejecucion):
+    """Fila de la ejecución como diccionario, con la configuración y el entorno ya decodificados (o None)."""
+    conn.row_factory = sqlite3.Row
+    fila = conn.execute("SELECT * FROM ejecuciones WHERE id = ?", (id_ejecucion,)).fetchone()
+    conn.row_factory = None
+    if fila is None:
+        return None
+    datos = dict(fila)
+    datos["configuracion"] = json.loads(datos["configuracion"] or "{}")
+    datos["entorno"] = json.loads(datos["entorno"] or "{}")
+    return datos